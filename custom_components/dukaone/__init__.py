@@ -3,23 +3,38 @@ Duka One Integration.
 
 see http://www.dingus.dk for more information
 """
-import asyncio
+
 import logging
 import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import (
+    CONF_DEVICE_ID,
+    CONF_IP_ADDRESS,
+    CONF_PASSWORD,
+    CONF_TYPE,
+)
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_component import EntityComponent
 
-from dukaonesdk.dukaclient import DukaClient, Device
-
-from .const import DOMAIN
+from .cache import DeviceCache
+from .client import DukaClient
+from .const import DOMAIN, ENTRY_TYPE_GROUP
+from .coordinator import DukaCoordinator
+from .group import DukaGroup
+from .program import ProgramWheel
+from .services import async_setup_services
 
-from homeassistant.const import Platform 
+from homeassistant.const import Platform
 
 PLATFORMS = [
     Platform.FAN,
     Platform.SENSOR,
-] 
+    Platform.BINARY_SENSOR,
+    Platform.SELECT,
+    Platform.NUMBER,
+    Platform.SWITCH,
+]
+GROUP_PLATFORMS = [Platform.FAN]
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -37,32 +52,105 @@ def setup(hass: HomeAssistant, config: dict):
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Duka One from a config entry."""
 
+    if DOMAIN not in hass.data:
+        hass.data[DOMAIN] = DukaEntityComponent(hass)
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    if entry.data.get(CONF_TYPE) == ENTRY_TYPE_GROUP:
+        return await async_setup_group_entry(hass, entry)
+    ip_address = entry.data[CONF_IP_ADDRESS]
+    if ip_address is None or len(ip_address) == 0:
+        ip_address = "<broadcast>"
+    device_id = entry.data[CONF_DEVICE_ID]
+    await component.cache.async_load()
+    client = component.acquire_client()
+    # Add the device before the platforms are set up, so the fan and the sensor
+    # can wait for the first reply concurrently. A device in the cache is ready
+    # at once with the cached state.
+    try:
+        device = await client.async_add_device(
+            device_id,
+            entry.data[CONF_PASSWORD],
+            ip_address,
+            restore=component.cache.get(device_id),
+        )
+    except OSError:
+        component.release_client()
+        raise
+    entry.async_on_unload(component.cache.async_track(device))
+    coordinator = DukaCoordinator(hass, entry, client, device)
+    component.coordinators[entry.entry_id] = coordinator
+    component.programs.async_set(coordinator)
+    for group in component.groups.values():
+        group.async_attach(coordinator)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+    async_setup_services(hass)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def async_setup_group_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Set up a group of devices kept in lockstep."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    group = DukaGroup(hass, entry)
+    component.groups[entry.entry_id] = group
+    for coordinator in component.coordinators.values():
+        group.async_attach(coordinator)
+    async_setup_services(hass)
+    await hass.config_entries.async_forward_entry_setups(entry, GROUP_PLATFORMS)
+    return True
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry):
+    """Apply changed options without reloading the entry."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    coordinator = component.coordinators[entry.entry_id]
+    coordinator.async_options_updated()
+    component.programs.async_set(coordinator)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
-    unload_ok = all(
-        await asyncio.gather(
-            *[
-                hass.config_entries.async_forward_entry_unload(entry, "fan"),
-                hass.config_entries.async_forward_entry_unload(entry, "sensor"),
-            ]
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    if entry.data.get(CONF_TYPE) == ENTRY_TYPE_GROUP:
+        unload_ok = await hass.config_entries.async_unload_platforms(
+            entry, GROUP_PLATFORMS
         )
-    )
-    # if unload_ok:
-    #     hass.data[DOMAIN].pop(entry.entry_id)
+        if unload_ok:
+            component.groups.pop(entry.entry_id).async_shutdown()
+        return unload_ok
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        component.programs.async_remove(entry.entry_id)
+        coordinator = component.coordinators.pop(entry.entry_id)
+        for group in component.groups.values():
+            group.async_detach(coordinator.device.device_id)
+        coordinator.async_shutdown()
+        coordinator.client.remove_device(coordinator.device.device_id)
+        component.release_client()
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Remove the cached state of a deleted entry."""
+    if DOMAIN not in hass.data or entry.data.get(CONF_TYPE) == ENTRY_TYPE_GROUP:
+        return
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    await component.cache.async_load()
+    component.cache.async_remove(entry.data[CONF_DEVICE_ID])
+
+
 class DukaEntityComponent(EntityComponent):
     """We only want to have one instance of the dukaclient."""
 
     def __init__(self, hass):
         super(DukaEntityComponent, self).__init__(_LOGGER, DOMAIN, hass)
         self._the_client = None
+        self._client_users = 0
+        self.coordinators: dict[str, DukaCoordinator] = {}
+        self.groups: dict[str, DukaGroup] = {}
+        self.cache = DeviceCache(hass)
+        self.programs = ProgramWheel(hass)
 
     @property
     def the_client(self) -> DukaClient:
@@ -70,3 +158,18 @@ class DukaEntityComponent(EntityComponent):
         if self._the_client is None:
             self._the_client = DukaClient()
         return self._the_client
+
+    def acquire_client(self) -> DukaClient:
+        """Get the duka one client and count a user of it.
+
+        Every call must be matched by a call to release_client.
+        """
+        self._client_users += 1
+        return self.the_client
+
+    def release_client(self) -> None:
+        """Count a user less and close the client when it is no longer used."""
+        self._client_users -= 1
+        if self._client_users == 0 and self._the_client is not None:
+            self._the_client.close()
+            self._the_client = None
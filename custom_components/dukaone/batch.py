@@ -0,0 +1,93 @@
+"""Coalesce parameter writes to a duka one device into a single packet."""
+
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds to collect writes to a device before they are sent
+BATCH_WINDOW = 0.02
+# A debounced batch is sent at the latest this many debounce windows after the
+# first write, so a continuous stream of values still reach the device
+MAX_DEBOUNCE_FACTOR = 4
+
+
+class CommandBatcher:
+    """Collect parameter writes for one device and send them in one packet.
+
+    Writes issued within the batch window, like a scene setting speed, mode and
+    manual speed, are merged. A later value for the same parameter replaces the
+    earlier one and is moved last, so the device applies the commands in the
+    order they were issued.
+
+    Debounced writes, like the values from a dragged slider, restart the timer so
+    only the last value is sent once the values stop changing.
+    """
+
+    def __init__(self, send, window: float = BATCH_WINDOW):
+        # send returns a future set when the device has confirmed the writes
+        self._send = send
+        self._window = window
+        self._pending: dict[int, int] = {}
+        self._handle: asyncio.TimerHandle = None
+        self._future: asyncio.Future = None
+        self._start: float = 0
+
+    async def async_write(self, params: dict[int, int], debounce: float = 0) -> None:
+        """Queue parameter writes and wait until the device has confirmed them.
+
+        With a debounce the packet is delayed until no new writes have been
+        queued for debounce seconds. Superseded values are never sent.
+        """
+        for parameter, value in params.items():
+            self._pending.pop(parameter, None)
+            self._pending[parameter] = value
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._handle is None:
+            self._future = loop.create_future()
+            self._start = now
+            self._handle = loop.call_at(now + max(self._window, debounce), self._flush)
+        elif debounce > 0:
+            when = min(now + debounce, self._start + debounce * MAX_DEBOUNCE_FACTOR)
+            if when > self._handle.when():
+                self._handle.cancel()
+                self._handle = loop.call_at(when, self._flush)
+        # Shield the shared future so a cancelled caller does not cancel the
+        # writes of the others
+        await asyncio.shield(self._future)
+
+    def cancel(self) -> None:
+        """Drop pending writes."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._future is not None and not self._future.done():
+            self._future.cancel()
+        self._future = None
+        self._pending = {}
+
+    def _flush(self) -> None:
+        """Send the pending writes."""
+        params, future = self._pending, self._future
+        self._pending = {}
+        self._handle = None
+        self._future = None
+        try:
+            confirmed = self._send(params)
+        except OSError as exc:
+            future.set_exception(exc)
+            return
+        confirmed.add_done_callback(lambda done: _copy_result(done, future))
+
+
+def _copy_result(source: asyncio.Future, target: asyncio.Future) -> None:
+    """Complete target with the outcome of source."""
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(None)
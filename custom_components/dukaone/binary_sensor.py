@@ -0,0 +1,70 @@
+"""
+Binary sensor platform for Duka One fan.
+
+see http://www.dingus.dk for more information
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+    BinarySensorEntityDescription,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import DukaEntityComponent
+from .const import DOMAIN
+from .device import DeviceState
+from .dukaentity import DukaDescribedEntity, async_add_described_entities
+
+
+@dataclass(frozen=True, kw_only=True)
+class DukaOneBinarySensorDescription(BinarySensorEntityDescription):
+    """Describe a binary sensor showing a device value."""
+
+    value_fn: Callable[[DeviceState], bool | None]
+
+
+BINARY_SENSORS = (
+    DukaOneBinarySensorDescription(
+        key="filter_alarm",
+        name="Filter alarm",
+        device_class=BinarySensorDeviceClass.PROBLEM,
+        value_fn=lambda state: (
+            None if state.filter_alarm is None else bool(state.filter_alarm)
+        ),
+    ),
+    DukaOneBinarySensorDescription(
+        key="alarm",
+        name="Alarm",
+        device_class=BinarySensorDeviceClass.PROBLEM,
+        value_fn=lambda state: None if state.alarm is None else state.alarm != 0,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities
+) -> None:
+    """Set up Duka One binary sensors based on a config entry."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    async_add_described_entities(
+        component.coordinators[entry.entry_id],
+        BINARY_SENSORS,
+        DukaOneBinarySensor,
+        async_add_entities,
+    )
+
+
+class DukaOneBinarySensor(DukaDescribedEntity, BinarySensorEntity):
+    """A binary sensor showing a value of a Duka One device."""
+
+    entity_description: DukaOneBinarySensorDescription
+
+    @property
+    def is_on(self):
+        """Return true if the problem is present."""
+        return self.entity_description.value_fn(self.coordinator.state)
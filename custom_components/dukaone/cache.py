@@ -0,0 +1,86 @@
+"""Persist the last known state of the duka one devices.
+
+The cache lets the entities be created from the last known state at startup
+instead of waiting for the first reply of every device. The state is
+reconciled as soon as the device answers.
+"""
+
+import asyncio
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .device import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.devices"
+STORAGE_VERSION = 1
+# Seconds to collect device changes before the cache is written
+SAVE_DELAY = 30
+# Seconds before a change of only the filter timer is written. The timer counts
+# down every minute, the final write at shutdown keeps it current otherwise.
+FILTER_TIMER_SAVE_DELAY = 3600
+
+
+class DeviceCache:
+    """The last known state of the devices, keyed by device id."""
+
+    def __init__(self, hass: HomeAssistant):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self._data: dict[str, dict] = None
+        self._load_lock = asyncio.Lock()
+        # A write is scheduled
+        self._save_pending = False
+
+    async def async_load(self) -> None:
+        """Load the cache if it is not loaded yet."""
+        async with self._load_lock:
+            if self._data is None:
+                self._data = await self._store.async_load() or {}
+
+    def get(self, device_id: str) -> dict | None:
+        """Return the cached state of a device."""
+        return self._data.get(device_id)
+
+    @callback
+    def async_track(self, device: Device):
+        """Keep the cached state of the device up to date.
+
+        Returns a function stopping the tracking again.
+        """
+
+        @callback
+        def device_changed(changed: Device):
+            data = changed.as_dict()
+            cached = self._data.get(changed.device_id)
+            self._data[changed.device_id] = data
+            if _without_filter_timer(cached or {}) == _without_filter_timer(data):
+                if not self._save_pending:
+                    self._delay_save(FILTER_TIMER_SAVE_DELAY)
+                return
+            self._delay_save(SAVE_DELAY)
+
+        return device.add_listener(device_changed)
+
+    @callback
+    def async_remove(self, device_id: str) -> None:
+        """Forget a device."""
+        if self._data is not None and self._data.pop(device_id, None) is not None:
+            self._delay_save(SAVE_DELAY)
+
+    @callback
+    def _delay_save(self, delay: float) -> None:
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, delay)
+
+    @callback
+    def _data_to_save(self) -> dict:
+        self._save_pending = False
+        return self._data
+
+
+def _without_filter_timer(data: dict) -> dict:
+    return {name: value for name, value in data.items() if name != "filter_timer"}
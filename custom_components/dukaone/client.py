@@ -0,0 +1,373 @@
+"""Asyncio udp client for the duka one devices.
+
+All devices share one socket and one event loop transport. Commands are sent
+directly from the event loop and replies are dispatched to the devices by the
+transport, so no executor threads are involved.
+"""
+
+import asyncio
+import logging
+
+from .batch import CommandBatcher
+from .const import DEFAULT_POLL_INTERVAL
+from .device import Device, Mode, Speed
+from .inflight import InflightTable
+from .scheduler import PollScheduler
+from .packet import (
+    STATUS_PARAMETERS,
+    Func,
+    Parameter,
+    build_read,
+    build_search,
+    build_write,
+)
+from .transport import BROADCAST_ADDRESS, DUKA_PORT, DukaTransport
+
+_LOGGER = logging.getLogger(__name__)
+
+VALIDATE_TIMEOUT = 4.0
+# Seconds to collect replies to a search
+SEARCH_TIMEOUT = 3.0
+
+
+class DukaClient:
+    """Client object for making connection to the duka devices."""
+
+    def __init__(self, port: int = DUKA_PORT, local_port: int = DUKA_PORT):
+        self._transport = DukaTransport(port, local_port, self._response_received)
+        self._devices: dict[str, Device] = {}
+        self._batchers: dict[str, CommandBatcher] = {}
+        self._inflight: dict[str, InflightTable] = {}
+        self._scheduler = PollScheduler(self._poll)
+
+    @property
+    def is_connected(self) -> bool:
+        """Return True if the socket is open."""
+        return self._transport.is_connected
+
+    @property
+    def transport(self) -> DukaTransport:
+        """Return the shared transport."""
+        return self._transport
+
+    async def async_start(self) -> None:
+        """Open the socket if it is not already open."""
+        await self._transport.async_start()
+        self._scheduler.start()
+
+    def close(self) -> None:
+        """Close the socket and drop the pending commands."""
+        self._scheduler.stop()
+        for batcher in self._batchers.values():
+            batcher.cancel()
+        for inflight in self._inflight.values():
+            inflight.cancel()
+        self._transport.close()
+
+    async def async_add_device(
+        self,
+        device_id: str,
+        password: str = None,
+        ip_address: str = BROADCAST_ADDRESS,
+        onchange=None,
+        restore: dict = None,
+    ) -> Device:
+        """Add a new device. If the device already exist the current one will
+        be returned
+
+        A new device is initialized with the restore state, if given, until the
+        device answers."""
+        await self.async_start()
+        device = self.get_device(device_id)
+        if device is None:
+            device = Device(device_id, password, ip_address, onchange)
+            if restore is not None:
+                device.restore(restore)
+            self._devices[device_id] = device
+            self._transport.register(device)
+            self._scheduler.add(device, DEFAULT_POLL_INTERVAL)
+        # Ask for firmware and status in one packet so the device is ready as
+        # soon as the first reply arrives
+        self._send(
+            device,
+            build_read(
+                device.device_id,
+                device.password,
+                (Parameter.READ_FIRMWARE_VERSION, Parameter.UNIT_TYPE)
+                + STATUS_PARAMETERS,
+            ),
+        )
+        return device
+
+    def remove_device(self, device_id: str) -> Device | None:
+        """Remove an existing device"""
+        batcher = self._batchers.pop(device_id, None)
+        if batcher is not None:
+            batcher.cancel()
+        inflight = self._inflight.pop(device_id, None)
+        if inflight is not None:
+            inflight.cancel()
+        self._scheduler.remove(device_id)
+        device = self._devices.pop(device_id, None)
+        if device is not None:
+            self._transport.unregister(device)
+        return device
+
+    def get_device(self, device_id: str) -> Device | None:
+        """Get a device by device id."""
+        return self._devices.get(device_id)
+
+    def get_device_count(self) -> int:
+        """Return the number of devices"""
+        return len(self._devices)
+
+    def set_poll_interval(self, device: Device, interval: float) -> None:
+        """Set the interval in seconds between status requests to an idle device"""
+        self._scheduler.set_interval(device.device_id, interval)
+
+    def get_poll_interval(self, device: Device) -> float | None:
+        """Return the current interval between status requests to the device.
+
+        This is shorter than the configured interval while the device is
+        changing and longer while it does not answer.
+        """
+        return self._scheduler.interval(device.device_id)
+
+    async def async_set_speed(self, device: Device, speed: Speed) -> None:
+        """Set the speed of the specified device"""
+        if device.speed == speed:
+            return
+        if speed == Speed.OFF:
+            await self.async_turn_off(device)
+            return
+        params = {}
+        if device.speed == Speed.OFF:
+            params[Parameter.ON_OFF] = 0x01
+        params[Parameter.SPEED] = speed
+        await self.async_write(device, params)
+
+    async def async_set_manual_speed(
+        self, device: Device, manualspeed: int, debounce: float = 0
+    ) -> None:
+        """Set the manual speed (0-255) of the specified device
+
+        Use debounce for rapid changes - only the last value is sent once the
+        value has been stable for debounce seconds.
+        """
+        params = {}
+        if device.speed == Speed.OFF:
+            params[Parameter.ON_OFF] = 0x01
+        if device.speed != Speed.MANUAL:
+            params[Parameter.SPEED] = Speed.MANUAL
+        params[Parameter.MANUAL_SPEED] = manualspeed
+        await self.async_write(device, params, debounce)
+
+    async def async_turn_off(self, device: Device) -> None:
+        """Turn off the specified device"""
+        if device.speed == Speed.OFF:
+            return
+        await self.async_write(device, {Parameter.ON_OFF: 0x00})
+
+    async def async_turn_on(self, device: Device) -> None:
+        """Turn on the specified device
+
+        A device whose speed is not known yet, not even from the cache, is
+        turned on at low speed.
+        """
+        if device.speed is None:
+            await self.async_write(
+                device, {Parameter.ON_OFF: 0x01, Parameter.SPEED: Speed.LOW}
+            )
+            return
+        if device.speed != Speed.OFF:
+            return
+        await self.async_write(device, {Parameter.ON_OFF: 0x01})
+
+    async def async_set_mode(self, device: Device, mode: Mode) -> None:
+        """Set the mode of the specified device"""
+        if device.mode == mode:
+            return
+        await self.async_write(device, {Parameter.VENTILATION_MODE: mode})
+
+    async def async_reset_filter_alarm(self, device: Device) -> None:
+        """Reset the filter alarm
+
+        The reset has no state the device could report back, so it is sent
+        without a reply, like the app does, followed by a status request. A
+        status with the alarm off and the filter timer started again confirms
+        the reset, until then it is sent again.
+
+        Raises CommandTimeout if the device does not confirm the reset.
+        """
+        await self.async_start()
+        filter_timer = device.filter_timer
+
+        def send():
+            if not self._send(
+                device,
+                build_write(
+                    device.device_id,
+                    device.password,
+                    {Parameter.RESET_FILTER_TIMER: 0x01},
+                    Func.WRITE,
+                ),
+                reply=False,
+            ):
+                raise OSError("Duka one socket is closed")
+            self._send(
+                device,
+                build_read(device.device_id, device.password, STATUS_PARAMETERS),
+            )
+
+        def confirmed(device: Device) -> bool:
+            return (
+                device.filter_alarm == 0
+                and device.filter_timer is not None
+                and (filter_timer is None or device.filter_timer > filter_timer)
+            )
+
+        await self._get_inflight(device).async_confirm(send, confirmed)
+
+    async def async_write(
+        self, device: Device, params: dict[int, int], debounce: float = 0
+    ) -> None:
+        """Write parameters to the device.
+
+        Writes to the same device within the batch window are sent in one packet
+        and answered by one response. Unconfirmed writes are sent again.
+
+        Raises CommandTimeout if the device does not confirm the writes.
+        """
+        batcher = self._batchers.get(device.device_id)
+        if batcher is None:
+            batcher = CommandBatcher(self._get_inflight(device).send)
+            self._batchers[device.device_id] = batcher
+        await batcher.async_write(params, debounce)
+
+    async def async_update_device_status(self, device: Device) -> None:
+        """Request the status of the device."""
+        await self.async_start()
+        self._send(
+            device, build_read(device.device_id, device.password, STATUS_PARAMETERS)
+        )
+
+    async def async_validate_device(
+        self,
+        device_id: str,
+        password: str = None,
+        ip_address: str = BROADCAST_ADDRESS,
+        timeout: float = VALIDATE_TIMEOUT,
+    ) -> Device | None:
+        """Validate if a device exist and responds.
+
+        Returns None if the device does not answer within the timeout
+        Returns the Device object as soon as the first status reply arrives
+
+        The device is probed without being added to the client, so it is not
+        polled and cancelling the validation leaves nothing behind. The probe
+        does not take the place of a device added meanwhile.
+        """
+        device = self.get_device(device_id)
+        # Is the device already added
+        if device is not None:
+            return device
+        await self.async_start()
+        device = Device(device_id, password, ip_address)
+        self._transport.add_probe(device)
+        try:
+            self._send(
+                device,
+                build_read(
+                    device.device_id,
+                    device.password,
+                    (Parameter.READ_FIRMWARE_VERSION, Parameter.UNIT_TYPE)
+                    + STATUS_PARAMETERS,
+                ),
+            )
+            if not await device.async_wait_status(timeout):
+                return None
+            return device
+        finally:
+            self._transport.remove_probe(device)
+
+    async def async_search_devices(
+        self,
+        ip_address: str = BROADCAST_ADDRESS,
+        timeout: float = SEARCH_TIMEOUT,
+    ) -> dict[str, str]:
+        """Search for devices with one broadcast packet.
+
+        Returns the device id and IP address of all devices responding within
+        the timeout.
+        """
+        await self.async_start()
+        found: dict[str, str] = {}
+
+        def on_found(device_id: str, address: str):
+            found[device_id] = address
+
+        self._transport.add_search_listener(on_found)
+        try:
+            self._transport.send(build_search(), ip_address)
+            await asyncio.sleep(timeout)
+        finally:
+            self._transport.remove_search_listener(on_found)
+        return found
+
+    def _send(
+        self, device: Device, data: bytes, ip_address: str = None, reply: bool = True
+    ) -> bool:
+        """Send a packet to a device, at its address unless another is given.
+
+        reply is False for a packet the device does not answer.
+        """
+        if not self._transport.send(data, ip_address or device.ip_address):
+            _LOGGER.warning(
+                "Duka one socket is closed, cannot send to %s", device.device_id
+            )
+            return False
+        device.stats.packet_sent(reply)
+        return True
+
+    def _get_inflight(self, device: Device) -> InflightTable:
+        """Return the unconfirmed commands of a device."""
+        inflight = self._inflight.get(device.device_id)
+        if inflight is None:
+            inflight = InflightTable(
+                device, lambda batch: self._send_write(device, batch)
+            )
+            self._inflight[device.device_id] = inflight
+        return inflight
+
+    def _send_write(self, device: Device, params: dict[int, int]) -> None:
+        """Send a write packet. Raises OSError if the socket is closed."""
+        if not self._send(
+            device, build_write(device.device_id, device.password, params)
+        ):
+            raise OSError("Duka one socket is closed")
+
+    def _response_received(self, device: Device, packet) -> None:
+        """Confirm the writes reported back by a reply."""
+        inflight = self._inflight.get(device.device_id)
+        if inflight is not None:
+            inflight.response_received(packet.values)
+
+    def _poll(self, device: Device, resolve: bool = False) -> None:
+        """Send a status request to a device - called by the scheduler.
+
+        With resolve the request is broadcast. Only the device with the id
+        answers, and its reply updates the address of the device.
+        """
+        ip_address = None
+        if resolve and device.ip_address != BROADCAST_ADDRESS:
+            _LOGGER.debug(
+                "Duka one %s does not answer at %s, polling by broadcast",
+                device.device_id,
+                device.ip_address,
+            )
+            ip_address = BROADCAST_ADDRESS
+        self._send(
+            device,
+            build_read(device.device_id, device.password, STATUS_PARAMETERS),
+            ip_address,
+        )
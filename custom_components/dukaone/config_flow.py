@@ -1,19 +1,53 @@
 """Config flow for Duka One integration."""
 
+import asyncio
 import logging
 import voluptuous as vol
 
-from homeassistant import config_entries, exceptions
+from homeassistant import config_entries, data_entry_flow, exceptions
 from homeassistant.const import (
     CONF_DEVICE_ID,
     CONF_IP_ADDRESS,
     CONF_NAME,
     CONF_PASSWORD,
+    CONF_TIMEOUT,
+    CONF_TYPE,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.selector import TextSelector, TextSelectorConfig
 
-from .const import DOMAIN, CONF_STATICIP
+from .const import (
+    DOMAIN,
+    CONF_BOOST_SPEED,
+    CONF_DEBOUNCE,
+    CONF_FILTER_TIMER_THRESHOLD,
+    CONF_HUMIDITY_CONTROL,
+    CONF_HUMIDITY_HIGH,
+    CONF_HUMIDITY_LOW,
+    CONF_HUMIDITY_THRESHOLD,
+    CONF_INVERTED,
+    CONF_MEMBERS,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_OPTIMISTIC,
+    CONF_SCHEDULE,
+    CONF_POLL_INTERVAL,
+    CONF_STATICIP,
+    DEFAULT_DEBOUNCE,
+    DEFAULT_FILTER_TIMER_THRESHOLD,
+    DEFAULT_HUMIDITY_HIGH,
+    DEFAULT_HUMIDITY_LOW,
+    DEFAULT_HUMIDITY_THRESHOLD,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_POLL_INTERVAL,
+    ENTRY_TYPE_GROUP,
+    SPEED_HIGH,
+    SPEED_LOW,
+    SPEED_MEDIUM,
+)
 from . import DukaEntityComponent
+from .client import VALIDATE_TIMEOUT
+from .program import ScheduleError, parse_schedule
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -24,22 +58,50 @@ DATA_SCHEMA = vol.Schema(
         vol.Optional(CONF_PASSWORD, default="1111"): str,
         vol.Optional(CONF_IP_ADDRESS, default=""): str,
         vol.Optional(CONF_STATICIP, default=True): bool,
+        vol.Optional(CONF_TIMEOUT, default=VALIDATE_TIMEOUT): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=30)
+        ),
+    }
+)
+
+DISCOVER_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_PASSWORD, default="1111"): str,
+        vol.Optional(CONF_IP_ADDRESS, default=""): str,
+        vol.Optional(CONF_STATICIP, default=True): bool,
     }
 )
 
+CONF_DEVICES = "devices"
+
 
-def dovalidate(hass: HomeAssistant, user_input):
-    """Validate if we can connect to the device"""
+def get_component(hass: HomeAssistant) -> DukaEntityComponent:
+    """Return the component, creating it if the integration is not set up yet"""
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = DukaEntityComponent(hass)
-    component: DukaEntityComponent = hass.data[DOMAIN]
+    return hass.data[DOMAIN]
+
+
+async def async_validate(hass: HomeAssistant, user_input):
+    """Validate if we can connect to the device
+
+    Waits at most the timeout given in the user input for the device to answer.
+    """
+    component = get_component(hass)
+    timeout = user_input.pop(CONF_TIMEOUT, VALIDATE_TIMEOUT)
 
     if user_input[CONF_IP_ADDRESS] is None or len(user_input[CONF_IP_ADDRESS]) == 0:
         user_input[CONF_IP_ADDRESS] = "<broadcast>"
     device_id = user_input[CONF_DEVICE_ID]
     password = user_input[CONF_PASSWORD]
     ip_address = user_input[CONF_IP_ADDRESS]
-    device = component.the_client.validate_device(device_id, password, ip_address)
+    client = component.acquire_client()
+    try:
+        device = await client.async_validate_device(
+            device_id, password, ip_address, timeout
+        )
+    finally:
+        component.release_client()
     if device is None:
         raise CannotConnect()
     if user_input[CONF_STATICIP]:
@@ -53,25 +115,264 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_PUSH
 
+    def __init__(self):
+        """Initialize the config flow."""
+        self._discover_input = None
+        self._discovered: dict[str, str] = {}
+        self._validate_task: asyncio.Task = None
+
     async def async_step_user(self, user_input=None):
-        """Handle the initial step."""
+        """Let the user choose between discovery, manual setup and a group."""
+        return self.async_show_menu(
+            step_id="user", menu_options=["discover", "manual", "group"]
+        )
+
+    async def async_step_manual(self, user_input=None):
+        """Handle the setup of a single device."""
         errors = {}
         if user_input is not None:
+            self._validate_task = self.hass.async_create_task(
+                async_validate(self.hass, user_input)
+            )
             try:
-                await self.hass.async_add_executor_job(
-                    dovalidate, self.hass, user_input
-                )
+                await self._validate_task
                 return self.async_create_entry(
                     title=user_input[CONF_NAME], data=user_input
                 )
             except CannotConnect:
                 errors["base"] = "cannot_connect"
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # The flow was aborted while the device was validated
+                raise data_entry_flow.UnknownFlow from None
             except Exception:  # pylint: disable=broad-except
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
+            finally:
+                self._validate_task = None
+
+        return self.async_show_form(
+            step_id="manual", data_schema=DATA_SCHEMA, errors=errors
+        )
+
+    @callback
+    def async_remove(self) -> None:
+        """Stop a running validation when the flow is aborted."""
+        if self._validate_task is not None:
+            self._validate_task.cancel()
 
+    async def async_step_discover(self, user_input=None):
+        """Search for all devices with one broadcast."""
+        errors = {}
+        if user_input is not None:
+            ip_address = user_input[CONF_IP_ADDRESS] or "<broadcast>"
+            component = get_component(self.hass)
+            client = component.acquire_client()
+            try:
+                found = await client.async_search_devices(ip_address)
+            finally:
+                component.release_client()
+            configured = {
+                entry.data.get(CONF_DEVICE_ID)
+                for entry in self._async_current_entries(include_ignore=False)
+            }
+            self._discovered = {
+                device_id: address
+                for device_id, address in found.items()
+                if device_id not in configured
+            }
+            if self._discovered:
+                self._discover_input = user_input
+                return await self.async_step_select()
+            errors["base"] = "no_devices_found"
+
+        return self.async_show_form(
+            step_id="discover", data_schema=DISCOVER_SCHEMA, errors=errors
+        )
+
+    async def async_step_select(self, user_input=None):
+        """Let the user select the discovered devices to add."""
+        if user_input is not None:
+            entries = [
+                self._discovered_entry_data(device_id)
+                for device_id in user_input[CONF_DEVICES]
+            ]
+            if entries:
+                # This flow creates the first entry, the others are imported
+                for data in entries[1:]:
+                    self.hass.async_create_task(
+                        self.hass.config_entries.flow.async_init(
+                            DOMAIN,
+                            context={"source": config_entries.SOURCE_IMPORT},
+                            data=data,
+                        )
+                    )
+                return await self.async_step_import(entries[0])
+            return self.async_abort(reason="no_devices_selected")
+
+        devices = {
+            device_id: f"{device_id} ({address})"
+            for device_id, address in self._discovered.items()
+        }
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_DEVICES, default=list(devices)): cv.multi_select(
+                    devices
+                )
+            }
+        )
+        return self.async_show_form(step_id="select", data_schema=schema)
+
+    async def async_step_import(self, user_input):
+        """Create an entry for a device found by discovery."""
+        await self.async_set_unique_id(user_input[CONF_DEVICE_ID])
+        self._abort_if_unique_id_configured()
+        return self.async_create_entry(title=user_input[CONF_NAME], data=user_input)
+
+    async def async_step_group(self, user_input=None):
+        """Handle the setup of a group of devices kept in lockstep."""
+        devices = {
+            entry.data[CONF_DEVICE_ID]: entry.title
+            for entry in self._async_current_entries(include_ignore=False)
+            if entry.data.get(CONF_TYPE) != ENTRY_TYPE_GROUP
+        }
+        if len(devices) < 2:
+            return self.async_abort(reason="no_group_members")
+        errors = {}
+        if user_input is not None:
+            members = user_input[CONF_MEMBERS]
+            if len(members) < 2:
+                errors[CONF_MEMBERS] = "group_too_small"
+            elif not set(user_input[CONF_INVERTED]) <= set(members):
+                errors[CONF_INVERTED] = "inverted_not_member"
+            else:
+                await self.async_set_unique_id(
+                    f"{ENTRY_TYPE_GROUP}_{'_'.join(sorted(members))}"
+                )
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title=user_input[CONF_NAME],
+                    data={CONF_TYPE: ENTRY_TYPE_GROUP, **user_input},
+                )
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_NAME): str,
+                vol.Required(CONF_MEMBERS, default=[]): cv.multi_select(devices),
+                vol.Optional(CONF_INVERTED, default=[]): cv.multi_select(devices),
+            }
+        )
+        return self.async_show_form(step_id="group", data_schema=schema, errors=errors)
+
+    def _discovered_entry_data(self, device_id: str) -> dict:
+        """Return the config entry data for a discovered device."""
+        ip_address = ""
+        if self._discover_input[CONF_STATICIP]:
+            ip_address = self._discovered[device_id]
+        return {
+            CONF_NAME: f"Duka One {device_id}",
+            CONF_DEVICE_ID: device_id,
+            CONF_PASSWORD: self._discover_input[CONF_PASSWORD],
+            CONF_IP_ADDRESS: ip_address,
+            CONF_STATICIP: self._discover_input[CONF_STATICIP],
+        }
+
+    @classmethod
+    @callback
+    def async_supports_options_flow(cls, config_entry) -> bool:
+        """Groups have no options."""
+        return config_entry.data.get(CONF_TYPE) != ENTRY_TYPE_GROUP
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options for a Duka One device."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry):
+        """Initialize the options flow."""
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        errors = {}
+        placeholders = {"schedule_error": ""}
+        if user_input is not None:
+            if user_input[CONF_HUMIDITY_LOW] >= user_input[CONF_HUMIDITY_HIGH]:
+                errors["base"] = "invalid_hysteresis"
+            try:
+                parse_schedule(user_input[CONF_SCHEDULE])
+            except ScheduleError as err:
+                errors[CONF_SCHEDULE] = "invalid_schedule"
+                placeholders["schedule_error"] = str(err)
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = user_input or self._entry.options
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    CONF_DEBOUNCE,
+                    default=options.get(CONF_DEBOUNCE, DEFAULT_DEBOUNCE),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=5000)),
+                vol.Optional(
+                    CONF_POLL_INTERVAL,
+                    default=options.get(CONF_POLL_INTERVAL, DEFAULT_POLL_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+                vol.Optional(
+                    CONF_HUMIDITY_THRESHOLD,
+                    default=options.get(
+                        CONF_HUMIDITY_THRESHOLD, DEFAULT_HUMIDITY_THRESHOLD
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=20)),
+                vol.Optional(
+                    CONF_FILTER_TIMER_THRESHOLD,
+                    default=options.get(
+                        CONF_FILTER_TIMER_THRESHOLD, DEFAULT_FILTER_TIMER_THRESHOLD
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+                vol.Optional(
+                    CONF_MIN_WRITE_INTERVAL,
+                    default=options.get(
+                        CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                vol.Optional(
+                    CONF_HUMIDITY_CONTROL,
+                    default=options.get(CONF_HUMIDITY_CONTROL, False),
+                ): bool,
+                vol.Optional(
+                    CONF_HUMIDITY_HIGH,
+                    default=options.get(CONF_HUMIDITY_HIGH, DEFAULT_HUMIDITY_HIGH),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+                vol.Optional(
+                    CONF_HUMIDITY_LOW,
+                    default=options.get(CONF_HUMIDITY_LOW, DEFAULT_HUMIDITY_LOW),
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=99)),
+                vol.Optional(
+                    CONF_BOOST_SPEED,
+                    default=options.get(CONF_BOOST_SPEED, SPEED_HIGH),
+                ): vol.In([SPEED_LOW, SPEED_MEDIUM, SPEED_HIGH]),
+                vol.Optional(
+                    CONF_OPTIMISTIC,
+                    default=options.get(CONF_OPTIMISTIC, False),
+                ): bool,
+                vol.Optional(
+                    CONF_SCHEDULE,
+                    default=options.get(CONF_SCHEDULE, ""),
+                ): TextSelector(TextSelectorConfig(multiline=True)),
+            }
+        )
         return self.async_show_form(
-            step_id="user", data_schema=DATA_SCHEMA, errors=errors
+            step_id="init",
+            data_schema=schema,
+            errors=errors,
+            description_placeholders=placeholders,
         )
 
 
@@ -3,9 +3,42 @@
 DOMAIN = "dukaone"
 
 CONF_STATICIP = "static_ip"
+CONF_DEBOUNCE = "debounce"
+
+CONF_POLL_INTERVAL = "poll_interval"
+CONF_HUMIDITY_THRESHOLD = "humidity_threshold"
+CONF_FILTER_TIMER_THRESHOLD = "filter_timer_threshold"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+CONF_HUMIDITY_CONTROL = "humidity_control"
+CONF_HUMIDITY_HIGH = "humidity_high"
+CONF_HUMIDITY_LOW = "humidity_low"
+CONF_BOOST_SPEED = "boost_speed"
+CONF_OPTIMISTIC = "optimistic"
+CONF_SCHEDULE = "schedule"
+CONF_MEMBERS = "members"
+CONF_INVERTED = "inverted"
+
+# The type of a config entry keeping other device entries in lockstep
+ENTRY_TYPE_GROUP = "group"
+
+# Debounce in milliseconds of manual speed changes
+DEFAULT_DEBOUNCE = 300
+# Seconds between status requests to an idle device
+DEFAULT_POLL_INTERVAL = 5
+# Humidity change in percent written to the state
+DEFAULT_HUMIDITY_THRESHOLD = 1
+# Filter timer change in minutes written to the state. The timer counts down
+# every minute, by default it is written once an hour.
+DEFAULT_FILTER_TIMER_THRESHOLD = 60
+# Minimum seconds between state writes of measured values
+DEFAULT_MIN_WRITE_INTERVAL = 0
+# Humidity in percent starting and ending a humidity boost
+DEFAULT_HUMIDITY_HIGH = 70
+DEFAULT_HUMIDITY_LOW = 60
 
 ATTR_MODE = "mode"
 ATTR_MANUAL_SPEED = "manual_speed"
+ATTR_SPEED = "speed"
 
 MODE_IN = "in"
 MODE_OUT = "out"
@@ -0,0 +1,140 @@
+"""Humidity control running in the device update path.
+
+The control boosts the fan when the humidity rises above the high threshold
+and returns to the previous speed when it has fallen below the low threshold.
+It reacts to the reply reporting the humidity, without waiting for a Home
+Assistant automation.
+"""
+
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .client import DukaClient
+from .device import Device, Speed
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class HumidityControl:
+    """Boost a device on high humidity, with hysteresis.
+
+    If the speed is changed while boosting, the control leaves the fan alone
+    until the humidity has fallen below the low threshold.
+    """
+
+    def __init__(self, hass: HomeAssistant, client: DukaClient, device: Device):
+        self._hass = hass
+        self._client = client
+        self._device = device
+        self.enabled = False
+        self.high = 0
+        self.low = 0
+        self.boost_speed = Speed.HIGH
+        self.boosting = False
+        self._overridden = False
+        self._restore_speed: Speed = None
+        self._restore_manualspeed: int = None
+        self._commands = 0
+        self._listeners = []
+        self._remove_listener = device.add_listener(self._async_device_changed)
+
+    def add_listener(self, listener):
+        """Add a callback called when the control state changes.
+
+        Returns a function removing the callback again.
+        """
+        self._listeners.append(listener)
+
+        def remove_listener():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return remove_listener
+
+    @callback
+    def async_configure(
+        self, enabled: bool, high: int, low: int, boost_speed: Speed
+    ) -> None:
+        """Set the thresholds. Disabling the control ends a boost."""
+        self.high = high
+        self.low = low
+        self.boost_speed = boost_speed
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if not enabled and self.boosting:
+            self._async_end_boost()
+        elif enabled:
+            self._async_device_changed(self._device)
+        self._async_notify()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop following the device."""
+        self._remove_listener()
+        self._listeners.clear()
+
+    @callback
+    def _async_device_changed(self, device: Device) -> None:
+        if not self.enabled or device.humidity is None:
+            return
+        if self.boosting:
+            if not self._commands and device.speed != self.boost_speed:
+                _LOGGER.debug("Humidity boost of %s overridden", device.device_id)
+                self.boosting = False
+                self._overridden = True
+                self._async_notify()
+            elif device.humidity <= self.low:
+                self._async_end_boost()
+                self._async_notify()
+        elif self._overridden:
+            if device.humidity <= self.low:
+                self._overridden = False
+        elif device.humidity >= self.high and device.speed is not None:
+            self.boosting = True
+            self._restore_speed = device.speed
+            self._restore_manualspeed = device.manualspeed
+            self._async_command(self._client.async_set_speed(device, self.boost_speed))
+            self._async_notify()
+
+    @callback
+    def _async_end_boost(self) -> None:
+        self.boosting = False
+        device = self._device
+        if self._restore_speed == Speed.MANUAL and self._restore_manualspeed:
+            command = self._client.async_set_manual_speed(
+                device, self._restore_manualspeed
+            )
+        else:
+            command = self._client.async_set_speed(device, self._restore_speed)
+        self._async_command(command)
+
+    @callback
+    def _async_command(self, command) -> None:
+        self._commands += 1
+        self._hass.async_create_task(self._async_run(command, self.boosting))
+
+    async def _async_run(self, command, boosting: bool) -> None:
+        """Run a command starting or ending a boost.
+
+        If the command fails the boost state is reset, so the next humidity
+        sample tries again.
+        """
+        try:
+            await command
+        except (HomeAssistantError, OSError) as err:
+            _LOGGER.warning(
+                "Humidity control of %s failed: %s", self._device.device_id, err
+            )
+            if self.boosting == boosting:
+                self.boosting = not boosting
+                self._async_notify()
+        finally:
+            self._commands -= 1
+
+    @callback
+    def _async_notify(self) -> None:
+        for listener in list(self._listeners):
+            listener()
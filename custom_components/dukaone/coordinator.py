@@ -0,0 +1,314 @@
+"""Shared state hub for a single duka one device."""
+
+from collections.abc import Awaitable
+from dataclasses import replace
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_IP_ADDRESS
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .client import DukaClient
+from .const import (
+    CONF_BOOST_SPEED,
+    CONF_DEBOUNCE,
+    CONF_FILTER_TIMER_THRESHOLD,
+    CONF_HUMIDITY_CONTROL,
+    CONF_HUMIDITY_HIGH,
+    CONF_HUMIDITY_LOW,
+    CONF_HUMIDITY_THRESHOLD,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_OPTIMISTIC,
+    CONF_POLL_INTERVAL,
+    CONF_STATICIP,
+    DEFAULT_DEBOUNCE,
+    DEFAULT_FILTER_TIMER_THRESHOLD,
+    DEFAULT_HUMIDITY_HIGH,
+    DEFAULT_HUMIDITY_LOW,
+    DEFAULT_HUMIDITY_THRESHOLD,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_POLL_INTERVAL,
+    SPEED_HIGH,
+)
+from .control import HumidityControl
+from .device import Device, DeviceState, Mode, Speed
+from .history import TelemetryHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _EntityState:
+    """The last state written by an entity."""
+
+    __slots__ = ("value", "written", "cancel_write")
+
+    def __init__(self, value, written: float):
+        self.value = value
+        self.written = written
+        self.cancel_write = None
+
+
+class DukaCoordinator:
+    """Own a device and notify the entities following it.
+
+    The coordinator subscribes once to the device and fans the change out to
+    the entities. An entity is only updated when the value it projects from the
+    device has changed, so no redundant state is written.
+
+    Entities can further limit their writes with a write policy: a numeric
+    value is written when it differs at least the threshold from the written
+    value, and at most once per interval. A change within the interval is
+    written when the interval has passed.
+
+    Commands are sent through the coordinator. With optimistic updates the
+    entities show the commanded values at once. The values are pending until
+    the command has finished, then the state reported by the device is shown
+    again - which rolls the values back if the device did not confirm them.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        client: DukaClient,
+        device: Device,
+    ):
+        self.hass = hass
+        self.entry = entry
+        self.client = client
+        self.device = device
+        self._entities: dict[object, _EntityState] = {}
+        # The commanded value of each state field and the command setting it
+        self._pending: dict[str, tuple[object, object]] = {}
+        self._ip_address = device.ip_address
+        self.history = TelemetryHistory()
+        if device.humidity is not None or device.speed is not None:
+            self.history.add(device)
+        self._remove_listener = device.add_listener(self._async_device_changed)
+        self.humidity_control = HumidityControl(hass, client, device)
+        self.async_options_updated()
+
+    @property
+    def debounce(self) -> float:
+        """Return the debounce of manual speed changes in seconds."""
+        return self.entry.options.get(CONF_DEBOUNCE, DEFAULT_DEBOUNCE) / 1000
+
+    @property
+    def humidity_threshold(self) -> int:
+        """Return the humidity change in percent written to the state."""
+        return self.entry.options.get(
+            CONF_HUMIDITY_THRESHOLD, DEFAULT_HUMIDITY_THRESHOLD
+        )
+
+    @property
+    def filter_timer_threshold(self) -> int:
+        """Return the filter timer change in minutes written to the state."""
+        return self.entry.options.get(
+            CONF_FILTER_TIMER_THRESHOLD, DEFAULT_FILTER_TIMER_THRESHOLD
+        )
+
+    @property
+    def min_write_interval(self) -> float:
+        """Return the minimum seconds between writes of measured values."""
+        return self.entry.options.get(
+            CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL
+        )
+
+    @property
+    def optimistic(self) -> bool:
+        """Return True if commands are shown before the device confirms them."""
+        return self.entry.options.get(CONF_OPTIMISTIC, False)
+
+    @property
+    def state(self) -> DeviceState:
+        """Return the device state shown by the entities."""
+        state = self.device.state
+        if not self._pending:
+            return state
+        return replace(
+            state, **{name: value for name, (value, _) in self._pending.items()}
+        )
+
+    async def async_set_speed(self, speed: Speed) -> None:
+        """Set the speed of the device."""
+        await self.async_command(
+            self.client.async_set_speed(self.device, speed), speed=speed
+        )
+
+    async def async_set_manual_speed(
+        self, manualspeed: int, debounce: float = 0
+    ) -> None:
+        """Set the manual speed (0-255) of the device."""
+        await self.async_command(
+            self.client.async_set_manual_speed(self.device, manualspeed, debounce),
+            speed=Speed.MANUAL,
+            manualspeed=manualspeed,
+        )
+
+    async def async_set_mode(self, mode: Mode) -> None:
+        """Set the mode of the device."""
+        await self.async_command(
+            self.client.async_set_mode(self.device, mode), mode=mode
+        )
+
+    async def async_turn_on(self) -> None:
+        """Turn on the device at its previous speed."""
+        # The speed is not known until the device reports it
+        await self.async_command(self.client.async_turn_on(self.device))
+
+    async def async_turn_off(self) -> None:
+        """Turn off the device."""
+        await self.async_command(
+            self.client.async_turn_off(self.device), speed=Speed.OFF
+        )
+
+    async def async_command(self, command: Awaitable[None], **values) -> None:
+        """Run a command setting the state fields given as keywords.
+
+        With optimistic updates the values are shown until the command has
+        finished. A later command of the same field takes over.
+        """
+        if not self.optimistic or not values:
+            await command
+            return
+        token = object()
+        for name, value in values.items():
+            self._pending[name] = (value, token)
+        self._async_update_entities()
+        try:
+            await command
+        finally:
+            for name in values:
+                pending = self._pending.get(name)
+                if pending is not None and pending[1] is token:
+                    del self._pending[name]
+            self._async_update_entities()
+
+    @callback
+    def async_options_updated(self) -> None:
+        """Apply the options of the config entry."""
+        options = self.entry.options
+        self.client.set_poll_interval(
+            self.device,
+            options.get(CONF_POLL_INTERVAL, DEFAULT_POLL_INTERVAL),
+        )
+        self.humidity_control.async_configure(
+            options.get(CONF_HUMIDITY_CONTROL, False),
+            options.get(CONF_HUMIDITY_HIGH, DEFAULT_HUMIDITY_HIGH),
+            options.get(CONF_HUMIDITY_LOW, DEFAULT_HUMIDITY_LOW),
+            Speed[options.get(CONF_BOOST_SPEED, SPEED_HIGH).upper()],
+        )
+
+    @callback
+    def async_add_entity(self, entity):
+        """Add an entity and update it with the current device state.
+
+        Returns a function removing the entity again.
+        """
+        state = self.state
+        self._entities[entity] = _EntityState(
+            entity.projected_state(state), self.hass.loop.time()
+        )
+        entity.on_change(state)
+
+        @callback
+        def remove_entity():
+            state = self._entities.pop(entity, None)
+            if state is not None and state.cancel_write is not None:
+                state.cancel_write()
+
+        return remove_entity
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop following the device."""
+        self._remove_listener()
+        self.humidity_control.async_shutdown()
+        for state in self._entities.values():
+            if state.cancel_write is not None:
+                state.cancel_write()
+        self._entities.clear()
+
+    @callback
+    def _async_device_changed(self, device: Device) -> None:
+        """Record the reported state and update the entities."""
+        self.history.add(device)
+        if device.ip_address != self._ip_address:
+            self._ip_address = device.ip_address
+            self._async_address_changed()
+        self._async_update_entities()
+
+    @callback
+    def _async_update_entities(self) -> None:
+        """Update the entities whose projected state has changed significantly."""
+        device_state = self.state
+        now = self.hass.loop.time()
+        for entity, state in self._entities.items():
+            if state.cancel_write is not None:
+                # A write is already scheduled and will use the latest value
+                continue
+            value = entity.projected_state(device_state)
+            threshold, interval = entity.write_policy()
+            if not _is_significant(state.value, value, threshold):
+                continue
+            if now - state.written < interval:
+                state.cancel_write = async_call_later(
+                    self.hass,
+                    state.written + interval - now,
+                    self._delayed_write_action(entity),
+                )
+                continue
+            self._write(entity, state, value, device_state, now)
+
+    def _delayed_write_action(self, entity):
+        @callback
+        def delayed_write(_now):
+            self._async_delayed_write(entity)
+
+        return delayed_write
+
+    @callback
+    def _async_address_changed(self) -> None:
+        """Store a new address of a device with a static IP in the entry."""
+        data = self.entry.data
+        if not data.get(CONF_STATICIP) or data[CONF_IP_ADDRESS] == self._ip_address:
+            return
+        _LOGGER.info(
+            "Duka one %s has moved from %s to %s",
+            self.device.device_id,
+            data[CONF_IP_ADDRESS],
+            self._ip_address,
+        )
+        self.hass.config_entries.async_update_entry(
+            self.entry, data={**data, CONF_IP_ADDRESS: self._ip_address}
+        )
+
+    @callback
+    def _async_delayed_write(self, entity) -> None:
+        """Write a change held back by the write interval."""
+        state = self._entities.get(entity)
+        if state is None:
+            return
+        state.cancel_write = None
+        device_state = self.state
+        value = entity.projected_state(device_state)
+        threshold, _ = entity.write_policy()
+        if _is_significant(state.value, value, threshold):
+            self._write(entity, state, value, device_state, self.hass.loop.time())
+
+    def _write(
+        self, entity, state: _EntityState, value, device_state: DeviceState, now
+    ) -> None:
+        state.value = value
+        state.written = now
+        entity.on_change(device_state)
+
+
+def _is_significant(last, value, threshold: float) -> bool:
+    """Return True if the change from last to value should be written."""
+    if value == last:
+        return False
+    if not threshold or last is None or value is None:
+        return True
+    return abs(value - last) >= threshold
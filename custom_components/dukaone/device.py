@@ -0,0 +1,269 @@
+"""Implements the duka one device class."""
+
+import asyncio
+from dataclasses import asdict, dataclass, fields, replace
+from enum import IntEnum
+import time
+
+from .stats import DeviceStats
+
+
+class Mode(IntEnum):
+    """Device modes available.
+
+    Note: The ONEWAY direction is decided by the dip switch on the device
+    """
+
+    ONEWAY = 0
+    TWOWAY = 1
+    IN = 2
+
+
+class Speed(IntEnum):
+    """Device speed options available."""
+
+    OFF = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+    MANUAL = 255
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceState:
+    """An immutable snapshot of the values reported by a device.
+
+    A new snapshot replaces the old one when a value changes, so snapshots can
+    be shared with the entities and compared to detect changes.
+    """
+
+    speed: Speed = None
+    mode: Mode = None
+    manualspeed: int = None
+    humidity: int = None
+    filter_alarm: int = None
+    filter_timer: int = None
+    alarm: int = None
+
+
+_STATE_FIELDS = tuple(field.name for field in fields(DeviceState))
+
+
+class Device:
+    """A class representing a single Duka One device."""
+
+    def __init__(
+        self,
+        device_id: str,
+        password: str = None,
+        ip_address: str = "<broadcast>",
+        onchange=None,
+    ):
+        self._id = device_id
+        self._password = password
+        self._ip_address = ip_address
+        self._state = DeviceState()
+        self._fan1rpm: int = None
+        self._listeners = []
+        if onchange is not None:
+            self._listeners.append(onchange)
+        self._firmware_version = None
+        self._firmware_date = None
+        self._unit_type = None
+        self._last_seen: float = None
+        self.stats = DeviceStats()
+        self._initialized_event = asyncio.Event()
+        self._status_event = asyncio.Event()
+
+    @property
+    def device_id(self) -> str:
+        """Return the device id"""
+        return self._id
+
+    @property
+    def password(self) -> str:
+        """Return the password for the device"""
+        if self._password:
+            return self._password
+        return "1111"
+
+    @property
+    def ip_address(self) -> str:
+        """Return the IP of the device"""
+        return self._ip_address
+
+    @property
+    def state(self) -> DeviceState:
+        """Return the snapshot of the reported values"""
+        return self._state
+
+    @property
+    def speed(self) -> Speed:
+        """Return the speed of the device"""
+        return self._state.speed
+
+    @property
+    def manualspeed(self) -> int:
+        """Return the manual speed of the device"""
+        return self._state.manualspeed
+
+    @property
+    def fan1rpm(self) -> int:
+        """Return the fan1 rpm of the device"""
+        return self._fan1rpm
+
+    @property
+    def mode(self) -> Mode:
+        """Return the mode of the device"""
+        return self._state.mode
+
+    @property
+    def filter_alarm(self) -> int:
+        """Return the filter alarm of the device 0=ok, 1=replace the filter"""
+        return self._state.filter_alarm
+
+    @property
+    def filter_timer(self) -> int:
+        """Return the filter timer in minutes"""
+        return self._state.filter_timer
+
+    @property
+    def alarm(self) -> int:
+        """Return the alarm indicator 0=no alarm, 1=alarm, 2=warning"""
+        return self._state.alarm
+
+    @property
+    def humidity(self) -> int:
+        """Return the humidity."""
+        return self._state.humidity
+
+    @property
+    def firmware_version(self) -> str:
+        """Return the firmware version of the duka one device"""
+        return self._firmware_version
+
+    @property
+    def firmware_date(self) -> str:
+        """Return the firmware date"""
+        return self._firmware_date
+
+    @property
+    def unit_type(self) -> int:
+        """Return the unit type"""
+        return self._unit_type
+
+    @property
+    def last_seen(self) -> float:
+        """Return the time.monotonic() time of the last reply"""
+        return self._last_seen
+
+    def is_initialized(self) -> bool:
+        """Return True if the device has been initialized.
+
+        The device is initialized once the initial get firmware packet has been
+        received. This packet is sent when the device is added to the client.
+        """
+        return self.firmware_version is not None
+
+    def add_listener(self, onchange):
+        """Add a callback called when the device change state.
+
+        Returns a function removing the callback again.
+        """
+        self._listeners.append(onchange)
+
+        def remove_listener():
+            if onchange in self._listeners:
+                self._listeners.remove(onchange)
+
+        return remove_listener
+
+    async def async_wait_initialized(self, timeout: float) -> bool:
+        """Wait until the firmware version has been received.
+
+        Returns False on timeout.
+        """
+        return await _async_wait_event(self._initialized_event, timeout)
+
+    async def async_wait_status(self, timeout: float) -> bool:
+        """Wait until the first status reply has been received.
+
+        Returns False on timeout.
+        """
+        return await _async_wait_event(self._status_event, timeout)
+
+    def as_dict(self) -> dict:
+        """Return the device state to be stored in the cache"""
+        return {
+            "ip_address": self._ip_address,
+            **asdict(self._state),
+            "firmware_version": self._firmware_version,
+            "firmware_date": self._firmware_date,
+            "unit_type": self._unit_type,
+        }
+
+    def restore(self, data: dict) -> None:
+        """Restore the state stored by as_dict.
+
+        The device is ready with the restored state, and is updated by the
+        next reply. The IP address is not restored, the device keeps the
+        configured address. last_seen is not set, as the device has not
+        answered yet.
+        """
+        self._state = DeviceState(
+            **{name: data[name] for name in _STATE_FIELDS if name in data}
+        )
+        self._firmware_version = data.get("firmware_version")
+        self._firmware_date = data.get("firmware_date")
+        self._unit_type = data.get("unit_type")
+        if self._firmware_version is not None:
+            self._initialized_event.set()
+        if self._state.mode is not None:
+            self._status_event.set()
+
+    def update(self, ip_address: str, packet) -> bool:
+        """Update the device with a response packet.
+
+        Returns True if any of the values reported to the change callback changed.
+        """
+        haschange = False
+        self._last_seen = time.monotonic()
+        if self._ip_address is not None and ip_address != self._ip_address:
+            self._ip_address = ip_address
+            haschange = True
+        state = self._state
+        changes = {}
+        for name in _STATE_FIELDS:
+            value = getattr(packet, name)
+            if value is not None and value != getattr(state, name):
+                changes[name] = value
+        if changes:
+            self._state = replace(state, **changes)
+            haschange = True
+        if packet.firmware_version is not None:
+            self._firmware_version = packet.firmware_version
+        if packet.firmware_date is not None:
+            self._firmware_date = packet.firmware_date
+        if packet.unit_type is not None:
+            self._unit_type = packet.unit_type
+        if packet.firmware_version is not None:
+            self._initialized_event.set()
+        if packet.mode is not None:
+            self._status_event.set()
+        # note we do not want the fan rpm to trigger a change event because it
+        # changes all the time
+        if packet.fan1rpm is not None:
+            self._fan1rpm = packet.fan1rpm
+        if haschange:
+            for listener in list(self._listeners):
+                listener(self)
+        return haschange
+
+
+async def _async_wait_event(event: asyncio.Event, timeout: float) -> bool:
+    """Wait for an event to be set. Returns False on timeout."""
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
@@ -0,0 +1,56 @@
+"""Diagnostics support for Duka One."""
+
+from dataclasses import asdict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_TYPE
+from homeassistant.core import HomeAssistant
+
+from . import DukaEntityComponent
+from .const import DOMAIN, ENTRY_TYPE_GROUP
+
+TO_REDACT = {CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict:
+    """Return diagnostics for a config entry."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    if entry.data.get(CONF_TYPE) == ENTRY_TYPE_GROUP:
+        group = component.groups[entry.entry_id]
+        return {
+            "entry": {"data": dict(entry.data)},
+            "state": None if group.state is None else asdict(group.state),
+            "in_sync": group.in_sync,
+            "members": {
+                coordinator.device.device_id: asdict(coordinator.device.state)
+                for coordinator in group.coordinators
+            },
+        }
+    coordinator = component.coordinators[entry.entry_id]
+    client = coordinator.client
+    device = coordinator.device
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "device": {
+            "ip_address": device.ip_address,
+            "unit_type": device.unit_type,
+            "firmware_version": device.firmware_version,
+            "firmware_date": device.firmware_date,
+            "speed": device.speed,
+            "manualspeed": device.manualspeed,
+            "mode": device.mode,
+            "humidity": device.humidity,
+            "filter_alarm": device.filter_alarm,
+            "filter_timer": device.filter_timer,
+            "alarm": device.alarm,
+        },
+        "poll_interval": client.get_poll_interval(device),
+        "stats": device.stats.as_dict(),
+        "transport": client.transport.as_dict(),
+    }
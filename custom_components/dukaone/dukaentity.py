@@ -1,53 +1,59 @@
 """ """
 
-import asyncio
 import logging
-import time
 from xmlrpc.client import boolean
 
-from dukaonesdk.device import Device
-from dukaonesdk.dukaclient import DukaClient
+from homeassistant.const import CONF_NAME
+from homeassistant.core import callback
 
-from homeassistant.core import HomeAssistant
-
-from . import DukaEntityComponent
+from .client import DukaClient
 from .const import DOMAIN
+from .coordinator import DukaCoordinator
+from .device import Device, DeviceState
 
 _LOGGER = logging.getLogger(__name__)
 
+# Seconds to wait for the first reply from a device
+READY_TIMEOUT = 10
+
 
 class DukaEntity:
     """Implement the base of a duka entity with a reference to a device"""
 
-    def __init__(self, hass: HomeAssistant, device_id):
-        self._device_id = device_id
-        self.device: Device = None
-        component: DukaEntityComponent = hass.data[DOMAIN]
-        self.the_client: DukaClient = component.the_client
-
-    def initialize_device(self, password: str, ip_address: str) -> None:
-        """Initialize the duka one device"""
-        self.device = self.the_client.add_device(
-            self._device_id,
-            password,
-            ip_address,
-            self.on_change,
-        )
+    def __init__(self, coordinator: DukaCoordinator):
+        self.coordinator = coordinator
+        self.device: Device = coordinator.device
+        self._device_id = self.device.device_id
+        self.the_client: DukaClient = coordinator.client
 
     async def wait_for_device_to_be_ready(self) -> boolean:
         """Wait for the device to reponse to the initial get firmware version command."""
-        timeout = time.time() + 10
-        while self.device is None or self.device.firmware_version is None:
-            if time.time() > timeout:
-                _LOGGER.warning("Timeout getting dukaone firmware version")
-                return False
-            await asyncio.sleep(0.1)
+        if self.device is None:
+            return False
+        if not await self.device.async_wait_initialized(READY_TIMEOUT):
+            _LOGGER.warning("Timeout getting dukaone firmware version")
+            return False
         return True
 
-    def on_change(self, device: Device):
+    def projected_state(self, state: DeviceState):
+        """Return the values shown by the entity - must be implemented in derived class
+
+        The state is the device state shown by the coordinator. The coordinator
+        only calls on_change when this value changes.
+        """
+        raise NotImplementedError()
+
+    def on_change(self, state: DeviceState):
         """Callback whe dukaone has changes - must be implemented in derived class"""
         raise NotImplementedError()
 
+    def write_policy(self) -> tuple[float, float]:
+        """Return the change threshold and the minimum seconds between writes.
+
+        The default writes every change at once.
+        """
+        return 0, 0
+
     def dukaone_device_info(self):
         """Return device information."""
         if self.device is None:
@@ -60,3 +66,69 @@ class DukaEntity:
             "sw_version": f"{self.device.firmware_version} {self.device.firmware_date}",
         }
         return info
+
+
+class DukaDescribedEntity(DukaEntity):
+    """Base of the entities showing one device value given by a description.
+
+    The description must have a value_fn returning the value from the state
+    snapshot of the device.
+    Put this class before the Home Assistant entity class in the bases.
+    """
+
+    def __init__(self, coordinator: DukaCoordinator, description):
+        super(DukaDescribedEntity, self).__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{coordinator.entry.data[CONF_NAME]} {description.name}"
+        self._attr_unique_id = f"{self._device_id}_{description.key}"
+        self._attr_should_poll = False
+
+    async def async_added_to_hass(self):
+        """Subscribe to device changes."""
+        self.async_on_remove(self.coordinator.async_add_entity(self))
+
+    def projected_state(self, state: DeviceState):
+        """Return the value shown by the entity"""
+        return self.entity_description.value_fn(state)
+
+    def on_change(self, state: DeviceState):
+        """Callback when the value has changed"""
+        if self.hass is not None:
+            self.async_write_ha_state()
+
+    @property
+    def device_info(self):
+        return self.dukaone_device_info()
+
+
+@callback
+def async_add_described_entities(
+    coordinator: DukaCoordinator, descriptions, entity_class, async_add_entities
+) -> None:
+    """Add an entity for each description once the device reports its value.
+
+    Values the device does not report, like the humidity of a unit without a
+    humidity sensor, do not get an entity.
+    """
+    pending = list(descriptions)
+
+    @callback
+    def add_reported(device: Device):
+        reported = [
+            description
+            for description in pending
+            if description.value_fn(device.state) is not None
+        ]
+        if not reported:
+            return
+        for description in reported:
+            pending.remove(description)
+        async_add_entities(
+            [entity_class(coordinator, description) for description in reported]
+        )
+        if not pending:
+            remove_listener()
+
+    remove_listener = coordinator.device.add_listener(add_reported)
+    coordinator.entry.async_on_unload(remove_listener)
+    add_reported(coordinator.device)
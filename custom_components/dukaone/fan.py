@@ -5,6 +5,7 @@ see http://www.dingus.dk for more information
 """
 
 import asyncio
+from dataclasses import dataclass
 import logging
 import time
 import voluptuous as vol
@@ -16,19 +17,18 @@ from homeassistant.components.fan import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers import entity_platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.const import (
     ATTR_ENTITY_ID,
     CONF_DEVICE_ID,
     CONF_IP_ADDRESS,
     CONF_NAME,
     CONF_PASSWORD,
+    CONF_TYPE,
 )
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.config_validation import make_entity_service_schema
 
-from dukaonesdk.device import Device, Mode, Speed
-
 from .const import (
     ATTR_MANUAL_SPEED,
     ATTR_MODE,
@@ -41,7 +41,12 @@ from .const import (
     SPEED_LOW,
     SPEED_OFF,
 )
+from . import DukaEntityComponent
+from .const import DOMAIN, ENTRY_TYPE_GROUP
+from .coordinator import DukaCoordinator
+from .device import DeviceState, Mode, Speed
 from .dukaentity import DukaEntity
+from .group import DukaGroup
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -65,27 +70,59 @@ SET_MANUAL_SPEED_SCHEMA = make_entity_service_schema(
 )
 
 
+@dataclass(frozen=True, slots=True)
+class FanState:
+    """The values shown by the fan, projected from a device state snapshot."""
+
+    preset_mode: str
+    percentage: int
+    mode: str
+
+
+def fan_state(state: DeviceState) -> FanState:
+    """Map the device speed and mode to preset mode, percentage and mode"""
+    newspeed = SPEED_OFF
+    newpercentage = 0
+    if state.speed == Speed.LOW:
+        newspeed = SPEED_LOW
+        newpercentage = 10
+    elif state.speed == Speed.MEDIUM:
+        newspeed = SPEED_MEDIUM
+        newpercentage = 35
+    elif state.speed == Speed.HIGH:
+        newspeed = SPEED_HIGH
+        newpercentage = 70
+    elif state.speed == Speed.MANUAL:
+        newspeed = SPEED_MANUAL
+        if state.manualspeed is not None:
+            newpercentage = int(round(state.manualspeed * 100 / 255))
+    modeswitch = {Mode.ONEWAY: MODE_OUT, Mode.TWOWAY: MODE_INOUT, Mode.IN: MODE_IN}
+    newmode = modeswitch.get(state.mode, MODE_INOUT)
+    return FanState(newspeed, newpercentage, newmode)
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ) -> None:
     """Set up Duka One based on a config entry."""
 
     name = entry.data[CONF_NAME]
-    device_id = entry.data[CONF_DEVICE_ID]
-    password = entry.data[CONF_PASSWORD]
-    ip_address = entry.data[CONF_IP_ADDRESS]
-    if ip_address is None or len(ip_address) == 0:
-        ip_address = "<broadcast>"
+    component: DukaEntityComponent = hass.data[DOMAIN]
 
     platform = entity_platform.current_platform.get()
-    platform.async_register_entity_service("set_mode", SET_MODE_SCHEMA, "set_mode")
     platform.async_register_entity_service(
-        "reset_filter_timer", RESET_FILTER_TIMER_SCHEMA, "reset_filter_timer"
+        "set_mode", SET_MODE_SCHEMA, "async_set_mode"
     )
     platform.async_register_entity_service(
-        "set_manual_speed", SET_MANUAL_SPEED_SCHEMA, "set_manual_speed"
+        "reset_filter_timer", RESET_FILTER_TIMER_SCHEMA, "async_reset_filter_timer"
     )
-    dukaonefan = DukaOneFan(hass, name, device_id, password, ip_address)
+    platform.async_register_entity_service(
+        "set_manual_speed", SET_MANUAL_SPEED_SCHEMA, "async_set_manual_speed"
+    )
+    if entry.data.get(CONF_TYPE) == ENTRY_TYPE_GROUP:
+        async_add_entities([DukaOneGroupFan(component.groups[entry.entry_id], name)])
+        return
+    dukaonefan = DukaOneFan(component.coordinators[entry.entry_id], name)
     await dukaonefan.wait_for_device_to_be_ready()
     async_add_entities([dukaonefan], True)
 
@@ -93,12 +130,11 @@ async def async_setup_entry(
 class DukaOneFan(FanEntity, DukaEntity):
     """A Duka One  fan component."""
 
-    def __init__(self, hass: HomeAssistant, name, device_id, password, ip_address):
+    def __init__(self, coordinator: DukaCoordinator, name):
         """Initialize the Duka One fan."""
-        super(DukaOneFan, self).__init__(hass, device_id)
-        self._mode: Mode = None
+        super(DukaOneFan, self).__init__(coordinator)
+        self._state: FanState = None
         self._name = name
-        self._attr_percentage = None
         self._supported_features = (
             FanEntityFeature.SET_SPEED
             | FanEntityFeature.PRESET_MODE
@@ -113,56 +149,21 @@ class DukaOneFan(FanEntity, DukaEntity):
             SPEED_HIGH,
             SPEED_MANUAL,
         ]
-        hass.async_add_executor_job(self.initialize_device, password, ip_address)
 
-    async def async_will_remove_from_hass(self):
-        """Unsubscribe when removed."""
-        self.device = self.the_client.remove_device(self.device)
-        return
+    async def async_added_to_hass(self):
+        """Subscribe to device changes."""
+        self.async_on_remove(self.coordinator.async_add_entity(self))
 
-    def on_change(self, device: Device):
+    def projected_state(self, state: DeviceState):
+        """Return the values shown by the fan"""
+        return fan_state(state)
+
+    def on_change(self, state: DeviceState):
         """Callback when the duka one change state"""
-        newspeed = SPEED_OFF
-        newpercentage = 0
-        if device.speed == Speed.LOW:
-            newspeed = SPEED_LOW
-            newpercentage = 10
-        elif device.speed == Speed.MEDIUM:
-            newspeed = SPEED_MEDIUM
-            newpercentage = 35
-        elif device.speed == Speed.HIGH:
-            newspeed = SPEED_HIGH
-            newpercentage = 70
-        elif device.speed == Speed.MANUAL:
-            newspeed = SPEED_MANUAL
-            if device.manualspeed is not None:
-                newpercentage = int(round(device.manualspeed * 100 / 255))
-        modeswitch = {Mode.ONEWAY: MODE_OUT, Mode.TWOWAY: MODE_INOUT, Mode.IN: MODE_IN}
-        newmode = modeswitch.get(device.mode, MODE_INOUT)
-        # Are there any changes?
-        if (
-            newspeed == self._attr_preset_mode
-            and newmode == self._mode
-            and newpercentage == self._attr_percentage
-        ):
-            _LOGGER.debug(
-                "No changes, update not needed, mode(%s), speed(%s), percentage(%s)",
-                self._mode,
-                self._attr_preset_mode,
-                self._attr_percentage,
-            )
-            return
-        self._mode = newmode
-        self._attr_percentage = newpercentage
-        self._attr_preset_mode = newspeed
+        self._state = fan_state(state)
         if self.hass is not None:
-            self.schedule_update_ha_state()
-        _LOGGER.debug(
-            "Duka change, mode(%s), speed(%s), percentage(%s)",
-            self._mode,
-            self._attr_preset_mode,
-            self._attr_percentage,
-        )
+            self.async_write_ha_state()
+        _LOGGER.debug("Duka change, %s", self._state)
         return
 
     @property
@@ -182,76 +183,68 @@ class DukaOneFan(FanEntity, DukaEntity):
 
     @property
     def assumed_state(self):
-        """Return false  if we do optimistic updates."""
-        return False
+        """Return true if commands are shown before the device confirms them."""
+        return self.coordinator.optimistic
 
     @property
     def is_on(self):
         """Return true if device is on."""
-        return self._attr_preset_mode != SPEED_OFF
+        if self._state is None:
+            return None
+        return self._state.preset_mode != SPEED_OFF
+
+    @property
+    def percentage(self):
+        """Return the speed as a percentage."""
+        if self._state is None:
+            return None
+        return self._state.percentage
+
+    @property
+    def preset_mode(self):
+        """Return the speed as a preset mode."""
+        if self._state is None:
+            return None
+        return self._state.preset_mode
 
     @property
     def supported_features(self) -> int:
         """Flag supported features."""
         return self._supported_features
 
-    @property
-    def extra_state_attributes(self):
-        """Return the state attributes."""
-        if self.device is None or not self.device.is_initialized():
-            return {
-                "mode": None,
-                "filter_alarm": None,
-                "filter_timer": None,
-                "filter_timer_nice": None,
-                "humidity": None,
-            }
-        nicetime: str = ""
-        if self.device.filter_timer is not None:
-            timeinmin: int = self.device.filter_timer
-            days: int = int(timeinmin / 60 / 24)
-            timeinmin -= days * 60 * 24
-            hours: int = int(timeinmin / 60)
-            timeinmin -= hours * 60
-            nicetime = f"{days}d {str(hours).zfill(2)}:{str(timeinmin).zfill(2)}"
-        return {
-            "mode": self.mode,
-            "filter_alarm": self.device.filter_alarm,
-            "filter_timer": self.device.filter_timer,
-            "filter_timer_nice": nicetime,
-            "humidity": self.device.humidity,
-        }
-
-    def set_percentage(self, percentage: int) -> None:
+    async def async_set_percentage(self, percentage: int) -> None:
         """Set the speed of the fan, as a percentage."""
         manual_speed: int = int(percentage * 255 / 100)
-        self.the_client.set_manual_speed(self.device, manual_speed)
+        await self.coordinator.async_set_manual_speed(
+            manual_speed, self.coordinator.debounce
+        )
 
     @property
     def percentage_step(self):
         """Return the step size for percentage."""
         return 1
 
-    def set_preset_mode(self, preset_mode: str):
+    async def async_set_preset_mode(self, preset_mode: str):
         """Set new preset mode."""
         if preset_mode == SPEED_HIGH:
-            self.the_client.set_speed(self.device, Speed.HIGH)
+            await self.coordinator.async_set_speed(Speed.HIGH)
         elif preset_mode == SPEED_MEDIUM:
-            self.the_client.set_speed(self.device, Speed.MEDIUM)
+            await self.coordinator.async_set_speed(Speed.MEDIUM)
         elif preset_mode == SPEED_LOW:
-            self.the_client.set_speed(self.device, Speed.LOW)
+            await self.coordinator.async_set_speed(Speed.LOW)
         elif preset_mode == SPEED_OFF:
-            self.the_client.set_speed(self.device, Speed.OFF)
+            await self.coordinator.async_set_speed(Speed.OFF)
         elif preset_mode == SPEED_MANUAL:
-            self.the_client.set_speed(self.device, Speed.MANUAL)
-        self._attr_preset_mode = preset_mode
+            await self.coordinator.async_set_speed(Speed.MANUAL)
 
     @property
     def mode(self):
         """Return the current mode"""
-        return self._mode
+        if self._state is None:
+            return None
+        return self._state.mode
 
-    def set_mode(self, mode):
+    async def async_set_mode(self, mode):
         """Set the fan mode."""
         if mode == MODE_OUT:
             mode = 0
@@ -259,35 +252,140 @@ class DukaOneFan(FanEntity, DukaEntity):
             mode = 1
         elif mode == MODE_IN:
             mode = 2
-        self.the_client.set_mode(self.device, mode)
+        await self.coordinator.async_set_mode(mode)
 
     # pylint: disable=arguments-differ
-    def turn_on(
+    async def async_turn_on(
         self,
         speed: str = None,
         **kwargs,
     ) -> None:
         """Turn on the entity."""
         if speed is not None:
-            self.set_preset_mode(speed)
+            await self.async_set_preset_mode(speed)
         else:
-            self.the_client.turn_on(self.device)
+            await self.coordinator.async_turn_on()
 
-    def turn_off(self, **kwargs) -> None:
+    async def async_turn_off(self, **kwargs) -> None:
         """Turn off the entity."""
-        self.the_client.turn_off(self.device)
+        await self.coordinator.async_turn_off()
         return
 
-    def reset_filter_timer(self):
+    async def async_reset_filter_timer(self):
         """Reset the filter timer to 90 days"""
-        self.the_client.reset_filter_alarm(self.device)
+        await self.the_client.async_reset_filter_alarm(self.device)
         return
 
-    def set_manual_speed(self, manual_speed: int):
+    async def async_set_manual_speed(self, manual_speed: int):
         """Set the manual fan speed"""
-        self.the_client.set_manual_speed(self.device, manual_speed)
+        await self.coordinator.async_set_manual_speed(
+            manual_speed, self.coordinator.debounce
+        )
         return
 
     @property
     def device_info(self):
         return self.dukaone_device_info()
+
+
+class DukaOneGroupFan(FanEntity):
+    """A fan controlling a group of Duka One devices in lockstep.
+
+    The in_sync attribute is false while a member reports another speed or
+    mode than the group, or is not set up.
+    """
+
+    _attr_should_poll = False
+    _attr_percentage_step = 1
+    _attr_supported_features = (
+        FanEntityFeature.SET_SPEED
+        | FanEntityFeature.PRESET_MODE
+        | FanEntityFeature.TURN_ON
+        | FanEntityFeature.TURN_OFF
+    )
+    _attr_preset_modes = [SPEED_OFF, SPEED_LOW, SPEED_MEDIUM, SPEED_HIGH, SPEED_MANUAL]
+
+    def __init__(self, group: DukaGroup, name: str):
+        """Initialize the group fan."""
+        self._group = group
+        self._attr_name = name
+        self._attr_unique_id = f"group_{group.entry.entry_id}"
+
+    async def async_added_to_hass(self):
+        """Subscribe to group changes."""
+        self.async_on_remove(self._group.add_listener(self._async_group_changed))
+
+    @callback
+    def _async_group_changed(self):
+        self.async_write_ha_state()
+
+    @property
+    def _state(self) -> FanState | None:
+        if self._group.state is None:
+            return None
+        return fan_state(self._group.state)
+
+    @property
+    def is_on(self):
+        """Return true if the group is on."""
+        state = self._state
+        return None if state is None else state.preset_mode != SPEED_OFF
+
+    @property
+    def percentage(self):
+        """Return the speed as a percentage."""
+        state = self._state
+        return None if state is None else state.percentage
+
+    @property
+    def preset_mode(self):
+        """Return the speed as a preset mode."""
+        state = self._state
+        return None if state is None else state.preset_mode
+
+    @property
+    def extra_state_attributes(self):
+        """Return the mode and if the members follow the group."""
+        state = self._state
+        return {
+            ATTR_MODE: None if state is None else state.mode,
+            "in_sync": self._group.in_sync,
+        }
+
+    async def async_set_percentage(self, percentage: int) -> None:
+        """Set the speed of the members, as a percentage."""
+        await self._group.async_set_manual_speed(
+            int(percentage * 255 / 100), self._group.debounce
+        )
+
+    async def async_set_preset_mode(self, preset_mode: str):
+        """Set the preset mode of the members."""
+        if preset_mode == SPEED_MANUAL:
+            await self._group.async_set_speed(Speed.MANUAL)
+        else:
+            await self._group.async_set_speed(Speed[preset_mode.upper()])
+
+    async def async_set_mode(self, mode):
+        """Set the mode of the members."""
+        modes = {MODE_OUT: Mode.ONEWAY, MODE_INOUT: Mode.TWOWAY, MODE_IN: Mode.IN}
+        await self._group.async_set_mode(modes.get(mode, mode))
+
+    # pylint: disable=arguments-differ
+    async def async_turn_on(self, speed: str = None, **kwargs) -> None:
+        """Turn on the members."""
+        if speed is not None:
+            await self.async_set_preset_mode(speed)
+        else:
+            await self._group.async_turn_on()
+
+    async def async_turn_off(self, **kwargs) -> None:
+        """Turn off the members."""
+        await self._group.async_turn_off()
+
+    async def async_reset_filter_timer(self):
+        """Reset the filter timer of the members"""
+        await self._group.async_reset_filter_alarm()
+
+    async def async_set_manual_speed(self, manual_speed: int):
+        """Set the manual speed of the members"""
+        await self._group.async_set_manual_speed(manual_speed, self._group.debounce)
@@ -0,0 +1,303 @@
+"""Keep a group of duka one devices in lockstep.
+
+Units are often installed in pairs, one blowing out while the other blows in.
+A group sends every speed and mode change to all its members at once, and
+sends a command of the group again to a member reporting another speed or
+mode. Until the group is commanded it follows the state of its first member.
+
+Inverted members run the opposite direction: out becomes in and in becomes
+out, so a pair with one inverted member gives balanced ventilation.
+"""
+
+import asyncio
+from dataclasses import replace
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import CONF_INVERTED, CONF_MEMBERS
+from .coordinator import DukaCoordinator
+from .device import Device, DeviceState, Mode, Speed
+
+_LOGGER = logging.getLogger(__name__)
+
+_INVERTED_MODE = {Mode.ONEWAY: Mode.IN, Mode.IN: Mode.ONEWAY, Mode.TWOWAY: Mode.TWOWAY}
+
+
+class DukaGroupError(HomeAssistantError):
+    """Raised when a command failed on some members of a group."""
+
+    def __init__(self, failed: dict[str, Exception]):
+        super().__init__(f"Duka one group members {', '.join(failed)} failed")
+        self.failed = failed
+
+
+class DukaGroup:
+    """The members of a group entry and the state they are kept at.
+
+    The members are the coordinators of device entries. They are attached when
+    their entry is set up, so the group and the members can be set up in any
+    order.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry: ConfigEntry):
+        self.hass = hass
+        self.entry = entry
+        self.members: tuple[str, ...] = tuple(entry.data[CONF_MEMBERS])
+        self._inverted = frozenset(entry.data.get(CONF_INVERTED, ()))
+        self._coordinators: dict[str, DukaCoordinator] = {}
+        self._remove_listeners: dict[str, object] = {}
+        # The speed, manual speed and mode commanded by the group. Only these
+        # are sent again to a member that has drifted
+        self._commanded: dict[str, object] = {}
+        self._on_speed: Speed = None
+        self._on_manualspeed: int = None
+        self._dispatching = 0
+        self._correcting: set[str] = set()
+        self._listeners = []
+
+    @property
+    def state(self) -> DeviceState:
+        """Return the state of the group, None until a member has reported.
+
+        The values not commanded by the group are those of the first member.
+        """
+        state = self._first_member_state()
+        if state is None and not self._commanded:
+            return None
+        return replace(state or DeviceState(), **self._commanded)
+
+    @property
+    def coordinators(self) -> list[DukaCoordinator]:
+        """Return the coordinators of the members that are set up."""
+        return list(self._coordinators.values())
+
+    @property
+    def debounce(self) -> float:
+        """Return the longest debounce of manual speed changes of the members."""
+        return max(
+            (coordinator.debounce for coordinator in self._coordinators.values()),
+            default=0,
+        )
+
+    @property
+    def in_sync(self) -> bool:
+        """Return True if all members report the state of the group."""
+        state = self.state
+        return len(self._coordinators) == len(self.members) and not any(
+            self._differs(device_id, state) for device_id in self._coordinators
+        )
+
+    def add_listener(self, listener):
+        """Add a callback called when the group state changes.
+
+        Returns a function removing the callback again.
+        """
+        self._listeners.append(listener)
+
+        def remove_listener():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return remove_listener
+
+    @callback
+    def async_attach(self, coordinator: DukaCoordinator) -> None:
+        """Follow a member that has been set up."""
+        device = coordinator.device
+        if device.device_id not in self.members:
+            return
+        self.async_detach(device.device_id)
+        self._coordinators[device.device_id] = coordinator
+        self._remove_listeners[device.device_id] = device.add_listener(
+            self._async_member_changed
+        )
+        self._async_member_changed(device)
+
+    @callback
+    def async_detach(self, device_id: str) -> None:
+        """Stop following a member that is unloaded."""
+        remove_listener = self._remove_listeners.pop(device_id, None)
+        if remove_listener is not None:
+            remove_listener()
+        if self._coordinators.pop(device_id, None) is not None:
+            self._async_notify()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop following the members."""
+        for device_id in list(self._coordinators):
+            self.async_detach(device_id)
+        self._listeners.clear()
+
+    async def async_set_speed(self, speed: Speed) -> None:
+        """Set the speed of all members."""
+        self._set(speed=speed)
+        await self._async_dispatch(
+            lambda coordinator, device_id: coordinator.async_set_speed(speed)
+        )
+
+    async def async_set_manual_speed(
+        self, manualspeed: int, debounce: float = 0
+    ) -> None:
+        """Set the manual speed (0-255) of all members."""
+        self._set(speed=Speed.MANUAL, manualspeed=manualspeed)
+        await self._async_dispatch(
+            lambda coordinator, device_id: coordinator.async_set_manual_speed(
+                manualspeed, debounce
+            )
+        )
+
+    async def async_set_mode(self, mode: Mode) -> None:
+        """Set the mode of all members, inverted for the inverted members."""
+        self._set(mode=Mode(mode))
+        await self._async_dispatch(
+            lambda coordinator, device_id: coordinator.async_set_mode(
+                self._member_mode(device_id, mode)
+            )
+        )
+
+    async def async_turn_on(self) -> None:
+        """Turn on all members at the last speed of the group.
+
+        Without a speed commanded yet, every member returns to its own last
+        speed and the group follows the first member again.
+        """
+        if self._on_speed == Speed.MANUAL and self._on_manualspeed is not None:
+            await self.async_set_manual_speed(self._on_manualspeed)
+        elif self._on_speed is not None:
+            await self.async_set_speed(self._on_speed)
+        else:
+            self._commanded.pop("speed", None)
+            self._async_notify()
+            await self._async_dispatch(
+                lambda coordinator, device_id: coordinator.async_turn_on()
+            )
+
+    async def async_turn_off(self) -> None:
+        """Turn off all members."""
+        await self.async_set_speed(Speed.OFF)
+
+    async def async_reset_filter_alarm(self) -> None:
+        """Reset the filter alarm of all members."""
+        await self._async_dispatch(
+            lambda coordinator, device_id: coordinator.client.async_reset_filter_alarm(
+                coordinator.device
+            )
+        )
+
+    def _set(self, **values) -> None:
+        """Command values of the group state."""
+        self._commanded.update(values)
+        speed = self._commanded.get("speed")
+        if speed not in (None, Speed.OFF):
+            self._on_speed = speed
+            self._on_manualspeed = self._commanded.get("manualspeed")
+        self._async_notify()
+
+    async def _async_dispatch(self, command) -> None:
+        """Send a command to all members concurrently.
+
+        All members are sent the command, even if some fail. Raises a
+        DukaGroupError with the members that failed.
+        """
+        coordinators = dict(self._coordinators)
+        self._dispatching += 1
+        try:
+            results = await asyncio.gather(
+                *(
+                    command(coordinator, device_id)
+                    for device_id, coordinator in coordinators.items()
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            self._dispatching -= 1
+        failed = {}
+        for device_id, result in zip(coordinators, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, Exception):
+                _LOGGER.warning("Duka one %s failed: %s", device_id, result)
+                failed[device_id] = result
+        self._async_notify()
+        if failed:
+            raise DukaGroupError(failed)
+
+    def _member_mode(self, device_id: str, mode: Mode) -> Mode:
+        if device_id in self._inverted:
+            return _INVERTED_MODE[mode]
+        return mode
+
+    def _first_member_state(self) -> DeviceState:
+        """Return the speed and mode of the first member that has reported."""
+        for device_id in self.members:
+            coordinator = self._coordinators.get(device_id)
+            if coordinator is not None and coordinator.device.mode is not None:
+                device = coordinator.device
+                return DeviceState(
+                    speed=device.speed,
+                    manualspeed=device.manualspeed,
+                    mode=self._member_mode(device_id, device.mode),
+                )
+        return None
+
+    def _differs(self, device_id: str, state: DeviceState) -> bool:
+        """Return True if a member reports another speed or mode than state."""
+        reported = self._coordinators[device_id].device.state
+        if state is None:
+            return False
+        if state.speed is not None and reported.speed != state.speed:
+            return True
+        if (
+            state.speed == Speed.MANUAL
+            and state.manualspeed is not None
+            and reported.manualspeed != state.manualspeed
+        ):
+            return True
+        return state.mode is not None and reported.mode != self._member_mode(
+            device_id, state.mode
+        )
+
+    @callback
+    def _async_member_changed(self, device: Device) -> None:
+        device_id = device.device_id
+        if (
+            self._commanded
+            and not self._dispatching
+            and device_id not in self._correcting
+            and self._differs(device_id, DeviceState(**self._commanded))
+        ):
+            _LOGGER.info("Duka one %s has drifted from its group", device_id)
+            self._correcting.add(device_id)
+            self.hass.async_create_task(self._async_correct(device_id))
+        self._async_notify()
+
+    async def _async_correct(self, device_id: str) -> None:
+        """Send the commands of the group to a member that has drifted."""
+        state = DeviceState(**self._commanded)
+        try:
+            coordinator = self._coordinators.get(device_id)
+            if coordinator is None:
+                return
+            if state.speed == Speed.MANUAL and state.manualspeed is not None:
+                await coordinator.async_set_manual_speed(state.manualspeed)
+            elif state.speed is not None:
+                await coordinator.async_set_speed(state.speed)
+            if state.mode is not None:
+                await coordinator.async_set_mode(
+                    self._member_mode(device_id, state.mode)
+                )
+        except HomeAssistantError as err:
+            _LOGGER.warning(
+                "Duka one %s could not rejoin its group: %s", device_id, err
+            )
+        finally:
+            self._correcting.discard(device_id)
+
+    @callback
+    def _async_notify(self) -> None:
+        for listener in list(self._listeners):
+            listener()
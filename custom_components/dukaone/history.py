@@ -0,0 +1,110 @@
+"""Fixed size in-memory history of the device telemetry.
+
+The samples are kept in preallocated arrays used as a ring buffer, so a sample
+costs a few bytes and no objects are created per sample.
+"""
+
+from array import array
+import time
+
+from .device import Device
+
+# Number of samples kept per device
+HISTORY_SIZE = 2048
+# Seconds of history used for the statistics
+STATISTICS_WINDOW = 3600
+# Stored for a value the device has not reported
+MISSING = -1
+
+
+class TelemetryHistory:
+    """A ring buffer of humidity, speed and manual speed samples."""
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self._size = size
+        self._time = array("d", bytes(8 * size))
+        self._humidity = array("h", [MISSING]) * size
+        self._speed = array("h", [MISSING]) * size
+        self._manualspeed = array("h", [MISSING]) * size
+        # Index of the next sample and number of samples stored
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, device: Device, now: float = None) -> None:
+        """Add a sample of the device state."""
+        index = self._next
+        self._time[index] = time.time() if now is None else now
+        self._humidity[index] = _value(device.humidity)
+        self._speed[index] = _value(device.speed)
+        self._manualspeed[index] = _value(device.manualspeed)
+        self._next = (index + 1) % self._size
+        if self._count < self._size:
+            self._count += 1
+
+    def _indexes(self, since: float = None):
+        """Yield the indexes of the samples from the oldest, at or after since."""
+        first = (self._next - self._count) % self._size
+        for offset in range(self._count):
+            index = (first + offset) % self._size
+            if since is None or self._time[index] >= since:
+                yield index
+
+    def humidity_statistics(self, window: float = STATISTICS_WINDOW) -> dict:
+        """Return min, max, mean and change per hour of the humidity.
+
+        The change per hour is the slope between the first and the last sample
+        in the window.
+        """
+        times = self._time
+        humidity = self._humidity
+        count = 0
+        total = 0
+        low = high = None
+        first = last = None
+        for index in self._indexes(time.time() - window):
+            value = humidity[index]
+            if value == MISSING:
+                continue
+            if first is None:
+                first = index
+                low = high = value
+            low = min(low, value)
+            high = max(high, value)
+            total += value
+            count += 1
+            last = index
+        if not count:
+            return {"min": None, "max": None, "mean": None, "change_per_hour": None}
+        rate = None
+        elapsed = times[last] - times[first]
+        if elapsed > 0:
+            rate = round((humidity[last] - humidity[first]) * 3600 / elapsed, 1)
+        return {
+            "min": low,
+            "max": high,
+            "mean": round(total / count, 1),
+            "change_per_hour": rate,
+        }
+
+    def as_list(self, since: float = None) -> list[dict]:
+        """Return the samples from the oldest as a list of dicts."""
+        return [
+            {
+                "time": self._time[index],
+                "humidity": _restore(self._humidity[index]),
+                "speed": _restore(self._speed[index]),
+                "manual_speed": _restore(self._manualspeed[index]),
+            }
+            for index in self._indexes(since)
+        ]
+
+
+def _value(value: int | None) -> int:
+    return MISSING if value is None else value
+
+
+def _restore(value: int) -> int | None:
+    return None if value == MISSING else value
@@ -0,0 +1,198 @@
+"""Track the writes to a duka one device until the device has confirmed them.
+
+The protocol has no sequence numbers, so a write is confirmed by the value the
+device reports back for the parameter. Writes are sent as write-read packets,
+so the reply to the write itself is the verification read. A status poll
+reporting the written value confirms the write as well. A command without a
+state, like the filter reset, is confirmed by a check of the status it leaves
+behind instead, with the same retries.
+
+Only the parameters still unconfirmed are sent again, and each device is
+retried on its own, so a lossy device does not cause re-sends to the others.
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+
+from homeassistant.exceptions import HomeAssistantError
+
+from .device import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for the first confirmation. Doubled for every retry.
+ACK_TIMEOUT = 0.5
+MAX_RETRIES = 3
+# Relative random variation of the retry timeouts
+RETRY_JITTER = 0.2
+
+
+class CommandTimeout(HomeAssistantError):
+    """Raised when the device did not confirm a write.
+
+    A HomeAssistantError, so a failed service call is reported to the caller.
+    """
+
+
+class _Request:
+    """One write packet waiting for confirmation."""
+
+    __slots__ = ("sequence", "params", "future", "attempt", "handle")
+
+    def __init__(self, sequence: int, params: dict[int, int], future):
+        self.sequence = sequence
+        self.params = params
+        self.future: asyncio.Future = future
+        self.attempt = 0
+        self.handle: asyncio.TimerHandle = None
+
+
+class InflightTable:
+    """The unconfirmed writes to one device."""
+
+    def __init__(self, device: Device, send, timeout: float = ACK_TIMEOUT):
+        self._device = device
+        self._send = send
+        self._timeout = timeout
+        self._sequence = itertools.count(1)
+        # The latest request writing each parameter
+        self._pending: dict[int, _Request] = {}
+        # Commands waiting for a confirming status
+        self._waiting: set[asyncio.Future] = set()
+
+    def send(self, params: dict[int, int]) -> asyncio.Future:
+        """Send a write and return a future set when the device confirmed it.
+
+        The future fails with CommandTimeout if the write is still unconfirmed
+        after the retries. A later write of the same parameter supersedes the
+        earlier one, which is then no longer waited for.
+        """
+        loop = asyncio.get_running_loop()
+        request = _Request(next(self._sequence), dict(params), loop.create_future())
+        for parameter in params:
+            previous = self._pending.get(parameter)
+            if previous is not None:
+                self._confirm(previous, parameter)
+            self._pending[parameter] = request
+        self._transmit(request)
+        return request.future
+
+    def response_received(self, values: dict[int, int]) -> None:
+        """Confirm the writes reported back by a reply from the device."""
+        if not self._pending:
+            return
+        for parameter, value in values.items():
+            request = self._pending.get(parameter)
+            if request is None:
+                continue
+            if request.params[parameter] == value:
+                self._confirm(request, parameter)
+
+    async def async_confirm(self, send, confirmed) -> None:
+        """Send a command without a state until the device status confirms it.
+
+        send is called for every attempt and must request the status as well.
+        confirmed is called with the device on every change of the device.
+
+        Raises CommandTimeout if the command is still unconfirmed after the
+        retries.
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        def on_change(device: Device) -> None:
+            if not future.done() and confirmed(device):
+                future.set_result(None)
+
+        remove_listener = self._device.add_listener(on_change)
+        self._waiting.add(future)
+        try:
+            for attempt in range(MAX_RETRIES + 1):
+                if attempt:
+                    self._device.stats.command_retried()
+                    _LOGGER.debug(
+                        "Retry %d of command to %s", attempt, self._device.device_id
+                    )
+                send()
+                timeout = self._timeout * 2**attempt
+                timeout *= random.uniform(1 - RETRY_JITTER, 1 + RETRY_JITTER)
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout)
+                except TimeoutError:
+                    continue
+                return
+        finally:
+            remove_listener()
+            self._waiting.discard(future)
+        self._device.stats.command_failed()
+        raise CommandTimeout(
+            f"Duka one {self._device.device_id} did not confirm "
+            f"the command after {MAX_RETRIES} retries"
+        )
+
+    def cancel(self) -> None:
+        """Stop waiting for the writes."""
+        for request in set(self._pending.values()):
+            if request.handle is not None:
+                request.handle.cancel()
+            if not request.future.done():
+                request.future.cancel()
+        self._pending = {}
+        for future in self._waiting:
+            future.cancel()
+
+    def _confirm(self, request: _Request, parameter: int) -> None:
+        request.params.pop(parameter, None)
+        if self._pending.get(parameter) is request:
+            del self._pending[parameter]
+        if request.params:
+            return
+        if request.handle is not None:
+            request.handle.cancel()
+            request.handle = None
+        if not request.future.done():
+            request.future.set_result(None)
+
+    def _transmit(self, request: _Request) -> None:
+        try:
+            self._send(request.params)
+        except OSError as exc:
+            self._fail(request, exc)
+            return
+        timeout = self._timeout * 2**request.attempt
+        timeout *= random.uniform(1 - RETRY_JITTER, 1 + RETRY_JITTER)
+        loop = asyncio.get_running_loop()
+        request.handle = loop.call_later(timeout, self._timed_out, request)
+
+    def _timed_out(self, request: _Request) -> None:
+        request.handle = None
+        if not request.params:
+            return
+        if request.attempt >= MAX_RETRIES:
+            self._device.stats.command_failed()
+            self._fail(
+                request,
+                CommandTimeout(
+                    f"Duka one {self._device.device_id} did not confirm "
+                    f"the command after {MAX_RETRIES} retries"
+                ),
+            )
+            return
+        request.attempt += 1
+        self._device.stats.command_retried()
+        _LOGGER.debug(
+            "Retry %d of write %d to %s",
+            request.attempt,
+            request.sequence,
+            self._device.device_id,
+        )
+        self._transmit(request)
+
+    def _fail(self, request: _Request, exc: Exception) -> None:
+        for parameter in request.params:
+            if self._pending.get(parameter) is request:
+                del self._pending[parameter]
+        request.params = {}
+        if not request.future.done():
+            request.future.set_exception(exc)
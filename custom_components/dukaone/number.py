@@ -0,0 +1,75 @@
+"""
+Number platform for Duka One fan.
+
+see http://www.dingus.dk for more information
+"""
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from homeassistant.components.number import (
+    NumberEntity,
+    NumberEntityDescription,
+    NumberMode,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import DukaEntityComponent
+from .const import DOMAIN
+from .coordinator import DukaCoordinator
+from .device import DeviceState
+from .dukaentity import DukaDescribedEntity, async_add_described_entities
+
+
+@dataclass(frozen=True, kw_only=True)
+class DukaOneNumberDescription(NumberEntityDescription):
+    """Describe a number showing and setting a device value."""
+
+    value_fn: Callable[[DeviceState], int | None]
+    set_fn: Callable[[DukaCoordinator, int], Awaitable[None]]
+
+
+NUMBERS = (
+    DukaOneNumberDescription(
+        key="manual_speed",
+        name="Manual speed",
+        icon="mdi:fan",
+        native_min_value=0,
+        native_max_value=255,
+        native_step=1,
+        mode=NumberMode.SLIDER,
+        value_fn=lambda state: state.manualspeed,
+        set_fn=lambda coordinator, value: coordinator.async_set_manual_speed(
+            value, coordinator.debounce
+        ),
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities
+) -> None:
+    """Set up Duka One numbers based on a config entry."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    async_add_described_entities(
+        component.coordinators[entry.entry_id],
+        NUMBERS,
+        DukaOneNumber,
+        async_add_entities,
+    )
+
+
+class DukaOneNumber(DukaDescribedEntity, NumberEntity):
+    """A number showing and setting a value of a Duka One device."""
+
+    entity_description: DukaOneNumberDescription
+
+    @property
+    def native_value(self):
+        """Return the value."""
+        return self.entity_description.value_fn(self.coordinator.state)
+
+    async def async_set_native_value(self, value: float) -> None:
+        """Set the value on the device."""
+        await self.entity_description.set_fn(self.coordinator, int(value))
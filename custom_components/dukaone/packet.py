@@ -0,0 +1,307 @@
+"""Encode and decode the udp packets used by the duka one devices."""
+
+from enum import IntEnum
+import struct
+
+from .device import Speed
+
+SEARCH_DEVICE_ID = "DEFAULT_DEVICEID"
+
+
+class Func(IntEnum):
+    """The function of a packet."""
+
+    READ = 1
+    WRITE = 2
+    WRITEREAD = 3
+    INCREAD = 4
+    DECREAD = 5
+    RESPONSE = 6
+
+
+class Parameter(IntEnum):
+    """The device parameters used by the integration."""
+
+    ON_OFF = 0x01
+    SPEED = 0x02
+    CURRENT_HUMIDITY = 0x25
+    MANUAL_SPEED = 0x44
+    FAN1RPM = 0x4A
+    FILTER_TIMER = 0x64
+    RESET_FILTER_TIMER = 0x65
+    SEARCH = 0x7C
+    RESET_ALARMS = 0x80
+    READ_ALARM = 0x83
+    READ_FIRMWARE_VERSION = 0x86
+    FILTER_ALARM = 0x88
+    VENTILATION_MODE = 0xB7
+    UNIT_TYPE = 0xB9
+
+
+PARAMETER_SIZE = {
+    0x01: 1,  # On off
+    0x02: 1,  # Speed 1-3 255=manual
+    0x06: 1,  # Boot mode
+    0x07: 1,  # Timer mode
+    0x0B: 3,  # Timer countdown
+    0x0F: 1,  # Humidity sensor activation
+    0x14: 1,  # Relay sensor activation
+    0x16: 1,  # 0-10v sensor activation
+    0x19: 1,  # Humidity threshold
+    0x24: 2,  # Current RTC battery voltage 0-5000mv
+    0x25: 1,  # Current humidity 0-100
+    0x2D: 1,  # Current 0-10v sensor 0-100
+    0x32: 1,  # Current relay sensor state
+    0x44: 1,  # Manual speed
+    0x4A: 2,  # Fan 1 speed 0-5000rpm
+    0x4B: 2,  # Fan 2 speed 0-5000rpm
+    0x64: 3,  # Filter timer byte 1=minutes, byte 2=hours, byte 3=days
+    0x65: 1,  # Reset filter timer (1 byte data is ignored)
+    0x66: 1,  # Boost mode deactivation delay 0-60 minutes
+    0x6F: 3,  # RTC time
+    0x70: 4,  # RTC calender
+    0x72: 1,  # Weekly schedule
+    0x77: 6,  # Schedule setup
+    0x7C: 16,  # device search
+    0x7D: 0,  # Device password
+    0x7E: 4,  # Machine hours
+    0x80: 1,  # Reset alarms
+    0x83: 1,  # Alarm indicator 0=no,1=Alarm, 2=warning
+    0x85: 1,  # Cloud server operation permission
+    0x86: 6,  # Firmware version and date
+    0x87: 1,  # Restore factory settings
+    0x88: 1,  # Filter replacement 0=ok, 1=replace
+    0x94: 1,  # Wifi mode
+    0x95: 0,  # Wifi name in client mode
+    0x96: 0,  # Wifi password
+    0x99: 1,  # Wifi encryption
+    0x9A: 1,  # Wifi channel 1-13
+    0x9B: 1,  # Wifi DHCP
+    0x9C: 4,  # IP Address
+    0x9D: 4,  # Subnet mask
+    0x9E: 4,  # Gateway
+    0xB7: 1,  # Ventilator mode 0=ventilation,1=heat recovery,2=supply
+    0xB9: 2,  # Unit type
+}
+
+STATUS_PARAMETERS = (
+    Parameter.ON_OFF,
+    Parameter.VENTILATION_MODE,
+    Parameter.SPEED,
+    Parameter.MANUAL_SPEED,
+    Parameter.FAN1RPM,
+    Parameter.FILTER_ALARM,
+    Parameter.FILTER_TIMER,
+    Parameter.CURRENT_HUMIDITY,
+    Parameter.READ_ALARM,
+)
+
+
+def calc_checksum(data, size: int) -> int:
+    """Calculate the checksum of the first size bytes of a packet."""
+    return sum(memoryview(data)[2:size]) & 0xFFFF
+
+
+def build_packet(device_id: str, password: str, func: Func, payload) -> bytes:
+    """Build a packet with header, payload and checksum."""
+    data = bytearray((0xFD, 0xFD, 0x02, len(device_id)))
+    data += device_id.encode("ascii")
+    data.append(len(password))
+    data += password.encode("ascii")
+    data.append(func)
+    data += bytes(payload)
+    checksum = calc_checksum(data, len(data))
+    data.append(checksum & 0xFF)
+    data.append(checksum >> 8)
+    return bytes(data)
+
+
+def build_read(device_id: str, password: str, parameters) -> bytes:
+    """Build a packet reading the parameters."""
+    return build_packet(device_id, password, Func.READ, parameters)
+
+
+def build_write(
+    device_id: str, password: str, params: dict[int, int], func=Func.WRITEREAD
+) -> bytes:
+    """Build a packet writing the parameters and reading back the result.
+
+    With Func.WRITE the device does not answer.
+    """
+    payload = bytearray()
+    for parameter, value in params.items():
+        payload.append(parameter)
+        payload.append(value)
+    return build_packet(device_id, password, func, payload)
+
+
+def build_search() -> bytes:
+    """Build a broadcast search packet."""
+    return build_read(SEARCH_DEVICE_ID, "", (Parameter.SEARCH,))
+
+
+_UINT16 = struct.Struct("<H")
+_FIRMWARE = struct.Struct("<BBBBH")
+_FILTER_TIMER = struct.Struct("<BBB")
+
+
+def _decode_fan1rpm(data: memoryview, pos: int) -> int:
+    return _UINT16.unpack_from(data, pos)[0]
+
+
+def _decode_filter_timer(data: memoryview, pos: int) -> int:
+    minutes, hours, days = _FILTER_TIMER.unpack_from(data, pos)
+    return minutes + (days * 24 + hours) * 60
+
+
+def _decode_firmware(data: memoryview, pos: int) -> tuple[str, str]:
+    major, minor, day, month, year = _FIRMWARE.unpack_from(data, pos)
+    return f"{major}.{minor}", f"{day}-{month}-{year}"
+
+
+def _decode_search(data: memoryview, pos: int) -> str:
+    return str(data[pos : pos + 16], "ascii", "replace")
+
+
+def _decode_byte(data: memoryview, pos: int) -> int:
+    return data[pos]
+
+
+# The packet attribute set from each parameter and how its data is decoded
+_DECODERS = {
+    Parameter.ON_OFF: ("is_on", lambda data, pos: data[pos] != 0),
+    Parameter.SPEED: ("speed", _decode_byte),
+    Parameter.MANUAL_SPEED: ("manualspeed", _decode_byte),
+    Parameter.FAN1RPM: ("fan1rpm", _decode_fan1rpm),
+    Parameter.CURRENT_HUMIDITY: ("humidity", _decode_byte),
+    Parameter.VENTILATION_MODE: ("mode", _decode_byte),
+    Parameter.UNIT_TYPE: ("unit_type", _decode_byte),
+    Parameter.READ_ALARM: ("alarm", _decode_byte),
+    Parameter.FILTER_ALARM: ("filter_alarm", _decode_byte),
+    Parameter.FILTER_TIMER: ("filter_timer", _decode_filter_timer),
+    Parameter.SEARCH: ("search_device_id", _decode_search),
+}
+
+
+class ResponsePacket:
+    """A udp data packet received from a duka device.
+
+    The data is parsed in place through a memoryview, only the decoded values
+    are created.
+    """
+
+    __slots__ = (
+        "device_id",
+        "device_password",
+        "is_on",
+        "speed",
+        "manualspeed",
+        "fan1rpm",
+        "humidity",
+        "mode",
+        "filter_alarm",
+        "filter_timer",
+        "alarm",
+        "search_device_id",
+        "firmware_version",
+        "firmware_date",
+        "unit_type",
+        "values",
+    )
+
+    def __init__(self):
+        self.device_id: str = None
+        self.device_password: str = None
+        self.is_on: bool = None
+        self.speed: Speed = None
+        self.manualspeed: int = None
+        self.fan1rpm: int = None
+        self.humidity: int = None
+        self.mode: int = None
+        self.filter_alarm: int = None
+        self.filter_timer: int = None
+        self.alarm: int = None
+        self.search_device_id: str = None
+        self.firmware_version: str = None
+        self.firmware_date: str = None
+        self.unit_type: int = None
+        # First data byte of each parameter, used to confirm writes. The
+        # parameters of other pages than the first have the page as high byte.
+        self.values: dict[int, int] = {}
+
+    def initialize_from_data(self, data) -> bool:
+        """Initialize a packet from data received from the device.
+
+        Returns False if the data is invalid
+        """
+        view = memoryview(data)
+        size = len(view)
+        if size < 6 or view[0] != 0xFD or view[1] != 0xFD or view[2] != 0x02:
+            return False
+        end = size - 2
+        if calc_checksum(view, end) != _UINT16.unpack_from(view, end)[0]:
+            return False
+        try:
+            self.device_id, pos = _read_string(view, 3, end)
+            self.device_password, pos = _read_string(view, pos, end)
+            if pos >= end or view[pos] != Func.RESPONSE:
+                return False
+            return self._read_parameters(view, pos + 1, end)
+        except (IndexError, struct.error):
+            return False
+
+    def _read_parameters(self, data: memoryview, pos: int, end: int) -> bool:
+        values = self.values
+        page = 0
+        while pos < end:
+            parameter = data[pos]
+            if parameter == 0xFF:
+                # switch to the parameters of another page
+                if pos + 2 > end:
+                    return False
+                page = data[pos + 1]
+                pos += 2
+                continue
+            if parameter == 0xFD:
+                # the device does not support the next parameter
+                if pos + 2 > end:
+                    return False
+                pos += 2
+                continue
+            if parameter == 0xFE:
+                # change parameter size
+                if pos + 3 > end:
+                    return False
+                size = data[pos + 1]
+                parameter = page << 8 | data[pos + 2]
+                pos += 3
+            else:
+                parameter |= page << 8
+                size = PARAMETER_SIZE.get(parameter)
+                if size is None:
+                    return False
+                pos += 1
+            if pos + size > end:
+                return False
+            if size:
+                values[parameter] = data[pos]
+                decoder = _DECODERS.get(parameter)
+                if decoder is not None:
+                    setattr(self, decoder[0], decoder[1](data, pos))
+                elif parameter == Parameter.READ_FIRMWARE_VERSION:
+                    self.firmware_version, self.firmware_date = _decode_firmware(
+                        data, pos
+                    )
+            pos += size
+        if self.is_on is not None and not self.is_on:
+            self.speed = Speed.OFF
+        return True
+
+
+def _read_string(data: memoryview, pos: int, end: int) -> tuple[str, int]:
+    """Read a string prefixed by its length. Returns the string and new pos."""
+    strlen = data[pos]
+    pos += 1
+    if pos + strlen > end:
+        raise IndexError("string exceeds the packet")
+    return str(data[pos : pos + strlen], "ascii", "replace"), pos + strlen
@@ -0,0 +1,251 @@
+"""Weekly ventilation programs run by the integration.
+
+A schedule is a text with one program per line, like
+
+    mon-fri 06:30 high inout
+    mon-fri 08:00 low
+    sat,sun 09:00 120
+    daily 22:00 off
+
+A program sets the speed, a manual speed (0-255) and/or the mode at the time
+on the days given. The days are "daily" or a comma separated list of days and
+day ranges. Empty lines and lines starting with # are ignored.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+import heapq
+import itertools
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_track_point_in_utc_time
+import homeassistant.util.dt as dt_util
+
+from .const import CONF_SCHEDULE
+from .coordinator import DukaCoordinator
+from .device import Mode, Speed
+from .services import MODES, SPEEDS
+
+_LOGGER = logging.getLogger(__name__)
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+class ScheduleError(vol.Invalid):
+    """Raised when a schedule cannot be parsed.
+
+    A vol.Invalid, so parse_schedule can validate the schedule of a schema.
+    """
+
+
+@dataclass(frozen=True, slots=True)
+class Program:
+    """A change of the speed and mode at a time of day on some weekdays."""
+
+    days: frozenset[int]
+    minute: int
+    speed: Speed = None
+    manual_speed: int = None
+    mode: Mode = None
+
+    def next_run(self, now: datetime) -> datetime:
+        """Return the first time the program runs after now (local time)."""
+        at = time(self.minute // 60, self.minute % 60)
+        for offset in range(8):
+            day = now.date() + timedelta(days=offset)
+            if day.weekday() not in self.days:
+                continue
+            when = datetime.combine(day, at, now.tzinfo)
+            if when > now:
+                return when
+        raise ScheduleError("program without days")
+
+
+def parse_schedule(text: str) -> list[Program]:
+    """Parse a schedule. Raises ScheduleError naming the invalid line."""
+    programs = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            programs.append(_parse_program(line.lower().split()))
+        except ScheduleError as err:
+            raise ScheduleError(f"line {number}: {err}") from None
+    return programs
+
+
+def _parse_program(tokens: list[str]) -> Program:
+    if len(tokens) < 3:
+        raise ScheduleError("expected days, time and speed or mode")
+    days = _parse_days(tokens[0])
+    minute = _parse_time(tokens[1])
+    speed = manual_speed = mode = None
+    for token in tokens[2:]:
+        if token in SPEEDS and speed is None and manual_speed is None:
+            speed = SPEEDS[token]
+        elif token.isdigit() and speed is None and manual_speed is None:
+            manual_speed = int(token)
+            if manual_speed > 255:
+                raise ScheduleError(f"manual speed {token} is above 255")
+        elif token in MODES and mode is None:
+            mode = MODES[token]
+        else:
+            raise ScheduleError(f"unexpected {token}")
+    return Program(days, minute, speed, manual_speed, mode)
+
+
+def _parse_days(token: str) -> frozenset[int]:
+    if token == "daily":
+        return frozenset(range(7))
+    days = set()
+    for part in token.split(","):
+        first, dash, last = part.partition("-")
+        if first not in DAYS or (dash and last not in DAYS):
+            raise ScheduleError(f"invalid days {token}")
+        day = DAYS.index(first)
+        end = DAYS.index(last or first)
+        days.add(day)
+        # A range can wrap around the week, like fri-mon
+        while day != end:
+            day = (day + 1) % 7
+            days.add(day)
+    return frozenset(days)
+
+
+def _parse_time(token: str) -> int:
+    hours, _, minutes = token.partition(":")
+    if not (hours.isdigit() and minutes.isdigit()):
+        raise ScheduleError(f"invalid time {token}")
+    if int(hours) > 23 or int(minutes) > 59:
+        raise ScheduleError(f"invalid time {token}")
+    return int(hours) * 60 + int(minutes)
+
+
+class _EntryPrograms:
+    """The programs of one config entry in the wheel."""
+
+    __slots__ = ("coordinator", "count", "removed")
+
+    def __init__(self, coordinator: DukaCoordinator, count: int):
+        self.coordinator = coordinator
+        self.count = count
+        self.removed = False
+
+
+class ProgramWheel:
+    """Run the programs of all devices from one timer.
+
+    The next run of every program is kept in a heap ordered by time, and the
+    timer is only set for the earliest run. The integration wakes once per
+    program change across the fleet, and not at all between them.
+
+    The runs of removed programs are left in the heap and skipped when they
+    come up. The heap is compacted once most of it is stale.
+    """
+
+    def __init__(self, hass: HomeAssistant):
+        self._hass = hass
+        self._heap: list[tuple[float, int, _EntryPrograms, Program]] = []
+        self._entries: dict[str, _EntryPrograms] = {}
+        # Runs in the heap of removed programs
+        self._stale = 0
+        self._sequence = itertools.count()
+        self._cancel_timer: CALLBACK_TYPE = None
+        self._timer_at: float = None
+
+    @callback
+    def async_set(self, coordinator: DukaCoordinator) -> None:
+        """Run the programs in the options of the coordinator entry.
+
+        The programs replace the previous programs of the entry.
+        """
+        entry_id = coordinator.entry.entry_id
+        self._remove(entry_id)
+        try:
+            programs = parse_schedule(coordinator.entry.options.get(CONF_SCHEDULE, ""))
+        except ScheduleError as err:
+            _LOGGER.error(
+                "Invalid schedule of %s: %s", coordinator.device.device_id, err
+            )
+            programs = []
+        if programs:
+            entry = _EntryPrograms(coordinator, len(programs))
+            self._entries[entry_id] = entry
+            now = dt_util.now()
+            for program in programs:
+                self._push(entry, program, now)
+        self._async_arm()
+
+    @callback
+    def async_remove(self, entry_id: str) -> None:
+        """Stop running the programs of an entry."""
+        self._remove(entry_id)
+        self._async_arm()
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        entry.removed = True
+        self._stale += entry.count
+        if self._stale > len(self._heap) // 2:
+            self._heap = [item for item in self._heap if not item[2].removed]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _push(self, entry: _EntryPrograms, program: Program, now: datetime) -> None:
+        when = program.next_run(now).timestamp()
+        heapq.heappush(self._heap, (when, next(self._sequence), entry, program))
+
+    @callback
+    def _async_arm(self) -> None:
+        """Set the timer for the earliest run."""
+        while self._heap and self._heap[0][2].removed:
+            heapq.heappop(self._heap)
+            self._stale -= 1
+        when = self._heap[0][0] if self._heap else None
+        if when == self._timer_at:
+            return
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+        self._timer_at = when
+        if when is not None:
+            self._cancel_timer = async_track_point_in_utc_time(
+                self._hass, self._async_run_due, dt_util.utc_from_timestamp(when)
+            )
+
+    @callback
+    def _async_run_due(self, utc_now: datetime) -> None:
+        """Run the programs that are due and set the timer for the next."""
+        self._cancel_timer = None
+        self._timer_at = None
+        now = dt_util.as_local(utc_now)
+        timestamp = now.timestamp()
+        while self._heap and self._heap[0][0] <= timestamp:
+            _, _, entry, program = heapq.heappop(self._heap)
+            if entry.removed:
+                self._stale -= 1
+                continue
+            self._hass.async_create_task(_async_run(entry.coordinator, program))
+            self._push(entry, program, now)
+        self._async_arm()
+
+
+async def _async_run(coordinator: DukaCoordinator, program: Program) -> None:
+    """Send the changes of a program to the device."""
+    _LOGGER.debug("Running program %s on %s", program, coordinator.device.device_id)
+    try:
+        if program.manual_speed is not None:
+            await coordinator.async_set_manual_speed(program.manual_speed)
+        elif program.speed is not None:
+            await coordinator.async_set_speed(program.speed)
+        if program.mode is not None:
+            await coordinator.async_set_mode(program.mode)
+    except HomeAssistantError as err:
+        _LOGGER.warning("Program of %s failed: %s", coordinator.device.device_id, err)
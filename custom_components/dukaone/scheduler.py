@@ -0,0 +1,263 @@
+"""Adaptive status polling of the duka one devices.
+
+One timer serves the whole fleet. The devices are kept in a heap ordered by
+the time of their next poll, and the timer is armed for the first of them.
+
+* Devices that changed recently are polled at ACTIVE_POLL_INTERVAL. Only the
+  values in ACTIVITY_FIELDS count, not the filter timer counting down.
+* Devices that do not answer back off exponentially up to MAX_POLL_INTERVAL.
+* Polls are spread with a random jitter so the fleet does not poll in bursts.
+* Devices that have not answered RESOLVE_AFTER_MISSES polls are polled by
+  broadcast every other poll, to find a device that has got a new IP address.
+  The broadcasts back off with the polls.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+
+from .device import Device
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds between polls of a device that has changed within ACTIVE_PERIOD
+ACTIVE_POLL_INTERVAL = 1.0
+ACTIVE_PERIOD = 60.0
+# The values that make a device active when they change. The filter timer
+# changes every minute on a running device and is left out.
+ACTIVITY_FIELDS = ("speed", "manualspeed", "mode", "humidity", "filter_alarm", "alarm")
+# Upper limit in seconds for the back off of devices not answering
+MAX_POLL_INTERVAL = 300.0
+# Relative random variation of the poll intervals
+JITTER = 0.1
+# Missed polls before a device is polled by broadcast
+RESOLVE_AFTER_MISSES = 2
+
+
+class _PollState:
+    """Poll bookkeeping for one device."""
+
+    __slots__ = (
+        "device",
+        "interval",
+        "due",
+        "misses",
+        "last_poll",
+        "last_change",
+        "activity",
+        "remove_listener",
+        "queued",
+        "removed",
+    )
+
+    def __init__(self, device: Device, interval: float):
+        self.device = device
+        self.interval = interval
+        self.due = 0.0
+        self.misses = 0
+        self.last_poll: float = None
+        self.last_change: float = None
+        self.activity = _activity(device)
+        self.remove_listener = None
+        # Whether the next poll is in the heap and the device has been removed
+        self.queued = False
+        self.removed = False
+
+
+class PollScheduler:
+    """Poll the devices from a single timer."""
+
+    def __init__(self, poll):
+        # Called with the device and True if the device should be polled by
+        # broadcast
+        self._poll = poll
+        self._states: dict[str, _PollState] = {}
+        self._heap: list = []
+        # Entries in the heap of removed devices or of superseded polls
+        self._stale = 0
+        self._counter = itertools.count()
+        self._handle: asyncio.TimerHandle = None
+        self._armed_due: float = None
+        self._running = False
+        self._in_run = False
+
+    def add(self, device: Device, interval: float) -> None:
+        """Start polling a device.
+
+        The first poll is placed randomly within the first interval to stagger
+        devices that are added at the same time.
+        """
+        if device.device_id in self._states:
+            return
+        state = _PollState(device, interval)
+        state.remove_listener = device.add_listener(
+            lambda changed: self._on_change(state)
+        )
+        self._states[device.device_id] = state
+        self._schedule(state, self._now() + random.uniform(0.5, 1.0) * interval)
+
+    def remove(self, device_id: str) -> None:
+        """Stop polling a device.
+
+        The entry of the device is left in the heap and skipped when it comes
+        up. The heap is compacted once most of it is stale, so devices added
+        and removed again and again do not grow it.
+        """
+        state = self._states.pop(device_id, None)
+        if state is None:
+            return
+        state.remove_listener()
+        # The stale entry in the heap must not keep the device alive
+        state.device = state.remove_listener = None
+        state.removed = True
+        if state.queued:
+            self._stale += 1
+        if self._stale > len(self._heap) // 2:
+            self._heap[:] = [item for item in self._heap if _is_live(item)]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def set_interval(self, device_id: str, interval: float) -> None:
+        """Set the poll interval of an idle device."""
+        state = self._states.get(device_id)
+        if state is None or state.interval == interval:
+            return
+        state.interval = interval
+        self._schedule(state, min(state.due, self._now() + interval))
+
+    def interval(self, device_id: str) -> float | None:
+        """Return the current effective poll interval of a device."""
+        state = self._states.get(device_id)
+        if state is None:
+            return None
+        return self._next_interval(state, self._now())
+
+    def start(self) -> None:
+        """Start the timer."""
+        self._running = True
+        self._arm()
+
+    def stop(self) -> None:
+        """Stop the timer."""
+        self._running = False
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._armed_due = None
+
+    def _now(self) -> float:
+        # Same clock as Device.last_seen
+        return time.monotonic()
+
+    def _on_change(self, state: _PollState) -> None:
+        """Poll a device more often once it starts changing."""
+        activity = _activity(state.device)
+        if activity == state.activity:
+            return
+        state.activity = activity
+        now = self._now()
+        state.last_change = now
+        if state.due > now + ACTIVE_POLL_INTERVAL:
+            self._schedule(state, now + ACTIVE_POLL_INTERVAL)
+
+    def _next_interval(self, state: _PollState, now: float) -> float:
+        if state.misses and not self._answered(state):
+            return min(state.interval * 2**state.misses, MAX_POLL_INTERVAL)
+        if state.last_change is not None and now - state.last_change < ACTIVE_PERIOD:
+            return min(state.interval, ACTIVE_POLL_INTERVAL)
+        return state.interval
+
+    def _schedule(self, state: _PollState, due: float) -> None:
+        if state.queued:
+            if due == state.due:
+                return
+            self._stale += 1
+        state.due = due
+        state.queued = True
+        heapq.heappush(self._heap, (due, next(self._counter), state))
+        if self._in_run:
+            return
+        if self._armed_due is None or due < self._armed_due:
+            self._arm()
+
+    def _arm(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._armed_due = None
+        if not self._running:
+            return
+        # Drop entries of removed devices and entries that have been rescheduled
+        heap = self._heap
+        while heap and not _is_live(heap[0]):
+            heapq.heappop(heap)
+            self._stale -= 1
+        if heap:
+            loop = asyncio.get_running_loop()
+            self._armed_due = heap[0][0]
+            self._handle = loop.call_later(
+                max(0.0, self._armed_due - self._now()), self._run
+            )
+
+    def _run(self) -> None:
+        """Poll the devices that are due."""
+        self._handle = None
+        self._armed_due = None
+        now = self._now()
+        heap = self._heap
+        self._in_run = True
+        try:
+            while heap and heap[0][0] <= now:
+                item = heapq.heappop(heap)
+                if not _is_live(item):
+                    self._stale -= 1
+                    continue
+                state = item[2]
+                state.queued = False
+                self._poll_device(state, now)
+        finally:
+            self._in_run = False
+        self._arm()
+
+    def _answered(self, state: _PollState) -> bool:
+        """Return True if the device answered the last poll."""
+        last_seen = state.device.last_seen
+        return last_seen is not None and last_seen >= state.last_poll
+
+    def _poll_device(self, state: _PollState, now: float) -> None:
+        device = state.device
+        if state.last_poll is not None:
+            if not self._answered(state):
+                device.stats.poll_missed()
+                state.misses += 1
+                if state.misses == 1:
+                    _LOGGER.debug("Duka one %s did not answer", device.device_id)
+            elif state.misses:
+                _LOGGER.debug("Duka one %s answers again", device.device_id)
+                state.misses = 0
+        state.last_poll = now
+        # Every other poll is still sent to the address, as a device in
+        # another subnet is only reached there. A device that never answered
+        # may have moved before it was added, so it is searched at once.
+        if device.last_seen is None:
+            resolve = state.misses % 2 == 1
+        else:
+            resolve = state.misses >= RESOLVE_AFTER_MISSES and state.misses % 2 == 0
+        self._poll(device, resolve)
+        interval = self._next_interval(state, now)
+        self._schedule(state, now + interval * random.uniform(1 - JITTER, 1 + JITTER))
+
+
+def _is_live(item: tuple) -> bool:
+    """Return True if a heap entry is the next poll of a polled device."""
+    due, _, state = item
+    return due == state.due and not state.removed
+
+
+def _activity(device: Device) -> tuple:
+    """Return the values of a device that make it active when they change."""
+    state = device.state
+    return tuple(getattr(state, name) for name in ACTIVITY_FIELDS)
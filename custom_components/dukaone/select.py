@@ -0,0 +1,69 @@
+"""
+Select platform for Duka One fan.
+
+see http://www.dingus.dk for more information
+"""
+
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from homeassistant.components.select import SelectEntity, SelectEntityDescription
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import DukaEntityComponent
+from .const import DOMAIN
+from .coordinator import DukaCoordinator
+from .device import DeviceState
+from .dukaentity import DukaDescribedEntity, async_add_described_entities
+from .services import MODES
+
+MODE_NAMES = {mode: name for name, mode in MODES.items()}
+
+
+@dataclass(frozen=True, kw_only=True)
+class DukaOneSelectDescription(SelectEntityDescription):
+    """Describe a select showing and setting a device value."""
+
+    value_fn: Callable[[DeviceState], str | None]
+    select_fn: Callable[[DukaCoordinator, str], Awaitable[None]]
+
+
+SELECTS = (
+    DukaOneSelectDescription(
+        key="mode",
+        name="Mode",
+        icon="mdi:swap-horizontal",
+        options=list(MODES),
+        value_fn=lambda state: MODE_NAMES.get(state.mode),
+        select_fn=lambda coordinator, option: coordinator.async_set_mode(MODES[option]),
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities
+) -> None:
+    """Set up Duka One selects based on a config entry."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    async_add_described_entities(
+        component.coordinators[entry.entry_id],
+        SELECTS,
+        DukaOneSelect,
+        async_add_entities,
+    )
+
+
+class DukaOneSelect(DukaDescribedEntity, SelectEntity):
+    """A select showing and setting a value of a Duka One device."""
+
+    entity_description: DukaOneSelectDescription
+
+    @property
+    def current_option(self):
+        """Return the selected option."""
+        return self.entity_description.value_fn(self.coordinator.state)
+
+    async def async_select_option(self, option: str) -> None:
+        """Set the option on the device."""
+        await self.entity_description.select_fn(self.coordinator, option)
@@ -4,65 +4,220 @@ Sensor platform for Duka One fan.
 see http://www.dingus.dk for more information
 """
 
-import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
 import logging
-import time
 
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_DEVICE_ID, CONF_NAME
+from homeassistant.const import CONF_NAME, EntityCategory, UnitOfTime
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity import Entity
 
-from .dukaentity import DukaEntity
+from . import DukaEntityComponent
+from .const import DOMAIN
+from .coordinator import DukaCoordinator
+from .device import DeviceState
+from .dukaentity import (
+    READY_TIMEOUT,
+    DukaDescribedEntity,
+    DukaEntity,
+    async_add_described_entities,
+)
+from .stats import DeviceStats
 
 _LOGGER = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True, kw_only=True)
+class DukaOneSensorDescription(SensorEntityDescription):
+    """Describe a sensor showing a device value."""
+
+    value_fn: Callable[[DeviceState], int | None]
+    # The change of the value written to the state
+    threshold_fn: Callable[[DukaCoordinator], float] = lambda coordinator: 0
+
+
+SENSORS = (
+    DukaOneSensorDescription(
+        key="filter_timer",
+        name="Filter timer",
+        icon="mdi:air-filter",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MINUTES,
+        suggested_unit_of_measurement=UnitOfTime.DAYS,
+        value_fn=lambda state: state.filter_timer,
+        threshold_fn=lambda coordinator: coordinator.filter_timer_threshold,
+    ),
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class DukaOneDiagnosticDescription(SensorEntityDescription):
+    """Describe a diagnostic sensor reading the device statistics."""
+
+    value_fn: Callable[[DeviceStats], float | int | datetime | None]
+
+
+def _last_seen(stats: DeviceStats) -> datetime | None:
+    if stats.last_seen is None:
+        return None
+    return datetime.fromtimestamp(stats.last_seen, timezone.utc)
+
+
+DIAGNOSTIC_SENSORS = (
+    DukaOneDiagnosticDescription(
+        key="latency_p50",
+        name="Latency p50",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.latency(50),
+    ),
+    DukaOneDiagnosticDescription(
+        key="latency_p90",
+        name="Latency p90",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.latency(90),
+    ),
+    DukaOneDiagnosticDescription(
+        key="latency_p99",
+        name="Latency p99",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda stats: stats.latency(99),
+    ),
+    DukaOneDiagnosticDescription(
+        key="packets_sent",
+        name="Packets sent",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.packets_sent,
+    ),
+    DukaOneDiagnosticDescription(
+        key="packets_received",
+        name="Packets received",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.packets_received,
+    ),
+    DukaOneDiagnosticDescription(
+        key="missed_polls",
+        name="Missed polls",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.missed_polls,
+    ),
+    DukaOneDiagnosticDescription(
+        key="failed_commands",
+        name="Failed commands",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.failed_commands,
+    ),
+    DukaOneDiagnosticDescription(
+        key="retries",
+        name="Retries",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.retries,
+    ),
+    DukaOneDiagnosticDescription(
+        key="stale_responses",
+        name="Stale responses",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.stale_responses,
+    ),
+    DukaOneDiagnosticDescription(
+        key="invalid_packets",
+        name="Invalid packets",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda stats: stats.invalid_packets,
+    ),
+    DukaOneDiagnosticDescription(
+        key="last_seen",
+        name="Last seen",
+        device_class=SensorDeviceClass.TIMESTAMP,
+        value_fn=_last_seen,
+    ),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ) -> None:
     """Set up Duka One humidity sensor based on a config entry."""
 
     name = entry.data[CONF_NAME]
-    device_id = entry.data[CONF_DEVICE_ID]
-    dukaonesensor = DukaOneHumidity(hass, name, device_id)
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    coordinator = component.coordinators[entry.entry_id]
+    # The statistics and the reported values do not wait for the humidity
+    async_add_entities(
+        [
+            DukaOneDiagnosticSensor(coordinator, name, description)
+            for description in DIAGNOSTIC_SENSORS
+        ],
+        True,
+    )
+    async_add_described_entities(
+        coordinator, SENSORS, DukaOneSensor, async_add_entities
+    )
+    dukaonesensor = DukaOneHumidity(coordinator, name)
     if not await dukaonesensor.wait_for_device_to_be_ready():
-        _LOGGER.error("Failed to setup dukaone device")
-        return False
+        _LOGGER.error("Failed to setup dukaone humidity sensor")
+        return
     async_add_entities([dukaonesensor], True)
 
 
 class DukaOneHumidity(Entity, DukaEntity):
-    """A Duka One humidity sensor entity."""
+    """A Duka One humidity sensor entity.
+
+    The attributes are statistics of the last hour of humidity samples. They
+    change with every write, so they are not recorded.
+    """
 
-    def __init__(self, hass: HomeAssistant, name: str, device_id: str):
+    _unrecorded_attributes = frozenset({"min", "max", "mean", "change_per_hour"})
+
+    def __init__(self, coordinator: DukaCoordinator, name: str):
         """Initialize the Duka One fan."""
-        super(DukaOneHumidity, self).__init__(hass, device_id)
+        super(DukaOneHumidity, self).__init__(coordinator)
         self._name = name
 
+    async def async_added_to_hass(self):
+        """Subscribe to device changes."""
+        self.async_on_remove(self.coordinator.async_add_entity(self))
+
+    def projected_state(self, state: DeviceState):
+        """Return the humidity - the only value shown by the sensor"""
+        return state.humidity
+
+    def on_change(self, state: DeviceState):
+        """Callback when the humidity has changed"""
+        if self.hass is not None:
+            self.async_write_ha_state()
+
+    def write_policy(self):
+        """Write humidity changes above the threshold and rate limit them."""
+        return (
+            self.coordinator.humidity_threshold,
+            self.coordinator.min_write_interval,
+        )
+
     async def wait_for_device_to_be_ready(self):
         """Wait for the device to be initialized.
 
         Then wait until the first humidity command has been received"""
-        _LOGGER.debug("Waiting to get dukaone device")
-        timeout = time.time() + 10
-        while True:
-            self.device = self.the_client.get_device(self._device_id)
-            if self.device is not None:
-                break
-            if time.time() > timeout:
-                return False
-            await asyncio.sleep(0.1)
         _LOGGER.debug("Waiting for dukaone sensor device")
         if not await super(DukaOneHumidity, self).wait_for_device_to_be_ready():
             return False
         _LOGGER.debug("Waiting for dukaone humidity sensor")
-        timeout = time.time() + 10
-        while self.device is None or self.device.humidity is None:
-            if time.time() > timeout:
-                _LOGGER.warning("Timeout waiting for humidity reply")
-                return False
-            await asyncio.sleep(0.1)
+        if (
+            not await self.device.async_wait_status(READY_TIMEOUT)
+            or self.device.humidity is None
+        ):
+            _LOGGER.warning("Timeout waiting for humidity reply")
+            return False
         return True
 
     @property
@@ -77,24 +232,29 @@ class DukaOneHumidity(Entity, DukaEntity):
 
     @property
     def should_poll(self):
-        """We poll because the fan handle changes."""
-        return True
+        """No polling needed, the coordinator push the changes."""
+        return False
 
     @property
     def assumed_state(self):
-        """Return false if we do optimistic updates."""
+        """Return false, the humidity is always reported by the device."""
         return False
 
     @property
     def state(self):
         """Return the state of the sensor."""
-        return self.device.humidity
+        return self.coordinator.state.humidity
 
     @property
     def unit_of_measurement(self):
         """Return the unit of measurement of this entity"""
         return "%"
 
+    @property
+    def extra_state_attributes(self):
+        """Return the humidity statistics of the last hour."""
+        return self.coordinator.history.humidity_statistics()
+
     @property
     def icon(self):
         """Return the icon to use in the frontend."""
@@ -103,3 +263,54 @@ class DukaOneHumidity(Entity, DukaEntity):
     @property
     def device_info(self):
         return self.dukaone_device_info()
+
+
+class DukaOneSensor(DukaDescribedEntity, SensorEntity):
+    """A sensor showing a value of a Duka One device."""
+
+    entity_description: DukaOneSensorDescription
+
+    def write_policy(self):
+        """Write significant changes at most once per minimum write interval."""
+        return (
+            self.entity_description.threshold_fn(self.coordinator),
+            self.coordinator.min_write_interval,
+        )
+
+    @property
+    def native_value(self):
+        """Return the value of the sensor."""
+        return self.entity_description.value_fn(self.coordinator.state)
+
+
+class DukaOneDiagnosticSensor(SensorEntity, DukaEntity):
+    """A sensor showing a performance counter of a Duka One device.
+
+    The counters change with every packet, so they are polled instead of
+    pushed. The sensors are disabled by default.
+    """
+
+    entity_description: DukaOneDiagnosticDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: DukaCoordinator,
+        name: str,
+        description: DukaOneDiagnosticDescription,
+    ):
+        """Initialize the diagnostic sensor."""
+        super(DukaOneDiagnosticSensor, self).__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{name} {description.name}"
+        self._attr_unique_id = f"{self._device_id}_{description.key}"
+
+    @property
+    def native_value(self):
+        """Return the value of the counter."""
+        return self.entity_description.value_fn(self.device.stats)
+
+    @property
+    def device_info(self):
+        return self.dukaone_device_info()
@@ -0,0 +1,233 @@
+"""Domain services working on many duka one devices at once."""
+
+import asyncio
+from datetime import datetime, timezone
+import logging
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    ATTR_MANUAL_SPEED,
+    ATTR_MODE,
+    ATTR_SPEED,
+    DOMAIN,
+    MODE_IN,
+    MODE_INOUT,
+    MODE_OUT,
+    SPEED_HIGH,
+    SPEED_LOW,
+    SPEED_MEDIUM,
+    SPEED_OFF,
+)
+from .coordinator import DukaCoordinator
+from .device import Mode, Speed
+from .group import DukaGroup, DukaGroupError
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SET_FLEET_SPEED = "set_fleet_speed"
+SERVICE_SET_FLEET_MODE = "set_fleet_mode"
+SERVICE_DUMP_HISTORY = "dump_history"
+
+# Number of devices sent commands at the same time
+FLEET_CONCURRENCY = 16
+
+SPEEDS = {
+    SPEED_OFF: Speed.OFF,
+    SPEED_LOW: Speed.LOW,
+    SPEED_MEDIUM: Speed.MEDIUM,
+    SPEED_HIGH: Speed.HIGH,
+}
+MODES = {MODE_OUT: Mode.ONEWAY, MODE_INOUT: Mode.TWOWAY, MODE_IN: Mode.IN}
+
+SET_FLEET_SPEED_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+            vol.Exclusive(ATTR_SPEED, "speed"): vol.In(SPEEDS),
+            vol.Exclusive(ATTR_MANUAL_SPEED, "speed"): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=255)
+            ),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_SPEED, ATTR_MANUAL_SPEED),
+)
+SET_FLEET_MODE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_ids,
+        vol.Required(ATTR_MODE): vol.In(MODES),
+    }
+)
+DUMP_HISTORY_SCHEMA = vol.Schema({vol.Optional(ATTR_ENTITY_ID): cv.entity_ids})
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the domain services."""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_FLEET_SPEED):
+        return
+
+    async def async_set_fleet_speed(call: ServiceCall) -> ServiceResponse:
+        if ATTR_MANUAL_SPEED in call.data:
+            manual_speed = call.data[ATTR_MANUAL_SPEED]
+            return await _async_fan_out(
+                hass,
+                call,
+                lambda target: target.async_set_manual_speed(manual_speed),
+            )
+        speed = SPEEDS[call.data[ATTR_SPEED]]
+        return await _async_fan_out(
+            hass,
+            call,
+            lambda target: target.async_set_speed(speed),
+        )
+
+    async def async_set_fleet_mode(call: ServiceCall) -> ServiceResponse:
+        mode = MODES[call.data[ATTR_MODE]]
+        return await _async_fan_out(
+            hass,
+            call,
+            lambda target: target.async_set_mode(mode),
+        )
+
+    async def async_dump_history(call: ServiceCall) -> ServiceResponse:
+        devices = {}
+        for coordinator in _target_coordinators(hass, call):
+            samples = coordinator.history.as_list()
+            for sample in samples:
+                sample["time"] = datetime.fromtimestamp(
+                    sample["time"], timezone.utc
+                ).isoformat()
+            devices[coordinator.device.device_id] = samples
+        return {"devices": devices}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_FLEET_SPEED,
+        async_set_fleet_speed,
+        schema=SET_FLEET_SPEED_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_FLEET_MODE,
+        async_set_fleet_mode,
+        schema=SET_FLEET_MODE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_DUMP_HISTORY,
+        async_dump_history,
+        schema=DUMP_HISTORY_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+
+def _targets(
+    hass: HomeAssistant, call: ServiceCall
+) -> tuple[list[DukaCoordinator], list[DukaGroup]]:
+    """Return the targeted devices and groups - all if none given.
+
+    The members of a targeted group are commanded through the group, so they
+    are not returned as devices as well.
+    """
+    coordinators: dict[str, DukaCoordinator] = hass.data[DOMAIN].coordinators
+    groups: dict[str, DukaGroup] = hass.data[DOMAIN].groups
+    if ATTR_ENTITY_ID not in call.data:
+        devices = dict(coordinators)
+        targeted_groups = dict(groups)
+    else:
+        registry = er.async_get(hass)
+        devices = {}
+        targeted_groups = {}
+        for entity_id in call.data[ATTR_ENTITY_ID]:
+            entry = registry.async_get(entity_id)
+            if entry is not None and entry.config_entry_id in groups:
+                targeted_groups[entry.config_entry_id] = groups[entry.config_entry_id]
+                continue
+            if entry is None or entry.config_entry_id not in coordinators:
+                raise HomeAssistantError(f"{entity_id} is not a Duka One entity")
+            devices[entry.config_entry_id] = coordinators[entry.config_entry_id]
+    for group in targeted_groups.values():
+        for coordinator in group.coordinators:
+            devices.pop(coordinator.entry.entry_id, None)
+    return list(devices.values()), list(targeted_groups.values())
+
+
+def _target_coordinators(
+    hass: HomeAssistant, call: ServiceCall
+) -> list[DukaCoordinator]:
+    """Return the coordinators of the targeted entities - all if none given.
+
+    A group entity targets the members of the group.
+    """
+    devices, groups = _targets(hass, call)
+    targets = {coordinator.entry.entry_id: coordinator for coordinator in devices}
+    for group in groups:
+        for coordinator in group.coordinators:
+            targets[coordinator.entry.entry_id] = coordinator
+    return list(targets.values())
+
+
+async def _async_fan_out(hass: HomeAssistant, call: ServiceCall, command) -> dict:
+    """Run a command on the targeted devices and groups concurrently.
+
+    At most FLEET_CONCURRENCY commands are outstanding at a time. A device
+    failing does not stop the others; the result of each device is returned,
+    for a group the result of each member.
+    """
+    coordinators, groups = _targets(hass, call)
+    members = [group.coordinators for group in groups]
+    semaphore = asyncio.Semaphore(FLEET_CONCURRENCY)
+
+    async def run(target: DukaCoordinator | DukaGroup):
+        async with semaphore:
+            await command(target)
+
+    results = await asyncio.gather(
+        *(run(target) for target in [*coordinators, *groups]),
+        return_exceptions=True,
+    )
+    summary = {}
+    for coordinator, result in zip(coordinators, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            _LOGGER.warning(
+                "Duka one %s failed: %s", coordinator.device.device_id, result
+            )
+            summary[coordinator.device.device_id] = _failure(result)
+        else:
+            summary[coordinator.device.device_id] = {"success": True}
+    for group_members, result in zip(members, results[len(coordinators) :]):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        for coordinator in group_members:
+            device_id = coordinator.device.device_id
+            if isinstance(result, DukaGroupError):
+                # The group has logged the members that failed
+                failed = result.failed.get(device_id)
+                summary[device_id] = (
+                    {"success": True} if failed is None else _failure(failed)
+                )
+            elif isinstance(result, Exception):
+                _LOGGER.warning("Duka one %s failed: %s", device_id, result)
+                summary[device_id] = _failure(result)
+            else:
+                summary[device_id] = {"success": True}
+    return {"devices": summary}
+
+
+def _failure(err: Exception) -> dict:
+    return {"success": False, "error": str(err)}
@@ -0,0 +1,115 @@
+"""Per device performance counters."""
+
+from collections import deque
+import time
+
+# Number of round trip samples kept for the percentiles
+LATENCY_SAMPLES = 100
+# Seconds after which an unanswered request is considered lost
+REQUEST_EXPIRY = 5.0
+# Number of unanswered requests tracked
+MAX_OUTSTANDING = 16
+
+
+class DeviceStats:
+    """Packet counters and round trip latency of one device.
+
+    The device answers requests in the order they are sent, so the unanswered
+    requests are kept in a queue and each reply is matched to the oldest. A
+    missed poll or a retried command drops the oldest request, and a request
+    unanswered for REQUEST_EXPIRY seconds is dropped as well. A reply without
+    an outstanding request is counted as stale.
+    """
+
+    __slots__ = (
+        "packets_sent",
+        "packets_received",
+        "invalid_packets",
+        "stale_responses",
+        "missed_polls",
+        "failed_commands",
+        "retries",
+        "last_seen",
+        "_latencies",
+        "_outstanding",
+    )
+
+    def __init__(self):
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.invalid_packets = 0
+        self.stale_responses = 0
+        self.missed_polls = 0
+        self.failed_commands = 0
+        self.retries = 0
+        # time.time() of the last reply
+        self.last_seen: float = None
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        # time.monotonic() of the unanswered requests, oldest first
+        self._outstanding = deque(maxlen=MAX_OUTSTANDING)
+
+    def packet_sent(self, reply: bool = True) -> None:
+        """Count a packet sent to the device, a request if a reply is expected."""
+        self.packets_sent += 1
+        if reply:
+            self._outstanding.append(time.monotonic())
+
+    def packet_received(self) -> None:
+        """Count a reply and measure the round trip of the oldest request."""
+        self.packets_received += 1
+        self.last_seen = time.time()
+        now = time.monotonic()
+        outstanding = self._outstanding
+        while outstanding and now - outstanding[0] > REQUEST_EXPIRY:
+            outstanding.popleft()
+        if not outstanding:
+            self.stale_responses += 1
+            return
+        self._latencies.append(now - outstanding.popleft())
+
+    def poll_missed(self) -> None:
+        """Count a status request that was not answered."""
+        self.missed_polls += 1
+        self._request_lost()
+
+    def command_retried(self) -> None:
+        """Count a command sent again as it was not confirmed."""
+        self.retries += 1
+        self._request_lost()
+
+    def command_failed(self) -> None:
+        """Count a command that was not confirmed after the retries."""
+        self.failed_commands += 1
+        self._request_lost()
+
+    def _request_lost(self) -> None:
+        """Forget the oldest unanswered request."""
+        if self._outstanding:
+            self._outstanding.popleft()
+
+    def latency(self, percentile: float) -> float | None:
+        """Return a round trip percentile (0-100) in milliseconds."""
+        if not self._latencies:
+            return None
+        samples = sorted(self._latencies)
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return round(samples[index] * 1000, 1)
+
+    def as_dict(self) -> dict:
+        """Return the counters for diagnostics."""
+        return {
+            "packets_sent": self.packets_sent,
+            "packets_received": self.packets_received,
+            "invalid_packets": self.invalid_packets,
+            "stale_responses": self.stale_responses,
+            "missed_polls": self.missed_polls,
+            "failed_commands": self.failed_commands,
+            "retries": self.retries,
+            "last_seen": self.last_seen,
+            "latency_ms": {
+                "p50": self.latency(50),
+                "p90": self.latency(90),
+                "p99": self.latency(99),
+                "samples": len(self._latencies),
+            },
+        }
@@ -0,0 +1,82 @@
+"""
+Switch platform for Duka One fan.
+
+see http://www.dingus.dk for more information
+"""
+
+from homeassistant.components.switch import SwitchEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME
+from homeassistant.core import HomeAssistant, callback
+
+from . import DukaEntityComponent
+from .const import CONF_HUMIDITY_CONTROL, DOMAIN
+from .coordinator import DukaCoordinator
+from .dukaentity import DukaEntity
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities
+) -> None:
+    """Set up the Duka One humidity control switch based on a config entry."""
+    component: DukaEntityComponent = hass.data[DOMAIN]
+    async_add_entities(
+        [
+            DukaOneHumidityControl(
+                component.coordinators[entry.entry_id], entry.data[CONF_NAME]
+            )
+        ]
+    )
+
+
+class DukaOneHumidityControl(SwitchEntity, DukaEntity):
+    """Turn the humidity boost of a Duka One device on and off.
+
+    The switch is stored in the options of the entry. The boosting attribute
+    is true while the fan runs at the boost speed.
+    """
+
+    _attr_icon = "mdi:water-percent-alert"
+    _attr_should_poll = False
+
+    def __init__(self, coordinator: DukaCoordinator, name: str):
+        super(DukaOneHumidityControl, self).__init__(coordinator)
+        self._control = coordinator.humidity_control
+        self._attr_name = f"{name} Humidity boost"
+        self._attr_unique_id = f"{self._device_id}_humidity_control"
+
+    async def async_added_to_hass(self):
+        """Subscribe to control changes."""
+        self.async_on_remove(self._control.add_listener(self._async_control_changed))
+
+    @callback
+    def _async_control_changed(self):
+        self.async_write_ha_state()
+
+    @property
+    def is_on(self):
+        """Return true if the humidity control is enabled."""
+        return self._control.enabled
+
+    @property
+    def extra_state_attributes(self):
+        """Return if the fan is boosting."""
+        return {"boosting": self._control.boosting}
+
+    async def async_turn_on(self, **kwargs) -> None:
+        """Enable the humidity control."""
+        self._set_enabled(True)
+
+    async def async_turn_off(self, **kwargs) -> None:
+        """Disable the humidity control."""
+        self._set_enabled(False)
+
+    def _set_enabled(self, enabled: bool) -> None:
+        entry = self.coordinator.entry
+        self.hass.config_entries.async_update_entry(
+            entry, options={**entry.options, CONF_HUMIDITY_CONTROL: enabled}
+        )
+
+    @property
+    def device_info(self):
+        return self.dukaone_device_info()
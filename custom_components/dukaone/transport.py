@@ -0,0 +1,167 @@
+"""The udp socket shared by all duka one devices.
+
+The transport keeps a dispatch index of the devices keyed by the raw device id
+from the packet header, so a received datagram is routed to its device with a
+dictionary lookup on a slice of the header. Datagrams from unknown devices are
+dropped without being decoded. Replies always carry the device id, so the
+source address is not needed to route them and changes of it are left to the
+device.
+"""
+
+import asyncio
+import logging
+
+from .device import Device
+from .packet import ResponsePacket
+
+_LOGGER = logging.getLogger(__name__)
+
+DUKA_PORT = 4000
+BROADCAST_ADDRESS = "<broadcast>"
+
+# Offset of the device id in a packet: 0xFD 0xFD, protocol type and id size
+DEVICE_ID_OFFSET = 4
+
+
+class DukaProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol forwarding the received packets to the transport."""
+
+    def __init__(self, transport: "DukaTransport"):
+        self._transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        """Handle a datagram received from a device."""
+        self._transport.datagram_received(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        """Log socket errors - udp errors are not fatal."""
+        _LOGGER.debug("Duka one socket error: %s", exc)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Notify the transport that the socket is closed."""
+        self._transport.connection_lost()
+
+
+class DukaTransport:
+    """One socket and receive dispatcher for all devices."""
+
+    def __init__(
+        self, port: int = DUKA_PORT, local_port: int = DUKA_PORT, on_response=None
+    ):
+        self._port = port
+        self._local_port = local_port
+        # Called with device and packet after a device has been updated
+        self._on_response = on_response
+        self._transport: asyncio.DatagramTransport = None
+        self._start_lock = asyncio.Lock()
+        self._by_id: dict[bytes, Device] = {}
+        # Devices being validated, updated besides the registered devices
+        self._probes: dict[bytes, Device] = {}
+        self._search_listeners = []
+        self.dropped_packets = 0
+        self.invalid_packets = 0
+
+    @property
+    def is_connected(self) -> bool:
+        """Return True if the socket is open."""
+        return self._transport is not None
+
+    async def async_start(self) -> None:
+        """Open the socket if it is not already open."""
+        async with self._start_lock:
+            if self._transport is not None:
+                return
+            loop = asyncio.get_running_loop()
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: DukaProtocol(self),
+                local_addr=("0.0.0.0", self._local_port),
+                allow_broadcast=True,
+            )
+
+    def close(self) -> None:
+        """Close the socket."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def connection_lost(self) -> None:
+        """Called by the protocol when the socket has been closed."""
+        self._transport = None
+
+    def register(self, device: Device) -> None:
+        """Route datagrams from the device to it."""
+        self._by_id[device.device_id.encode("ascii")] = device
+
+    def unregister(self, device: Device) -> None:
+        """Stop routing datagrams to the device."""
+        device_id = device.device_id.encode("ascii")
+        if self._by_id.get(device_id) is device:
+            del self._by_id[device_id]
+
+    def add_probe(self, device: Device) -> None:
+        """Update a device being validated with the datagrams of its id.
+
+        The probe does not take the place of a registered device with the
+        same id, both are updated.
+        """
+        self._probes[device.device_id.encode("ascii")] = device
+
+    def remove_probe(self, device: Device) -> None:
+        """Stop updating a device being validated."""
+        device_id = device.device_id.encode("ascii")
+        if self._probes.get(device_id) is device:
+            del self._probes[device_id]
+
+    def as_dict(self) -> dict:
+        """Return the transport counters for diagnostics."""
+        return {
+            "connected": self.is_connected,
+            "devices": len(self._by_id),
+            "dropped_packets": self.dropped_packets,
+            "invalid_packets": self.invalid_packets,
+        }
+
+    def add_search_listener(self, listener) -> None:
+        """Add a callback called with device id and address of search replies."""
+        self._search_listeners.append(listener)
+
+    def remove_search_listener(self, listener) -> None:
+        """Remove a search callback."""
+        self._search_listeners.remove(listener)
+
+    def send(self, data: bytes, ip_address: str) -> bool:
+        """Send a packet. Returns False if the socket is closed."""
+        if self._transport is None:
+            return False
+        self._transport.sendto(data, (ip_address, self._port))
+        return True
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        """Dispatch a received datagram to the device it came from."""
+        if len(data) < DEVICE_ID_OFFSET:
+            self.invalid_packets += 1
+            return
+        address = addr[0]
+        device_id = data[DEVICE_ID_OFFSET : DEVICE_ID_OFFSET + data[3]]
+        device = self._by_id.get(device_id)
+        probe = self._probes.get(device_id) if self._probes else None
+        if device is None and probe is None and not self._search_listeners:
+            self.dropped_packets += 1
+            return
+        packet = ResponsePacket()
+        if not packet.initialize_from_data(data):
+            self.invalid_packets += 1
+            if device is not None:
+                device.stats.invalid_packets += 1
+            return
+        if packet.search_device_id is not None:
+            for listener in self._search_listeners:
+                listener(packet.search_device_id, address)
+        if probe is not None:
+            probe.update(address, packet)
+        if device is None:
+            return
+        device.stats.packet_received()
+        device.update(address, packet)
+        if self._on_response is not None:
+            self._on_response(device, packet)
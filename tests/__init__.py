@@ -0,0 +1 @@
+"""Tests for the duka one integration."""
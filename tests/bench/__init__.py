@@ -0,0 +1 @@
+"""Benchmarks of the duka one integration against a simulated fleet."""
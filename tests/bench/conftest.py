@@ -0,0 +1,64 @@
+"""Fixtures for the benchmarks.
+
+The benchmarks only run with the --bench option giving the fleet sizes, and
+the measurements are printed in a table at the end of the run.
+"""
+
+import pytest
+
+from ..fake_device import FakeDevice, FakeDukaFleet, device_ids
+
+_RESULTS = pytest.StashKey[dict]()
+
+
+def pytest_generate_tests(metafunc):
+    """Run the benchmarks for each fleet size."""
+    if "fleet_size" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("--bench") or "1"
+        metafunc.parametrize("fleet_size", [int(size) for size in sizes.split(",")])
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks without the --bench option."""
+    if config.getoption("--bench"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with --bench SIZES")
+    for item in items:
+        if "fleet_size" in item.fixturenames:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Print the measurements."""
+    results = config.stash.get(_RESULTS, None)
+    if not results:
+        return
+    terminalreporter.section("duka one benchmarks")
+    for name, rows in sorted(results.items()):
+        terminalreporter.write_line(name)
+        for size, values in sorted(rows.items()):
+            measurements = ", ".join(f"{key} {value}" for key, value in values.items())
+            terminalreporter.write_line(f"  {size:>5} devices: {measurements}")
+
+
+@pytest.fixture
+def record(request, fleet_size):
+    """Record measurements of the benchmark for the fleet size."""
+    results = request.config.stash.setdefault(_RESULTS, {})
+    rows = results.setdefault(request.node.originalname, {})
+
+    def record(**values):
+        rows.setdefault(fleet_size, {}).update(values)
+
+    return record
+
+
+@pytest.fixture
+async def fleet(fleet_size):
+    """A fleet of fleet_size simulated devices."""
+    fleet = FakeDukaFleet(
+        [FakeDevice(device_id) for device_id in device_ids(fleet_size)]
+    )
+    await fleet.async_start()
+    yield fleet
+    fleet.close()
@@ -0,0 +1,26 @@
+"""Benchmark the decoding of the replies of a fleet."""
+
+import time
+
+from custom_components.dukaone.packet import ResponsePacket
+
+from ..common import status_reply
+from ..fake_device import FakeDevice, device_ids
+
+# Budget of decoding one status reply
+DECODE_BUDGET_US = 50
+ROUNDS = 200
+
+
+def test_decode_status(fleet_size, record):
+    """Measure the time to decode a full status reply of every device."""
+    replies = [
+        status_reply(FakeDevice(device_id)) for device_id in device_ids(fleet_size)
+    ]
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for data in replies:
+            ResponsePacket().initialize_from_data(data)
+    per_reply = (time.perf_counter() - start) * 1e6 / (ROUNDS * fleet_size)
+    record(decode_us_per_reply=round(per_reply, 2))
+    assert per_reply < DECODE_BUDGET_US
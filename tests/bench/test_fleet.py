@@ -0,0 +1,155 @@
+"""Benchmark the integration with fleets of simulated devices.
+
+Run with
+
+    pytest tests/bench --bench 1,10,100,500
+
+Each benchmark sets up one config entry per device, like a real installation,
+and records its measurements for the fleet size. The budgets are far above the
+measured values and only fail on a clear regression.
+"""
+
+import statistics
+import time
+import tracemalloc
+
+from homeassistant.components.fan import ATTR_PRESET_MODE, DOMAIN as FAN_DOMAIN
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import HomeAssistant
+
+from custom_components.dukaone.const import DOMAIN
+
+from ..common import async_setup_entries, async_unload_entries, device_entry
+from ..fake_device import RESPONSE, FakeDukaFleet, build_packet
+
+# Budgets of the fleet, a fixed part for loading the integration and a part
+# per device
+SETUP_BUDGET_S = 1.0
+SETUP_BUDGET_S_PER_DEVICE = 0.05
+MEMORY_BUDGET_KIB = 1024
+MEMORY_BUDGET_KIB_PER_DEVICE = 256
+# Budgets of a single command and of a single reply
+COMMAND_BUDGET_MS = 100
+UPDATE_BUDGET_US = 500
+
+# Number of commands timed one by one
+COMMAND_SAMPLES = 50
+
+
+async def _async_setup_fleet(hass: HomeAssistant, fleet: FakeDukaFleet) -> list:
+    entries = [device_entry(device) for device in fleet.devices]
+    await async_setup_entries(hass, entries)
+    return entries
+
+
+async def _async_set_preset(hass: HomeAssistant, entity_ids, preset: str) -> None:
+    await hass.services.async_call(
+        FAN_DOMAIN,
+        "set_preset_mode",
+        {ATTR_ENTITY_ID: entity_ids, ATTR_PRESET_MODE: preset},
+        blocking=True,
+    )
+
+
+async def test_setup_time(hass, fleet_client, fleet_size, record):
+    """Measure the time to set up all entries until the entities are added."""
+    start = time.perf_counter()
+    entries = await _async_setup_fleet(hass, fleet_client)
+    elapsed = time.perf_counter() - start
+    assert len(hass.states.async_entity_ids(FAN_DOMAIN)) == fleet_size
+    record(
+        setup_s=round(elapsed, 3),
+        setup_ms_per_device=round(elapsed * 1000 / fleet_size, 2),
+    )
+    await async_unload_entries(hass, entries)
+    assert elapsed < SETUP_BUDGET_S + SETUP_BUDGET_S_PER_DEVICE * fleet_size
+
+
+async def test_command_latency(hass, fleet_client, fleet_size, record):
+    """Measure the time of a confirmed preset change of one fan."""
+    entries = await _async_setup_fleet(hass, fleet_client)
+    entity_ids = hass.states.async_entity_ids(FAN_DOMAIN)
+    samples = []
+    for index in range(COMMAND_SAMPLES):
+        entity_id = entity_ids[index % fleet_size]
+        preset = (
+            "high"
+            if hass.states.get(entity_id).attributes[ATTR_PRESET_MODE] != "high"
+            else "low"
+        )
+        start = time.perf_counter()
+        await _async_set_preset(hass, entity_id, preset)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p50 = statistics.median(samples)
+    record(
+        command_p50_ms=round(p50, 2),
+        command_p99_ms=round(samples[int(len(samples) * 0.99)], 2),
+    )
+    await async_unload_entries(hass, entries)
+    assert p50 < COMMAND_BUDGET_MS
+
+
+async def test_throughput(hass, fleet_client, fleet_size, record):
+    """Measure the confirmed commands per second sent to the whole fleet."""
+    entries = await _async_setup_fleet(hass, fleet_client)
+    entity_ids = hass.states.async_entity_ids(FAN_DOMAIN)
+    rounds = ("medium", "high", "low")
+    start = time.perf_counter()
+    for preset in rounds:
+        await _async_set_preset(hass, entity_ids, preset)
+    elapsed = time.perf_counter() - start
+    assert all(device.params[0x02] == 1 for device in fleet_client.devices)
+    record(commands_per_s=round(len(rounds) * fleet_size / elapsed))
+    await async_unload_entries(hass, entries)
+
+
+async def test_update_dispatch(hass, fleet_client, fleet_size, record):
+    """Measure the cost of a reply changing the humidity, entity writes included."""
+    entries = await _async_setup_fleet(hass, fleet_client)
+    transport = hass.data[DOMAIN].the_client.transport
+    rounds = 20
+    replies = [
+        [
+            (
+                build_packet(
+                    device.device_id,
+                    device.password,
+                    RESPONSE,
+                    bytes((0x25, 50 + i % 2 * 10)),
+                ),
+                ("127.0.0.1", fleet_client.port),
+            )
+            for device in fleet_client.devices
+        ]
+        for i in range(rounds)
+    ]
+    start = time.perf_counter()
+    for packets in replies:
+        for data, addr in packets:
+            transport.datagram_received(data, addr)
+        await hass.async_block_till_done()
+    elapsed = time.perf_counter() - start
+    per_reply = elapsed * 1e6 / (rounds * fleet_size)
+    record(update_us_per_reply=round(per_reply, 1))
+    await async_unload_entries(hass, entries)
+    assert per_reply < UPDATE_BUDGET_US
+
+
+async def test_memory(hass, fleet_client, fleet_size, record):
+    """Measure the memory allocated per device by the setup."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        entries = await _async_setup_fleet(hass, fleet_client)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    allocated /= 1024
+    record(
+        memory_kib=round(allocated),
+        memory_kib_per_device=round(allocated / fleet_size, 1),
+    )
+    await async_unload_entries(hass, entries)
+    assert allocated < MEMORY_BUDGET_KIB + MEMORY_BUDGET_KIB_PER_DEVICE * fleet_size
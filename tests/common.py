@@ -0,0 +1,90 @@
+"""Helpers for the duka one tests."""
+
+from homeassistant.const import (
+    CONF_DEVICE_ID,
+    CONF_IP_ADDRESS,
+    CONF_NAME,
+    CONF_PASSWORD,
+    CONF_TYPE,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.dukaone.const import (
+    CONF_INVERTED,
+    CONF_MEMBERS,
+    CONF_STATICIP,
+    DOMAIN,
+    ENTRY_TYPE_GROUP,
+)
+from custom_components.dukaone.device import Device
+from custom_components.dukaone.packet import (
+    STATUS_PARAMETERS,
+    Parameter,
+    ResponsePacket,
+)
+
+from .fake_device import RESPONSE, FakeDevice, build_packet
+
+
+def status_reply(device: FakeDevice) -> bytes:
+    """Return the reply of a simulated device to a firmware and status read."""
+    payload = bytearray()
+    for parameter in (Parameter.READ_FIRMWARE_VERSION, *STATUS_PARAMETERS):
+        payload.append(parameter)
+        payload += device.value(parameter)
+    return build_packet(device.device_id, device.password, RESPONSE, payload)
+
+
+def report(device: Device, fake: FakeDevice) -> None:
+    """Update the device with a status reply of the simulated device."""
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(status_reply(fake))
+    device.update("127.0.0.1", packet)
+
+
+def device_entry(device: FakeDevice, name: str = None, **options) -> MockConfigEntry:
+    """Return a config entry of a simulated device."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        title=name or device.device_id,
+        unique_id=device.device_id,
+        data={
+            CONF_NAME: name or device.device_id,
+            CONF_DEVICE_ID: device.device_id,
+            CONF_PASSWORD: device.password,
+            CONF_IP_ADDRESS: "127.0.0.1",
+            CONF_STATICIP: True,
+        },
+        options=options,
+    )
+
+
+def group_entry(name: str, members, inverted=()) -> MockConfigEntry:
+    """Return a config entry of a group of simulated devices."""
+    return MockConfigEntry(
+        domain=DOMAIN,
+        title=name,
+        data={
+            CONF_TYPE: ENTRY_TYPE_GROUP,
+            CONF_NAME: name,
+            CONF_MEMBERS: [device.device_id for device in members],
+            CONF_INVERTED: [device.device_id for device in inverted],
+        },
+    )
+
+
+async def async_setup_entries(hass: HomeAssistant, entries) -> None:
+    """Add config entries and set up the integration with all of them."""
+    for entry in entries:
+        entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+
+async def async_unload_entries(hass: HomeAssistant, entries) -> None:
+    """Unload config entries."""
+    for entry in entries:
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
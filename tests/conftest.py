@@ -0,0 +1,54 @@
+"""Fixtures for the duka one tests."""
+
+from functools import partial
+
+import pytest
+
+from custom_components import dukaone
+from custom_components.dukaone.client import DukaClient
+
+from .fake_device import FakeDevice, FakeDukaFleet, device_ids
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+
+def pytest_addoption(parser):
+    """Add the option running the benchmarks."""
+    parser.addoption(
+        "--bench",
+        metavar="SIZES",
+        help="run the benchmarks with fleets of the comma separated sizes, "
+        "like 1,10,100,500",
+    )
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations, socket_enabled):
+    """Load the integration from custom_components and allow udp sockets."""
+    yield
+
+
+@pytest.fixture
+async def fleet():
+    """Two simulated devices on a localhost udp port."""
+    fleet = FakeDukaFleet([FakeDevice(device_id) for device_id in device_ids(2)])
+    await fleet.async_start()
+    yield fleet
+    fleet.close()
+
+
+@pytest.fixture
+async def client(fleet):
+    """A client talking to the simulated devices."""
+    client = DukaClient(fleet.port, 0)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def fleet_client(hass, fleet, monkeypatch):
+    """Make the integration talk to the simulated devices."""
+    monkeypatch.setattr(dukaone, "DukaClient", partial(DukaClient, fleet.port, 0))
+    # The frontend dependencies are not used by the integration itself
+    hass.config.components.update({"frontend", "lovelace"})
+    return fleet
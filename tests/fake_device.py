@@ -0,0 +1,223 @@
+"""Simulated duka one devices answering on a localhost udp socket.
+
+One socket serves a whole fleet. Packets are routed to the device with the id
+in the header like on a real network, and search packets are answered by all
+devices. The packets are encoded and decoded here without the integration's
+codec, so the tests exercise the codec against an independent implementation.
+"""
+
+import asyncio
+
+READ = 1
+WRITE = 2
+WRITEREAD = 3
+RESPONSE = 6
+
+SEARCH_DEVICE_ID = "DEFAULT_DEVICEID"
+
+# The data size of the parameters the simulated devices know
+SIZES = {
+    0x01: 1,
+    0x02: 1,
+    0x25: 1,
+    0x44: 1,
+    0x4A: 2,
+    0x64: 3,
+    0x65: 1,
+    0x7C: 16,
+    0x80: 1,
+    0x83: 1,
+    0x86: 6,
+    0x88: 1,
+    0xB7: 1,
+    0xB9: 2,
+}
+
+# Commands without a state, the devices do not report them back
+WRITE_ONLY = frozenset((0x65, 0x80))
+
+
+def checksum(data) -> int:
+    """Return the checksum of a packet without its checksum bytes."""
+    return sum(data[2:]) & 0xFFFF
+
+
+def build_packet(device_id: str, password: str, func: int, payload) -> bytes:
+    """Build a packet with header, payload and checksum."""
+    data = bytearray((0xFD, 0xFD, 0x02, len(device_id)))
+    data += device_id.encode("ascii")
+    data.append(len(password))
+    data += password.encode("ascii")
+    data.append(func)
+    data += payload
+    value = checksum(data)
+    data += bytes((value & 0xFF, value >> 8))
+    return bytes(data)
+
+
+class FakeDevice:
+    """The parameters of one simulated device and the packets it received."""
+
+    def __init__(self, device_id: str, password: str = "1111"):
+        self.device_id = device_id
+        self.password = password
+        self.params = {
+            0x01: 1,  # On
+            0x02: 1,  # Low speed
+            0x25: 45,  # Humidity
+            0x44: 100,  # Manual speed
+            0x4A: 1200,  # Fan rpm
+            0x83: 0,  # No alarm
+            0x88: 0,  # Filter ok
+            0xB7: 1,  # Heat recovery
+            0xB9: 4,  # Unit type
+        }
+        # Filter timer minutes, hours and days
+        self.filter_timer = (30, 5, 80)
+        # The function and payload of every packet received
+        self.received: list[tuple[int, bytes]] = []
+        # Number of packets to drop before answering again
+        self.drop = 0
+        # Do not answer at all
+        self.silent = False
+        # Seconds before the reply is sent
+        self.delay = 0.0
+
+    def value(self, parameter: int) -> bytes:
+        """Return the data bytes of a parameter."""
+        if parameter == 0x7C:
+            return self.device_id.encode("ascii")
+        if parameter == 0x86:
+            return bytes((1, 2, 3, 4, 0xE8, 0x07))
+        if parameter == 0x64:
+            return bytes(self.filter_timer)
+        if parameter in (0x4A, 0xB9):
+            return self.params.get(parameter, 0).to_bytes(2, "little")
+        return bytes((self.params.get(parameter, 0),))
+
+    def tick(self) -> None:
+        """Count the filter timer down by a minute, like a running device."""
+        minutes, hours, days = self.filter_timer
+        total = max(0, (days * 24 + hours) * 60 + minutes - 1)
+        self.filter_timer = (total % 60, total // 60 % 24, total // 1440)
+
+    def write(self, parameter: int, value: int) -> None:
+        """Apply a written parameter."""
+        if parameter == 0x65:
+            self.filter_timer = (0, 0, 90)
+            self.params[0x88] = 0
+        elif parameter == 0x80:
+            self.params[0x83] = 0
+        else:
+            self.params[parameter] = value
+
+    def handle(self, func: int, payload: bytes) -> bytes | None:
+        """Handle a request and return the reply payload, None if no reply."""
+        self.received.append((func, payload))
+        if self.silent:
+            return None
+        if self.drop > 0:
+            self.drop -= 1
+            return None
+        reply = bytearray()
+        pos = 0
+        while pos < len(payload):
+            parameter = payload[pos]
+            pos += 1
+            if parameter == 0xFC:
+                # Change the function for the rest of the packet
+                func = payload[pos]
+                pos += 1
+                continue
+            if func in (WRITE, WRITEREAD):
+                self.write(parameter, payload[pos])
+                pos += 1
+            if func != WRITE and parameter not in WRITE_ONLY:
+                reply.append(parameter)
+                reply += self.value(parameter)
+        if func == WRITE:
+            return None
+        return bytes(reply)
+
+
+class FakeDukaProtocol(asyncio.DatagramProtocol):
+    """Answer the packets sent to a fleet of simulated devices."""
+
+    def __init__(self, devices: list[FakeDevice]):
+        self.devices = {device.device_id: device for device in devices}
+        self.transport: asyncio.DatagramTransport = None
+
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if len(data) < 7 or data[:3] != b"\xfd\xfd\x02":
+            return
+        if checksum(data[:-2]) != int.from_bytes(data[-2:], "little"):
+            return
+        pos = 3
+        device_id = data[pos + 1 : pos + 1 + data[pos]].decode("ascii")
+        pos += 1 + data[pos]
+        password = data[pos + 1 : pos + 1 + data[pos]].decode("ascii")
+        pos += 1 + data[pos]
+        func = data[pos]
+        payload = data[pos + 1 : -2]
+        if device_id == SEARCH_DEVICE_ID:
+            targets = list(self.devices.values())
+        else:
+            device = self.devices.get(device_id)
+            if device is None or device.password != password:
+                return
+            targets = [device]
+        loop = asyncio.get_running_loop()
+        for device in targets:
+            reply = device.handle(func, payload)
+            if reply is None:
+                continue
+            packet = build_packet(device.device_id, device.password, RESPONSE, reply)
+            if device.delay:
+                loop.call_later(device.delay, self._sendto, packet, addr)
+            else:
+                self._sendto(packet, addr)
+
+    def _sendto(self, packet: bytes, addr) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.sendto(packet, addr)
+
+
+class FakeDukaFleet:
+    """A fleet of simulated devices on a localhost udp port."""
+
+    def __init__(self, devices: list[FakeDevice]):
+        self.devices = devices
+        self.port: int = None
+        self._transport: asyncio.DatagramTransport = None
+        self._protocol: FakeDukaProtocol = None
+
+    def __getitem__(self, index: int) -> FakeDevice:
+        return self.devices[index]
+
+    def add(self, device: FakeDevice) -> None:
+        """Add a device to the running fleet."""
+        self.devices.append(device)
+        self._protocol.devices[device.device_id] = device
+
+    async def async_start(self) -> None:
+        """Open the socket of the fleet on a free port."""
+        loop = asyncio.get_running_loop()
+        self._protocol = FakeDukaProtocol(self.devices)
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: self._protocol, local_addr=("127.0.0.1", 0)
+        )
+        self.port = self._transport.get_extra_info("sockname")[1]
+
+    def close(self) -> None:
+        """Close the socket."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+
+def device_ids(count: int) -> list[str]:
+    """Return count distinct 16 character device ids."""
+    return [f"FAKE{number:012d}" for number in range(count)]
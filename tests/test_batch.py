@@ -0,0 +1,96 @@
+"""Test the batching of parameter writes."""
+
+import asyncio
+
+from custom_components.dukaone.batch import (
+    BATCH_WINDOW,
+    MAX_DEBOUNCE_FACTOR,
+    CommandBatcher,
+)
+
+
+class _Sender:
+    """Record the sent packets and confirm them at once."""
+
+    def __init__(self):
+        self.sent: list[tuple[float, dict[int, int]]] = []
+
+    def __call__(self, params: dict[int, int]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        self.sent.append((loop.time(), params))
+        future = loop.create_future()
+        future.set_result(None)
+        return future
+
+
+async def test_writes_in_window_merged():
+    """Test writes within the batch window are sent in one packet, in order."""
+    sender = _Sender()
+    batcher = CommandBatcher(sender)
+    start = asyncio.get_running_loop().time()
+    await asyncio.gather(
+        batcher.async_write({0x02: 3}),
+        batcher.async_write({0xB7: 2}),
+        batcher.async_write({0x02: 255, 0x44: 120}),
+    )
+    assert len(sender.sent) == 1
+    when, params = sender.sent[0]
+    assert list(params.items()) == [(0xB7, 2), (0x02, 255), (0x44, 120)]
+    assert when - start >= BATCH_WINDOW
+
+
+async def test_writes_after_window_sent_apart():
+    """Test a write after the batch window has been sent is a new packet."""
+    sender = _Sender()
+    batcher = CommandBatcher(sender)
+    await batcher.async_write({0x02: 3})
+    await batcher.async_write({0x02: 1})
+    assert [params for _, params in sender.sent] == [{0x02: 3}, {0x02: 1}]
+
+
+async def test_failed_send_fails_all_writers():
+    """Test every write of a batch fails when the packet cannot be sent."""
+
+    def send(params):
+        raise OSError("Duka one socket is closed")
+
+    batcher = CommandBatcher(send)
+    results = await asyncio.gather(
+        batcher.async_write({0x02: 3}),
+        batcher.async_write({0xB7: 2}),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, OSError) for result in results)
+
+
+async def test_debounce_sends_last_value():
+    """Test debounced writes are sent once the values stop changing."""
+    sender = _Sender()
+    batcher = CommandBatcher(sender)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    writes = []
+    for value in range(100, 105):
+        writes.append(loop.create_task(batcher.async_write({0x44: value}, 0.05)))
+        await asyncio.sleep(0.01)
+    await asyncio.gather(*writes)
+    assert [params for _, params in sender.sent] == [{0x44: 104}]
+    # Each write restarted the debounce, the last one 4 sleeps after the first
+    assert sender.sent[0][0] - start >= 0.04 + 0.05 - 0.005
+
+
+async def test_debounce_capped():
+    """Test a continuous stream of debounced writes is still sent."""
+    sender = _Sender()
+    batcher = CommandBatcher(sender)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    writes = []
+    for value in range(30):
+        writes.append(loop.create_task(batcher.async_write({0x44: value}, 0.05)))
+        await asyncio.sleep(0.02)
+    await asyncio.gather(*writes)
+    first = sender.sent[0][0]
+    assert first - start < 0.05 * MAX_DEBOUNCE_FACTOR + 0.03
+    assert len(sender.sent) > 1
+    assert sender.sent[-1][1] == {0x44: 29}
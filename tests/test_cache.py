@@ -0,0 +1,72 @@
+"""Test the cache of the last known device state."""
+
+from datetime import timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+
+from custom_components.dukaone.cache import (
+    FILTER_TIMER_SAVE_DELAY,
+    SAVE_DELAY,
+    STORAGE_KEY,
+    DeviceCache,
+)
+from custom_components.dukaone.device import Device, Speed
+
+from .common import report
+from .fake_device import FakeDevice
+
+
+async def _async_pass(hass: HomeAssistant, seconds: float) -> None:
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=seconds))
+    await hass.async_block_till_done()
+
+
+async def test_filter_timer_saved_rarely(hass: HomeAssistant, hass_storage):
+    """Test a filter timer counting down does not write the cache every minute."""
+    cache = DeviceCache(hass)
+    await cache.async_load()
+    fake = FakeDevice("FAKE000000000000")
+    device = Device(fake.device_id, fake.password, "127.0.0.1")
+    cache.async_track(device)
+    report(device, fake)
+    await _async_pass(hass, SAVE_DELAY + 1)
+    assert hass_storage[STORAGE_KEY]["data"][fake.device_id]["speed"] == Speed.LOW
+    del hass_storage[STORAGE_KEY]
+
+    fake.tick()
+    report(device, fake)
+    await _async_pass(hass, SAVE_DELAY + 1)
+    assert STORAGE_KEY not in hass_storage
+    await _async_pass(hass, FILTER_TIMER_SAVE_DELAY + 1)
+    saved = hass_storage[STORAGE_KEY]["data"][fake.device_id]
+    assert saved["filter_timer"] == device.filter_timer
+
+    fake.tick()
+    report(device, fake)
+    fake.params[0x02] = Speed.HIGH
+    report(device, fake)
+    await _async_pass(hass, SAVE_DELAY + 1)
+    saved = hass_storage[STORAGE_KEY]["data"][fake.device_id]
+    assert saved["speed"] == Speed.HIGH
+    assert saved["filter_timer"] == device.filter_timer
+
+
+async def test_restore(hass: HomeAssistant, hass_storage):
+    """Test a device is restored from the saved state, filter timer included."""
+    cache = DeviceCache(hass)
+    await cache.async_load()
+    fake = FakeDevice("FAKE000000000000")
+    fake.params[0x02] = Speed.HIGH
+    device = Device(fake.device_id, fake.password, "127.0.0.1")
+    cache.async_track(device)
+    report(device, fake)
+    await _async_pass(hass, SAVE_DELAY + 1)
+
+    restored_cache = DeviceCache(hass)
+    await restored_cache.async_load()
+    restored = Device(fake.device_id, fake.password, "127.0.0.1")
+    restored.restore(restored_cache.get(fake.device_id))
+    assert restored.state == device.state
+    assert restored.is_initialized()
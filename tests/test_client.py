@@ -0,0 +1,172 @@
+"""Test the asyncio udp client against simulated devices."""
+
+import asyncio
+
+import pytest
+
+from custom_components.dukaone.client import DukaClient
+from custom_components.dukaone.device import Mode, Speed
+from custom_components.dukaone.inflight import (
+    MAX_RETRIES,
+    CommandTimeout,
+    InflightTable,
+)
+
+from .fake_device import READ, WRITE, FakeDukaFleet
+
+
+async def _async_wait(condition, timeout: float = 2) -> None:
+    """Wait until the replies of the simulated devices make condition true."""
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def _async_add(client: DukaClient, fleet: FakeDukaFleet, index: int = 0):
+    device = await client.async_add_device(
+        fleet[index].device_id, fleet[index].password, "127.0.0.1"
+    )
+    await client.async_update_device_status(device)
+    await _async_wait(lambda: device.is_initialized() and device.mode is not None)
+    return device
+
+
+async def test_add_device(client, fleet):
+    """Test a device is ready with its status and firmware after the replies."""
+    device = await _async_add(client, fleet)
+    assert device.speed == Speed.LOW
+    assert device.mode == Mode.TWOWAY
+    assert device.humidity == 45
+    assert device.filter_timer == 30 + (80 * 24 + 5) * 60
+    assert device.firmware_version == "1.2"
+
+
+async def test_commands(client, fleet):
+    """Test the commands change the device and are confirmed by the reply."""
+    device = await _async_add(client, fleet)
+    await client.async_set_speed(device, Speed.HIGH)
+    await _async_wait(lambda: device.speed == Speed.HIGH)
+    assert fleet[0].params[0x02] == Speed.HIGH
+    await client.async_set_mode(device, Mode.IN)
+    await _async_wait(lambda: device.mode == Mode.IN)
+    await client.async_set_manual_speed(device, 180)
+    await _async_wait(lambda: device.manualspeed == 180)
+    assert device.speed == Speed.MANUAL
+    await client.async_turn_off(device)
+    await _async_wait(lambda: device.speed == Speed.OFF)
+    assert fleet[0].params[0x01] == 0
+    await client.async_turn_on(device)
+    await _async_wait(lambda: fleet[0].params[0x01] == 1)
+
+
+async def test_turn_on_unknown_speed(client, fleet):
+    """Test a device that has not reported its speed is turned on at low speed."""
+    fleet[0].silent = True
+    device = await client.async_add_device(
+        fleet[0].device_id, fleet[0].password, "127.0.0.1"
+    )
+    assert device.speed is None
+    fleet[0].silent = False
+    fleet[0].params[0x01] = 0
+    fleet[0].params[0x02] = Speed.HIGH
+    await client.async_turn_on(device)
+    assert fleet[0].params[0x01] == 1
+    assert fleet[0].params[0x02] == Speed.LOW
+    assert device.speed == Speed.LOW
+
+
+async def test_unchanged_command_not_sent(client, fleet):
+    """Test a command setting the current value sends nothing."""
+    device = await _async_add(client, fleet)
+    fleet[0].received.clear()
+    await client.async_set_speed(device, Speed.LOW)
+    await client.async_set_mode(device, Mode.TWOWAY)
+    await asyncio.sleep(0.05)
+    assert fleet[0].received == []
+
+
+async def test_validate_unknown_device(client):
+    """Test validating a device that does not answer."""
+    assert (
+        await client.async_validate_device("NOSUCHDEVICE0000", "1111", "127.0.0.1", 0.2)
+        is None
+    )
+    assert client.get_device_count() == 0
+
+
+async def test_validate_while_added(client, fleet):
+    """Test a device added during its validation is not disturbed by the probe."""
+    await client.async_start()
+    fleet[0].delay = 0.1
+    validation = asyncio.create_task(
+        client.async_validate_device(
+            fleet[0].device_id, fleet[0].password, "127.0.0.1", 1
+        )
+    )
+    await asyncio.sleep(0.02)
+    device = await _async_add(client, fleet)
+    probe = await validation
+    assert probe is not None
+    assert probe is not device
+    assert client.get_device(device.device_id) is device
+    fleet[0].delay = 0
+    fleet[0].params[0x02] = Speed.HIGH
+    await client.async_update_device_status(device)
+    await _async_wait(lambda: device.speed == Speed.HIGH)
+
+
+async def test_search(client, fleet):
+    """Test a search finds all devices."""
+    found = await client.async_search_devices("127.0.0.1", 0.2)
+    assert found == {device.device_id: "127.0.0.1" for device in fleet.devices}
+
+
+async def test_write_retried(client, fleet):
+    """Test a lost write is sent again until the device confirms it."""
+    device = await _async_add(client, fleet)
+    fleet[0].drop = 1
+    await client.async_set_speed(device, Speed.HIGH)
+    assert device.speed == Speed.HIGH
+    assert device.stats.retries == 1
+
+
+async def test_reset_filter_alarm(client, fleet):
+    """Test the filter reset is sent once and confirmed by the status after it."""
+    fleet[0].params[0x88] = 1
+    device = await _async_add(client, fleet)
+    assert device.filter_alarm == 1
+    fleet[0].received.clear()
+    await client.async_reset_filter_alarm(device)
+    assert [func for func, _ in fleet[0].received] == [WRITE, READ]
+    assert fleet[0].received[0][1] == bytes((0x65, 0x01))
+    assert device.filter_alarm == 0
+    assert device.filter_timer == 90 * 24 * 60
+    assert device.stats.retries == 0
+    assert device.stats.stale_responses == 0
+    assert device.stats.latency(50) is not None
+
+
+async def test_reset_filter_alarm_retried(client, fleet):
+    """Test a lost filter reset is sent again until the status confirms it."""
+    fleet[0].params[0x88] = 1
+    device = await _async_add(client, fleet)
+    fleet[0].received.clear()
+    fleet[0].drop = 1
+    await client.async_reset_filter_alarm(device)
+    assert [func for func, _ in fleet[0].received] == [WRITE, READ, WRITE, READ]
+    assert device.filter_alarm == 0
+    assert device.filter_timer == 90 * 24 * 60
+    assert device.stats.retries == 1
+
+
+async def test_reset_filter_alarm_unconfirmed(client, fleet, monkeypatch):
+    """Test a filter reset the device never confirms raises CommandTimeout."""
+    monkeypatch.setattr(InflightTable.__init__, "__defaults__", (0.01,))
+    fleet[0].params[0x88] = 1
+    device = await _async_add(client, fleet)
+    fleet[0].silent = True
+    with pytest.raises(CommandTimeout):
+        await client.async_reset_filter_alarm(device)
+    assert device.filter_alarm == 1
+    assert device.stats.retries == MAX_RETRIES
+    assert device.stats.failed_commands == 1
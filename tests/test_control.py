@@ -0,0 +1,83 @@
+"""Test the humidity control against a simulated device."""
+
+import asyncio
+
+import pytest
+
+from custom_components.dukaone.control import HumidityControl
+from custom_components.dukaone.device import Speed
+from custom_components.dukaone.inflight import CommandTimeout
+
+HUMIDITY = 0x25
+
+
+async def _async_report(hass, client, device, fake, humidity: int) -> None:
+    """Let the simulated device report a humidity and the control react."""
+    fake.params[HUMIDITY] = humidity
+    await client.async_update_device_status(device)
+    async with asyncio.timeout(2):
+        while device.humidity != humidity:
+            await asyncio.sleep(0.01)
+    await hass.async_block_till_done()
+
+
+async def _async_control(hass, client, fleet):
+    device = await client.async_add_device(
+        fleet[0].device_id, fleet[0].password, "127.0.0.1"
+    )
+    await _async_report(hass, client, device, fleet[0], 45)
+    control = HumidityControl(hass, client, device)
+    control.async_configure(True, 70, 60, Speed.HIGH)
+    return device, control
+
+
+async def test_hysteresis(hass, client, fleet):
+    """Test the boost starts above the high and ends below the low threshold."""
+    device, control = await _async_control(hass, client, fleet)
+    await _async_report(hass, client, device, fleet[0], 75)
+    assert control.boosting
+    assert fleet[0].params[0x02] == Speed.HIGH
+    await _async_report(hass, client, device, fleet[0], 65)
+    assert control.boosting
+    assert fleet[0].params[0x02] == Speed.HIGH
+    await _async_report(hass, client, device, fleet[0], 55)
+    assert not control.boosting
+    assert fleet[0].params[0x02] == Speed.LOW
+    await _async_report(hass, client, device, fleet[0], 65)
+    assert not control.boosting
+    control.async_shutdown()
+
+
+@pytest.mark.parametrize("error", [OSError, CommandTimeout])
+async def test_failed_boost_retried(hass, client, fleet, monkeypatch, error):
+    """Test a failed boost is tried again with the next humidity sample."""
+    device, control = await _async_control(hass, client, fleet)
+    set_speed = client.async_set_speed
+
+    async def fail_once(device, speed):
+        monkeypatch.setattr(client, "async_set_speed", set_speed)
+        raise error("Failed")
+
+    monkeypatch.setattr(client, "async_set_speed", fail_once)
+    await _async_report(hass, client, device, fleet[0], 75)
+    assert not control.boosting
+    assert fleet[0].params[0x02] == Speed.LOW
+    await _async_report(hass, client, device, fleet[0], 76)
+    assert control.boosting
+    assert fleet[0].params[0x02] == Speed.HIGH
+    control.async_shutdown()
+
+
+async def test_cancelled_command_propagates(hass, client, fleet):
+    """Test a cancelled command is not taken for a failure."""
+    device, control = await _async_control(hass, client, fleet)
+    control.boosting = True
+    control._commands = 1
+    task = asyncio.create_task(control._async_run(asyncio.sleep(10), True))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert control.boosting
+    assert control._commands == 0
+    control.async_shutdown()
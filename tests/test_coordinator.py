@@ -0,0 +1,152 @@
+"""Test the coordinator sharing a device with its entities."""
+
+import asyncio
+from datetime import timedelta
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+import pytest
+
+from custom_components.dukaone.const import (
+    CONF_FILTER_TIMER_THRESHOLD,
+    CONF_HUMIDITY_THRESHOLD,
+    CONF_MIN_WRITE_INTERVAL,
+    CONF_OPTIMISTIC,
+    DOMAIN,
+)
+from custom_components.dukaone.device import Speed
+from custom_components.dukaone.inflight import CommandTimeout, InflightTable
+
+from .common import async_setup_entries, async_unload_entries, device_entry
+
+HUMIDITY = 0x25
+
+
+async def _async_setup(hass, fleet, **options):
+    entry = device_entry(fleet[0], "Duka", **options)
+    await async_setup_entries(hass, [entry])
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    return entry, hass.data[DOMAIN].coordinators[entry.entry_id]
+
+
+async def _async_report(hass, coordinator, fake, humidity: int = None) -> None:
+    """Let the simulated device report its status."""
+    if humidity is not None:
+        fake.params[HUMIDITY] = humidity
+    filter_timer = fake.filter_timer
+    await coordinator.client.async_update_device_status(coordinator.device)
+    async with asyncio.timeout(2):
+        while coordinator.device.humidity != fake.params[HUMIDITY] or (
+            coordinator.device.filter_timer
+            != filter_timer[0] + (filter_timer[2] * 24 + filter_timer[1]) * 60
+        ):
+            await asyncio.sleep(0.01)
+    await hass.async_block_till_done()
+
+
+def _track_writes(hass, entity_id: str) -> list:
+    """Return the list the new states of an entity are appended to."""
+    states = []
+
+    def state_changed(event):
+        if event.data["entity_id"] == entity_id:
+            states.append(event.data["new_state"].state)
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, state_changed)
+    return states
+
+
+async def test_optimistic_command_applied(hass, fleet_client):
+    """Test an optimistic command is shown before the device confirms it."""
+    entry, coordinator = await _async_setup(
+        hass, fleet_client, **{CONF_OPTIMISTIC: True}
+    )
+    assert hass.states.get("fan.duka").attributes["assumed_state"] is True
+    fleet_client[0].delay = 0.2
+    command = hass.async_create_task(coordinator.async_set_speed(Speed.HIGH))
+    await asyncio.sleep(0.05)
+    assert coordinator.device.speed == Speed.LOW
+    assert coordinator.state.speed == Speed.HIGH
+    assert hass.states.get("fan.duka").attributes["preset_mode"] == "high"
+    await command
+    assert coordinator.device.speed == Speed.HIGH
+    assert hass.states.get("fan.duka").attributes["preset_mode"] == "high"
+    await async_unload_entries(hass, [entry])
+
+
+async def test_optimistic_command_rolled_back(hass, fleet_client, monkeypatch):
+    """Test an optimistic command the device does not confirm is rolled back."""
+    monkeypatch.setattr(InflightTable.__init__, "__defaults__", (0.01,))
+    entry, coordinator = await _async_setup(
+        hass, fleet_client, **{CONF_OPTIMISTIC: True}
+    )
+    fleet_client[0].silent = True
+    command = hass.async_create_task(coordinator.async_set_speed(Speed.HIGH))
+    await asyncio.sleep(0)
+    assert hass.states.get("fan.duka").attributes["preset_mode"] == "high"
+    with pytest.raises(CommandTimeout):
+        await command
+    assert coordinator.state.speed == Speed.LOW
+    assert hass.states.get("fan.duka").attributes["preset_mode"] == "low"
+    await async_unload_entries(hass, [entry])
+
+
+async def test_not_optimistic(hass, fleet_client):
+    """Test without optimistic updates only the confirmed state is shown."""
+    entry, coordinator = await _async_setup(hass, fleet_client)
+    assert "assumed_state" not in hass.states.get("fan.duka").attributes
+    fleet_client[0].delay = 0.2
+    command = hass.async_create_task(coordinator.async_set_speed(Speed.HIGH))
+    await asyncio.sleep(0.05)
+    assert hass.states.get("fan.duka").attributes["preset_mode"] == "low"
+    await command
+    await hass.async_block_till_done()
+    assert hass.states.get("fan.duka").attributes["preset_mode"] == "high"
+    await async_unload_entries(hass, [entry])
+
+
+async def test_write_below_threshold_suppressed(hass, fleet_client):
+    """Test changes smaller than the thresholds are not written to the state."""
+    entry, coordinator = await _async_setup(
+        hass,
+        fleet_client,
+        **{CONF_HUMIDITY_THRESHOLD: 5, CONF_FILTER_TIMER_THRESHOLD: 10},
+    )
+    humidity = _track_writes(hass, "sensor.duka")
+    filter_timer = _track_writes(hass, "sensor.duka_filter_timer")
+    await _async_report(hass, coordinator, fleet_client[0], 48)
+    await _async_report(hass, coordinator, fleet_client[0], 41)
+    assert humidity == []
+    await _async_report(hass, coordinator, fleet_client[0], 50)
+    assert humidity == ["50"]
+    for _ in range(9):
+        fleet_client[0].tick()
+        await _async_report(hass, coordinator, fleet_client[0])
+    assert filter_timer == []
+    fleet_client[0].tick()
+    await _async_report(hass, coordinator, fleet_client[0])
+    assert len(filter_timer) == 1
+    await async_unload_entries(hass, [entry])
+
+
+async def test_min_write_interval_coalesces(hass, fleet_client):
+    """Test changes within the minimum interval are written once after it."""
+    entry, coordinator = await _async_setup(
+        hass, fleet_client, **{CONF_MIN_WRITE_INTERVAL: 60}
+    )
+    humidity = _track_writes(hass, "sensor.duka")
+    for value in (50, 55, 52):
+        await _async_report(hass, coordinator, fleet_client[0], value)
+    assert humidity == []
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=61))
+    await hass.async_block_till_done()
+    assert humidity == ["52"]
+    # A change back within the threshold of the written value is not written
+    await _async_report(hass, coordinator, fleet_client[0], 60)
+    await _async_report(hass, coordinator, fleet_client[0], 52)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=122))
+    await hass.async_block_till_done()
+    assert humidity == ["52"]
+    await async_unload_entries(hass, [entry])
@@ -0,0 +1,39 @@
+"""Test the device state and its cache format."""
+
+from custom_components.dukaone.device import Device, DeviceState, Mode, Speed
+
+
+def test_unreported_values_are_none():
+    """Test a device that has not answered reports no values."""
+    device = Device("FAKE000000000000")
+    assert device.state == DeviceState()
+    assert all(
+        value is None for value in device.as_dict().values() if value != "<broadcast>"
+    )
+
+
+def test_restore_round_trip():
+    """Test the cached state restores the device, unreported values included."""
+    device = Device("FAKE000000000000", "1111", "127.0.0.1")
+    device.restore(
+        {
+            "speed": Speed.HIGH,
+            "mode": Mode.IN,
+            "filter_alarm": 0,
+            "firmware_version": "1.2",
+        }
+    )
+    restored = Device("FAKE000000000000", "1111", "127.0.0.2")
+    restored.restore(device.as_dict())
+    assert restored.state == device.state
+    assert restored.filter_alarm == 0
+    assert restored.humidity is None
+    assert restored.ip_address == "127.0.0.2"
+    assert restored.is_initialized()
+
+
+def test_restore_without_filter_alarm():
+    """Test a cache written before the filter alarm was reported."""
+    device = Device("FAKE000000000000")
+    device.restore({"speed": Speed.LOW, "mode": Mode.ONEWAY})
+    assert device.filter_alarm is None
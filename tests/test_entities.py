@@ -0,0 +1,55 @@
+"""Test the entities created from the device values."""
+
+import asyncio
+
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.dukaone.const import DOMAIN
+
+from .common import async_setup_entries, async_unload_entries, device_entry
+
+
+async def test_entities_added_when_reported(hass, fleet_client, monkeypatch):
+    """Test no value entity exists until the device has reported the value."""
+    monkeypatch.setattr("custom_components.dukaone.dukaentity.READY_TIMEOUT", 0.1)
+    fleet_client[0].silent = True
+    entry = device_entry(fleet_client[0], "Duka")
+    await async_setup_entries(hass, [entry])
+    assert hass.states.get("binary_sensor.duka_filter_alarm") is None
+    assert hass.states.get("select.duka_mode") is None
+    fleet_client[0].silent = False
+    await hass.data[DOMAIN].the_client.async_update_device_status(
+        hass.data[DOMAIN].coordinators[entry.entry_id].device
+    )
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    assert hass.states.get("binary_sensor.duka_filter_alarm").state == "off"
+    assert hass.states.get("binary_sensor.duka_alarm").state == "off"
+    assert hass.states.get("select.duka_mode").state == "inout"
+    assert hass.states.get("number.duka_manual_speed").state == "100"
+    await async_unload_entries(hass, [entry])
+
+
+async def test_sensors_added_without_humidity(hass, fleet_client, monkeypatch):
+    """Test the diagnostic and filter timer sensors do not wait for the humidity."""
+    monkeypatch.setattr("custom_components.dukaone.dukaentity.READY_TIMEOUT", 0.1)
+    monkeypatch.setattr("custom_components.dukaone.sensor.READY_TIMEOUT", 0.1)
+    fleet_client[0].silent = True
+    entry = device_entry(fleet_client[0], "Duka")
+    await async_setup_entries(hass, [entry])
+    entity_ids = {
+        entity.entity_id
+        for entity in er.async_entries_for_config_entry(
+            er.async_get(hass), entry.entry_id
+        )
+    }
+    assert "sensor.duka_latency_p50" in entity_ids
+    assert "sensor.duka" not in entity_ids
+    fleet_client[0].silent = False
+    await hass.data[DOMAIN].the_client.async_update_device_status(
+        hass.data[DOMAIN].coordinators[entry.entry_id].device
+    )
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    assert hass.states.get("sensor.duka_filter_timer") is not None
+    await async_unload_entries(hass, [entry])
@@ -0,0 +1,118 @@
+"""Test keeping a group of devices in lockstep."""
+
+import asyncio
+
+from custom_components.dukaone.const import CONF_DEBOUNCE, DOMAIN
+
+from .common import (
+    async_setup_entries,
+    async_unload_entries,
+    device_entry,
+    group_entry,
+)
+
+SPEED = 0x02
+MODE = 0xB7
+
+
+async def _async_refresh(hass, entries) -> None:
+    """Read the state of devices changed outside home assistant."""
+    component = hass.data[DOMAIN]
+    for entry in entries:
+        await component.the_client.async_update_device_status(
+            component.coordinators[entry.entry_id].device
+        )
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+
+
+async def _async_setup_pair(hass, fleet, **options):
+    entries = [
+        device_entry(fleet[0], "A", **options),
+        device_entry(fleet[1], "B", **options),
+        group_entry("Pair", [fleet[0], fleet[1]], inverted=[fleet[1]]),
+    ]
+    await async_setup_entries(hass, entries)
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    return entries
+
+
+async def test_group_follows_members(hass, fleet_client):
+    """Test the group follows the members until it is commanded."""
+    entries = await _async_setup_pair(hass, fleet_client)
+    assert hass.states.get("fan.pair").attributes["preset_mode"] == "low"
+    fleet_client[0].params[SPEED] = 3
+    fleet_client[1].params[SPEED] = 3
+    await _async_refresh(hass, entries[:2])
+    state = hass.states.get("fan.pair")
+    assert state.attributes["preset_mode"] == "high"
+    assert state.attributes["in_sync"] is True
+    await async_unload_entries(hass, entries)
+
+
+async def test_group_corrects_commanded_values(hass, fleet_client):
+    """Test only the values commanded by the group are sent to a drifted member."""
+    entries = await _async_setup_pair(hass, fleet_client)
+    await hass.services.async_call(
+        DOMAIN, "set_mode", {"entity_id": "fan.pair", "mode": "out"}, blocking=True
+    )
+    assert fleet_client[0].params[MODE] == 0
+    assert fleet_client[1].params[MODE] == 2
+    # Changed in the app
+    fleet_client[1].params[SPEED] = 3
+    fleet_client[1].params[MODE] = 1
+    await _async_refresh(hass, entries[1:2])
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    assert fleet_client[1].params[MODE] == 2
+    assert fleet_client[1].params[SPEED] == 3
+    assert fleet_client[0].params[SPEED] == 1
+    assert hass.states.get("fan.pair").attributes["in_sync"] is False
+    await async_unload_entries(hass, entries)
+
+
+async def test_fleet_service_commands_group(hass, fleet_client):
+    """Test a group targeted by a fleet service is commanded through the group."""
+    entries = await _async_setup_pair(hass, fleet_client)
+    response = await hass.services.async_call(
+        DOMAIN,
+        "set_fleet_mode",
+        {"entity_id": ["fan.pair"], "mode": "in"},
+        blocking=True,
+        return_response=True,
+    )
+    assert response == {
+        "devices": {
+            fleet_client[0].device_id: {"success": True},
+            fleet_client[1].device_id: {"success": True},
+        }
+    }
+    assert fleet_client[0].params[MODE] == 2
+    assert fleet_client[1].params[MODE] == 0
+    await asyncio.sleep(0.1)
+    await hass.async_block_till_done()
+    assert hass.states.get("fan.pair").attributes["in_sync"] is True
+    await async_unload_entries(hass, entries)
+
+
+async def test_group_manual_speed_debounced(hass, fleet_client, monkeypatch):
+    """Test a manual speed set on the group fan is debounced like on a device."""
+    entries = await _async_setup_pair(hass, fleet_client, **{CONF_DEBOUNCE: 200})
+    client = hass.data[DOMAIN].the_client
+    debounces = []
+    set_manual_speed = client.async_set_manual_speed
+
+    async def async_set_manual_speed(device, manualspeed, debounce=0):
+        debounces.append(debounce)
+        await set_manual_speed(device, manualspeed, debounce)
+
+    monkeypatch.setattr(client, "async_set_manual_speed", async_set_manual_speed)
+    await hass.services.async_call(
+        "fan",
+        "set_percentage",
+        {"entity_id": "fan.pair", "percentage": 50},
+        blocking=True,
+    )
+    assert debounces == [0.2, 0.2]
+    await async_unload_entries(hass, entries)
@@ -0,0 +1,98 @@
+"""Test the setup and unload of config entries."""
+
+import asyncio
+import gc
+import logging
+import sys
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import DATA_ENTITY_PLATFORM
+import pytest
+
+from custom_components.dukaone.const import DOMAIN
+from custom_components.dukaone.device import Device
+
+from .common import async_setup_entries, async_unload_entries, device_entry
+from .fake_device import FakeDukaFleet
+
+RELOADS = 1000
+# Objects and memory blocks the reloads may leave in total. Caches settle at a
+# few hundred blocks, while an entry leaving anything behind on each reload
+# leaves at least RELOADS.
+MAX_GROWTH = RELOADS
+
+
+async def test_setup_unload(hass, fleet_client):
+    """Test entries are set up with entities and unloaded without leftovers."""
+    entries = [device_entry(device) for device in fleet_client.devices]
+    await async_setup_entries(hass, entries)
+    assert all(entry.state is ConfigEntryState.LOADED for entry in entries)
+    component = hass.data[DOMAIN]
+    assert component.the_client.get_device_count() == 2
+    assert len(hass.states.async_entity_ids("fan")) == 2
+    assert hass.states.get("sensor.fake000000000000").state == "45"
+    await async_unload_entries(hass, entries)
+    assert component.coordinators == {}
+    assert component._the_client is None
+
+
+async def _async_reload(hass: HomeAssistant, entries, times: int) -> None:
+    for _ in range(times // len(entries)):
+        for entry in entries:
+            assert await hass.config_entries.async_reload(entry.entry_id)
+        # Home Assistant keeps the reset entity platforms of unloaded entries
+        # in DATA_ENTITY_PLATFORM, drop them so only the integration is measured
+        platforms = hass.data[DATA_ENTITY_PLATFORM][DOMAIN]
+        platforms[:] = [
+            platform
+            for platform in platforms
+            if platform.entities or platform.config_entry is None
+        ]
+    await hass.async_block_till_done()
+
+
+def _counts(hass: HomeAssistant) -> dict:
+    """Return the number of objects that must not grow with reloads."""
+    return {
+        "client_devices": hass.data[DOMAIN].the_client.get_device_count(),
+        "listeners": sum(hass.bus.async_listeners().values()),
+        "tasks": len(asyncio.all_tasks()),
+        "states": len(hass.states.async_all()),
+    }
+
+
+def _allocated(fleet: FakeDukaFleet) -> tuple[int, int]:
+    """Return the number of live objects and of allocated memory blocks."""
+    for device in fleet.devices:
+        device.received.clear()
+    gc.collect()
+    return len(gc.get_objects()), sys.getallocatedblocks()
+
+
+@pytest.mark.parametrize("count", [1, 2])
+async def test_reload_does_not_leak(hass, fleet_client, caplog, count):
+    """Test reloading entries 1000 times keeps objects and memory flat.
+
+    With one entry the shared socket is closed and opened again on every
+    reload, with two entries it stays open.
+    """
+    # Captured log records keep their arguments alive
+    caplog.set_level(logging.WARNING)
+    # In debug mode every timer keeps the stack it was created from, and the
+    # loop drops cancelled timers only now and then
+    asyncio.get_running_loop().set_debug(False)
+    entries = [device_entry(device) for device in fleet_client.devices[:count]]
+    await async_setup_entries(hass, entries)
+    # Warm up, so caches filled by the first reloads are not counted
+    await _async_reload(hass, entries, 20)
+    counts = _counts(hass)
+    objects, blocks = _allocated(fleet_client)
+    await _async_reload(hass, entries, RELOADS)
+    assert all(value <= counts[key] for key, value in _counts(hass).items())
+    objects_after, blocks_after = _allocated(fleet_client)
+    assert sum(isinstance(item, Device) for item in gc.get_objects()) == count
+    assert objects_after - objects < MAX_GROWTH, "objects left by the reloads"
+    assert blocks_after - blocks < MAX_GROWTH, "memory left by the reloads"
+    await async_unload_entries(hass, entries)
+    assert hass.data[DOMAIN]._the_client is None
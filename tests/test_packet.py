@@ -0,0 +1,225 @@
+"""Test the packet codec, with fuzzed replies."""
+
+from hypothesis import given, settings, strategies as st
+
+from custom_components.dukaone.device import Speed
+from custom_components.dukaone.packet import (
+    PARAMETER_SIZE,
+    STATUS_PARAMETERS,
+    Func,
+    Parameter,
+    ResponsePacket,
+    build_read,
+    build_write,
+    calc_checksum,
+)
+
+from .common import status_reply
+from .fake_device import RESPONSE, FakeDevice, build_packet, checksum
+
+fuzz = settings(max_examples=2000, deadline=None)
+VALID_REPLY = status_reply(FakeDevice("FAKE000000000000"))
+ROUND_TRIP_PARAMETERS = [
+    parameter
+    for parameter, size in PARAMETER_SIZE.items()
+    if size and parameter != Parameter.SEARCH
+]
+
+
+def _with_checksum(data: bytearray) -> bytes:
+    """Return the data with the checksum of the changed packet."""
+    value = checksum(data[:-2])
+    data[-2:] = bytes((value & 0xFF, value >> 8))
+    return bytes(data)
+
+
+def test_decode_status():
+    """Test a status reply is decoded into typed values."""
+    device = FakeDevice("FAKE000000000000")
+    device.params[0x02] = Speed.MANUAL
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(status_reply(device))
+    assert packet.device_id == device.device_id
+    assert packet.is_on is True
+    assert packet.speed == Speed.MANUAL
+    assert packet.manualspeed == 100
+    assert packet.fan1rpm == 1200
+    assert packet.humidity == 45
+    assert packet.mode == 1
+    assert packet.filter_alarm == 0
+    assert packet.filter_timer == 30 + (80 * 24 + 5) * 60
+    assert packet.alarm == 0
+    assert packet.firmware_version == "1.2"
+    assert packet.firmware_date == "3-4-2024"
+
+
+def test_decode_off():
+    """Test a device that is off reports the speed off."""
+    device = FakeDevice("FAKE000000000000")
+    device.params[0x01] = 0
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(status_reply(device))
+    assert packet.speed == Speed.OFF
+
+
+def test_decode_changed_size():
+    """Test a parameter with a size given by the 0xFE prefix."""
+    payload = bytes((0xFE, 2, 0x25, 55, 0, 0x02, 3))
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(
+        build_packet("FAKE000000000000", "1111", RESPONSE, payload)
+    )
+    assert packet.humidity == 55
+    assert packet.speed == Speed.HIGH
+
+
+def test_decode_unsupported_parameter():
+    """Test a parameter the device reports as unsupported with 0xFD is skipped."""
+    payload = bytes((0xFD, 0x4A, 0x02, 3))
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(
+        build_packet("FAKE000000000000", "1111", RESPONSE, payload)
+    )
+    assert packet.fan1rpm is None
+    assert packet.values == {0x02: 3}
+
+
+def test_decode_page_switch():
+    """Test the parameters after a 0xFF page switch are kept apart."""
+    payload = bytes((0xFF, 0x01, 0xFE, 1, 0x02, 7, 0xFF, 0x00, 0x25, 55))
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(
+        build_packet("FAKE000000000000", "1111", RESPONSE, payload)
+    )
+    assert packet.speed is None
+    assert packet.humidity == 55
+    assert packet.values == {0x0102: 7, 0x25: 55}
+
+
+def test_decode_unknown_size_on_other_page_rejected():
+    """Test a parameter of another page needs its size given by 0xFE."""
+    payload = bytes((0xFF, 0x01, 0x02, 7))
+    assert not ResponsePacket().initialize_from_data(
+        build_packet("FAKE000000000000", "1111", RESPONSE, payload)
+    )
+
+
+def test_decode_trailing_byte_rejected():
+    """Test a stray byte after the last parameter is rejected."""
+    for trailing in (0x02, 0xFD, 0xFE, 0xFF):
+        payload = bytes((0x02, 3, trailing))
+        assert not ResponsePacket().initialize_from_data(
+            build_packet("FAKE000000000000", "1111", RESPONSE, payload)
+        )
+
+
+def test_build_matches_fake_device():
+    """Test the built requests are accepted by an independent implementation."""
+    read = build_read("FAKE000000000000", "1111", STATUS_PARAMETERS)
+    assert checksum(read[:-2]) == int.from_bytes(read[-2:], "little")
+    write = build_write("FAKE000000000000", "1111", {0x02: 3, 0xB7: 2})
+    assert write[-7:-2] == bytes((Func.WRITEREAD, 0x02, 3, 0xB7, 2))
+    assert calc_checksum(write, len(write) - 2) == checksum(write[:-2])
+
+
+@fuzz
+@given(
+    edits=st.lists(
+        st.tuples(
+            st.sampled_from(("set", "delete", "insert")),
+            st.integers(min_value=0),
+            st.integers(0, 255),
+        ),
+        min_size=1,
+        max_size=4,
+    ),
+    fix_checksum=st.booleans(),
+)
+def test_fuzz_corrupted_replies(edits, fix_checksum):
+    """Test corrupted replies never raise.
+
+    With fix_checksum the checksum is corrected after the corruption, so the
+    replies are parsed past the checksum check.
+    """
+    data = bytearray(VALID_REPLY)
+    for operation, position, value in edits:
+        position %= len(data) - 2
+        if operation == "set":
+            data[position] = value
+        elif operation == "delete":
+            del data[position]
+        else:
+            data.insert(position, value)
+    data = _with_checksum(data) if fix_checksum else bytes(data)
+    assert isinstance(ResponsePacket().initialize_from_data(data), bool)
+
+
+@fuzz
+@given(data=st.binary(max_size=40), framed=st.booleans())
+def test_fuzz_random_data(data, framed):
+    """Test random data is rejected without raising."""
+    if framed:
+        data = _with_checksum(bytearray(b"\xfd\xfd\x02" + data + b"\x00\x00"))
+    ResponsePacket().initialize_from_data(data)
+
+
+@fuzz
+@given(position=st.sampled_from((-1, -2)), flip=st.integers(1, 255))
+def test_fuzz_wrong_checksum_rejected(position, flip):
+    """Test every reply with a wrong checksum is rejected."""
+    data = bytearray(VALID_REPLY)
+    data[position] ^= flip
+    assert not ResponsePacket().initialize_from_data(bytes(data))
+
+
+@fuzz
+@given(trailing=st.integers(0, 255).filter(lambda byte: PARAMETER_SIZE.get(byte) != 0))
+def test_fuzz_trailing_byte_rejected(trailing):
+    """Test a reply with a stray byte appended is rejected."""
+    data = bytearray(VALID_REPLY)
+    data.insert(len(data) - 2, trailing)
+    assert not ResponsePacket().initialize_from_data(_with_checksum(data))
+
+
+@fuzz
+@given(data=st.data())
+def test_fuzz_round_trip(data):
+    """Test replies of random known parameters decode to the encoded values."""
+    parameters = data.draw(
+        st.lists(
+            st.sampled_from(ROUND_TRIP_PARAMETERS), min_size=1, max_size=8, unique=True
+        )
+    )
+    values = {
+        parameter: data.draw(
+            st.binary(
+                min_size=PARAMETER_SIZE[parameter], max_size=PARAMETER_SIZE[parameter]
+            )
+        )
+        for parameter in parameters
+    }
+    payload = bytearray()
+    expected = {}
+    for parameter, value in values.items():
+        # Unsupported parameters and parameters of other pages in between
+        unsupported = data.draw(st.lists(st.integers(0, 255), max_size=2))
+        for other in unsupported:
+            payload += bytes((0xFD, other))
+        if data.draw(st.booleans()):
+            page = data.draw(st.integers(1, 255))
+            other = data.draw(st.binary(min_size=1, max_size=4))
+            payload += bytes((0xFF, page, 0xFE, len(other), parameter)) + other
+            payload += bytes((0xFF, 0))
+            expected[page << 8 | parameter] = other[0]
+        payload.append(parameter)
+        payload += value
+        expected[parameter] = value[0]
+    packet = ResponsePacket()
+    assert packet.initialize_from_data(
+        build_packet("FAKE000000000000", "1111", RESPONSE, payload)
+    )
+    assert packet.values == expected
+    if Parameter.FAN1RPM in values:
+        assert packet.fan1rpm == int.from_bytes(values[Parameter.FAN1RPM], "little")
+    if Parameter.CURRENT_HUMIDITY in values:
+        assert packet.humidity == values[Parameter.CURRENT_HUMIDITY][0]
@@ -0,0 +1,160 @@
+"""Test the weekly programs and the wheel running them."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from zoneinfo import ZoneInfo
+
+from homeassistant.core import HomeAssistant
+import homeassistant.util.dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+import pytest
+import voluptuous as vol
+
+from custom_components.dukaone.const import CONF_SCHEDULE
+from custom_components.dukaone.device import Mode, Speed
+from custom_components.dukaone.program import (
+    Program,
+    ProgramWheel,
+    ScheduleError,
+    parse_schedule,
+)
+
+BERLIN = ZoneInfo("Europe/Berlin")
+MON, TUE, WED, THU, FRI, SAT, SUN = range(7)
+
+
+def test_parse_schedule():
+    """Test the programs of a schedule are parsed."""
+    programs = parse_schedule("""
+        # Weekdays
+        mon-fri 06:30 high inout
+        sat,sun 09:00 120
+        daily 22:00 off
+        """)
+    assert programs == [
+        Program(frozenset(range(5)), 6 * 60 + 30, Speed.HIGH, mode=Mode.TWOWAY),
+        Program(frozenset((SAT, SUN)), 9 * 60, manual_speed=120),
+        Program(frozenset(range(7)), 22 * 60, Speed.OFF),
+    ]
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "mon-fry 06:30 high",
+        "monday 06:30 high",
+        "mon- 06:30 high",
+        "mon 24:00 high",
+        "mon 06:60 high",
+        "mon 6 high",
+        "mon -1:30 high",
+        "mon 06:30",
+        "mon 06:30 fast",
+        "mon 06:30 256",
+        "mon 06:30 high low",
+    ],
+)
+def test_parse_invalid(line):
+    """Test an invalid line raises vol.Invalid naming the line."""
+    with pytest.raises(vol.Invalid, match="line 2"):
+        parse_schedule(f"daily 22:00 off\n{line}")
+    with pytest.raises(ScheduleError):
+        parse_schedule(line)
+
+
+def test_day_range_wraps_the_week():
+    """Test a day range past Sunday continues with Monday."""
+    (program,) = parse_schedule("fri-mon 08:00 low")
+    assert program.days == {FRI, SAT, SUN, MON}
+    (program,) = parse_schedule("sun-sun 08:00 low")
+    assert program.days == {SUN}
+
+
+def test_next_run_past_midnight():
+    """Test a program after midnight runs on the next day."""
+    (program,) = parse_schedule("daily 00:15 low")
+    now = datetime(2024, 5, 15, 23, 50, tzinfo=BERLIN)
+    assert program.next_run(now) == datetime(2024, 5, 16, 0, 15, tzinfo=BERLIN)
+
+
+def test_next_run_sunday_to_monday():
+    """Test a Monday program runs after the week has wrapped on Sunday."""
+    (program,) = parse_schedule("mon 06:30 high")
+    now = datetime(2024, 5, 19, 23, 0, tzinfo=BERLIN)
+    assert now.weekday() == SUN
+    assert program.next_run(now) == datetime(2024, 5, 20, 6, 30, tzinfo=BERLIN)
+    # A program of the same day that has passed runs next week
+    now = datetime(2024, 5, 20, 7, 0, tzinfo=BERLIN)
+    assert program.next_run(now) == datetime(2024, 5, 27, 6, 30, tzinfo=BERLIN)
+
+
+@pytest.mark.parametrize(
+    ("now", "hours"),
+    [
+        # The clocks are set forward, the night is an hour shorter
+        (datetime(2024, 3, 30, 12, 0, tzinfo=BERLIN), 17.5),
+        # The clocks are set back, the night is an hour longer
+        (datetime(2024, 10, 26, 12, 0, tzinfo=BERLIN), 19.5),
+    ],
+)
+def test_next_run_dst(now, hours):
+    """Test a program runs at the local time after a DST change."""
+    (program,) = parse_schedule("daily 06:30 low")
+    when = program.next_run(now)
+    assert (when.hour, when.minute) == (6, 30)
+    assert when.timestamp() - now.timestamp() == hours * 3600
+
+
+def _coordinator(entry_id: str, schedule: str):
+    return SimpleNamespace(
+        entry=SimpleNamespace(entry_id=entry_id, options={CONF_SCHEDULE: schedule}),
+        device=SimpleNamespace(device_id=entry_id),
+        async_set_speed=AsyncMock(),
+        async_set_manual_speed=AsyncMock(),
+        async_set_mode=AsyncMock(),
+    )
+
+
+async def test_removed_programs_do_not_run(hass: HomeAssistant):
+    """Test the programs of an unloaded entry are no longer run."""
+    wheel = ProgramWheel(hass)
+    first = _coordinator("first", "daily 06:30 high")
+    second = _coordinator("second", "daily 06:30 low\ndaily 07:00 out")
+    wheel.async_set(first)
+    wheel.async_set(second)
+    wheel.async_remove("second")
+    # Both programs of a day are due a day later
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(days=1))
+    await hass.async_block_till_done()
+    first.async_set_speed.assert_awaited_once_with(Speed.HIGH)
+    second.async_set_speed.assert_not_awaited()
+    second.async_set_mode.assert_not_awaited()
+    wheel.async_remove("first")
+    assert wheel._cancel_timer is None
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(days=2))
+    await hass.async_block_till_done()
+    first.async_set_speed.assert_awaited_once()
+
+
+async def test_replaced_programs_do_not_grow_the_wheel(hass: HomeAssistant):
+    """Test setting the programs again and again keeps the heap small."""
+    wheel = ProgramWheel(hass)
+    coordinators = [
+        _coordinator(entry_id, "daily 06:30 high\ndaily 22:00 low")
+        for entry_id in ("first", "second")
+    ]
+    for _ in range(100):
+        for coordinator in coordinators:
+            wheel.async_set(coordinator)
+        assert len(wheel._heap) <= 2 * 4
+    # The timer runs the programs due at its time, one fire per program time
+    for _ in range(2):
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(days=1))
+        await hass.async_block_till_done()
+    for coordinator in coordinators:
+        coordinator.async_set_speed.assert_any_await(Speed.HIGH)
+        coordinator.async_set_speed.assert_any_await(Speed.LOW)
+        assert coordinator.async_set_speed.await_count == 2
+    wheel.async_remove("first")
+    wheel.async_remove("second")
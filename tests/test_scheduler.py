@@ -0,0 +1,56 @@
+"""Test the adaptive poll scheduler."""
+
+import asyncio
+
+from custom_components.dukaone.device import Device
+from custom_components.dukaone.scheduler import (
+    ACTIVE_PERIOD,
+    ACTIVE_POLL_INTERVAL,
+    PollScheduler,
+)
+
+from .common import report
+from .fake_device import FakeDevice
+
+INTERVAL = 30.0
+
+
+def test_filter_timer_is_not_activity(monkeypatch):
+    """Test a device whose filter timer counts down is polled at its interval."""
+    now = 1000.0
+    scheduler = PollScheduler(lambda device, resolve: None)
+    monkeypatch.setattr(scheduler, "_now", lambda: now)
+    fake = FakeDevice("FAKE000000000000")
+    device = Device(fake.device_id, fake.password, "127.0.0.1")
+    scheduler.add(device, INTERVAL)
+    report(device, fake)
+    assert scheduler.interval(device.device_id) == ACTIVE_POLL_INTERVAL
+    for _ in range(3):
+        now += ACTIVE_PERIOD / 2
+        fake.tick()
+        report(device, fake)
+    assert device.filter_timer == 30 + (80 * 24 + 5) * 60 - 3
+    assert scheduler.interval(device.device_id) == INTERVAL
+    fake.params[0x02] = 3
+    report(device, fake)
+    assert scheduler.interval(device.device_id) == ACTIVE_POLL_INTERVAL
+
+
+async def test_removed_device_not_polled():
+    """Test a removed device is skipped and re-adding does not grow the heap."""
+    polled = []
+    scheduler = PollScheduler(lambda device, resolve: polled.append(device))
+    scheduler.start()
+    fakes = [FakeDevice(f"FAKE{number:012d}") for number in range(3)]
+    devices = [Device(fake.device_id, fake.password, "127.0.0.1") for fake in fakes]
+    for device in devices:
+        scheduler.add(device, 0.02)
+    for _ in range(100):
+        scheduler.remove(devices[0].device_id)
+        scheduler.add(devices[0], 0.02)
+        assert len(scheduler._heap) <= 2 * len(devices)
+    scheduler.remove(devices[0].device_id)
+    await asyncio.sleep(0.1)
+    scheduler.stop()
+    assert polled
+    assert devices[0] not in polled
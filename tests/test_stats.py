@@ -0,0 +1,59 @@
+"""Test the per device performance counters."""
+
+import asyncio
+
+import pytest
+
+from custom_components.dukaone.device import Speed
+from custom_components.dukaone.inflight import CommandTimeout, InflightTable
+from custom_components.dukaone.stats import DeviceStats
+
+
+async def test_overlapping_requests(client, fleet):
+    """Test a poll and a write in flight together are both measured."""
+    fleet[0].delay = 0.05
+    device = await client.async_add_device(
+        fleet[0].device_id, fleet[0].password, "127.0.0.1"
+    )
+    assert await device.async_wait_status(2)
+    for speed in (Speed.MEDIUM, Speed.HIGH, Speed.LOW):
+        await client.async_update_device_status(device)
+        await client.async_set_speed(device, speed)
+        await asyncio.sleep(0.1)
+    stats = device.stats.as_dict()
+    assert stats["packets_received"] == 7
+    assert stats["stale_responses"] == 0
+    assert stats["latency_ms"]["samples"] == 7
+    assert stats["latency_ms"]["p50"] >= 50
+
+
+async def test_failed_command_counted(client, fleet, monkeypatch):
+    """Test an unconfirmed command is counted apart from missed polls."""
+    monkeypatch.setattr(InflightTable.__init__, "__defaults__", (0.01,))
+    device = await client.async_add_device(
+        fleet[0].device_id, fleet[0].password, "127.0.0.1"
+    )
+    assert await device.async_wait_status(2)
+    fleet[0].silent = True
+    with pytest.raises(CommandTimeout):
+        await client.async_set_speed(device, Speed.HIGH)
+    assert device.stats.failed_commands == 1
+    assert device.stats.retries == 3
+    assert device.stats.missed_polls == 0
+
+
+def test_lost_request_not_measured(monkeypatch):
+    """Test a reply after a missed poll is not measured from the lost poll."""
+    now = 100.0
+    monkeypatch.setattr("custom_components.dukaone.stats.time.monotonic", lambda: now)
+    stats = DeviceStats()
+    stats.packet_sent()
+    now = 105.0
+    stats.poll_missed()
+    stats.packet_sent()
+    now = 105.02
+    stats.packet_received()
+    assert stats.missed_polls == 1
+    assert stats.latency(50) == 20.0
+    stats.packet_received()
+    assert stats.stale_responses == 1
@@ -0,0 +1,65 @@
+"""Test the dispatch of received datagrams."""
+
+from custom_components.dukaone.device import Device
+from custom_components.dukaone.transport import DukaTransport
+
+from .fake_device import RESPONSE, build_packet
+
+
+def _reply(device_id: str, humidity: int) -> bytes:
+    return build_packet(device_id, "1111", RESPONSE, bytes((0x25, humidity)))
+
+
+def test_dispatch_by_device_id():
+    """Test a reply is routed by its device id whatever the source address."""
+    transport = DukaTransport()
+    device = Device("FAKE000000000000", "1111", "127.0.0.1")
+    other = Device("FAKE000000000001", "1111", "127.0.0.1")
+    transport.register(device)
+    transport.register(other)
+    transport.datagram_received(_reply(device.device_id, 50), ("127.0.0.2", 4000))
+    assert device.humidity == 50
+    assert device.ip_address == "127.0.0.2"
+    assert other.humidity is None
+
+
+def test_unknown_device_dropped():
+    """Test datagrams of unregistered devices are dropped undecoded."""
+    transport = DukaTransport()
+    device = Device("FAKE000000000000", "1111", "127.0.0.1")
+    transport.register(device)
+    transport.unregister(device)
+    transport.datagram_received(_reply(device.device_id, 50), ("127.0.0.1", 4000))
+    assert device.humidity is None
+    assert transport.dropped_packets == 1
+    transport.datagram_received(b"\xfd\xfd", ("127.0.0.1", 4000))
+    assert transport.invalid_packets == 1
+
+
+def test_unregister_keeps_replacement():
+    """Test unregistering a device keeps another device with the same id."""
+    transport = DukaTransport()
+    probe = Device("FAKE000000000000", "1111", "127.0.0.1")
+    device = Device("FAKE000000000000", "1111", "127.0.0.1")
+    transport.register(probe)
+    transport.register(device)
+    transport.unregister(probe)
+    transport.datagram_received(_reply(device.device_id, 50), ("127.0.0.1", 4000))
+    assert device.humidity == 50
+
+
+def test_probe_beside_registered_device():
+    """Test a probe and a registered device with the same id are both updated."""
+    transport = DukaTransport()
+    device = Device("FAKE000000000000", "1111", "127.0.0.1")
+    probe = Device("FAKE000000000000", "1111", "127.0.0.1")
+    transport.add_probe(probe)
+    transport.register(device)
+    transport.datagram_received(_reply(device.device_id, 50), ("127.0.0.1", 4000))
+    assert probe.humidity == 50
+    assert device.humidity == 50
+    assert probe.stats.packets_received == 0
+    transport.remove_probe(probe)
+    transport.datagram_received(_reply(device.device_id, 55), ("127.0.0.1", 4000))
+    assert probe.humidity == 50
+    assert device.humidity == 55